@@ -0,0 +1,221 @@
+"""Incremental on-disk store of per-wave partial count tensors.
+
+Each survey wave keeps a reason x status count matrix plus, for every tracked
+attribute, a value x reason x status tensor, saved as .npy files. Ingesting a
+batch of responses only rewrites the partials of the wave it belongs to; queries
+memory-map and sum just the partials they need.
+
+Usage:
+    python aggregate_store.py ingest STORE --wave 2026 responses.csv --attributes Nationality,Region
+    python aggregate_store.py show STORE
+"""
+import argparse
+import json
+import os
+import re
+import tempfile
+
+import numpy as np
+
+from flow_matrix import FlowMatrix, whole_percentages
+from ingest import DEFAULT_CHUNKSIZE, REASON_COLUMN, STATUS_COLUMN, STATUS_ORDER, iter_respondent_chunks
+
+META_NAME = 'meta.json'
+
+
+def _slug(name):
+    return re.sub(r'[^A-Za-z0-9]+', '_', str(name)).strip('_') or 'value'
+
+
+def _atomic_save(path, array):
+    """Write an .npy file so readers never see a half-written partial"""
+    directory = os.path.dirname(path)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.npy.tmp')
+    with os.fdopen(fd, 'wb') as f:
+        np.save(f, array)
+    os.replace(tmp_path, path)
+
+
+def _pad_to(array, shape):
+    """Labels are append-only, so older partials only need zero-padding at the end.
+
+    Partials are written before meta.json, so a reader holding older metadata can
+    meet a partial with more labels than it knows about; those trailing rows are
+    sliced off rather than padded with negative widths.
+    """
+    if array.shape == tuple(shape):
+        return array
+    array = array[tuple(slice(0, target) for target in shape)]
+    return np.pad(array, [(0, target - current) for current, target in zip(array.shape, shape)])
+
+
+class AggregateStore:
+    """Per-wave partial aggregates on disk, merged lazily at query time"""
+
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        self.meta = self._read_meta()
+
+    def _read_meta(self):
+        meta_path = os.path.join(self.path, META_NAME)
+        if not os.path.exists(meta_path):
+            return {'version': 0, 'reasons': [], 'statuses': list(STATUS_ORDER), 'attributes': {}, 'waves': {}}
+        with open(meta_path, encoding='utf-8') as f:
+            return json.load(f)
+
+    def _write_meta(self):
+        fd, tmp_path = tempfile.mkstemp(dir=self.path, suffix='.json.tmp')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(self.meta, f, indent=2)
+        os.replace(tmp_path, os.path.join(self.path, META_NAME))
+
+    def refresh(self):
+        """Reload metadata written by another process; returns True if the store changed"""
+        version = self.meta['version']
+        self.meta = self._read_meta()
+        return self.meta['version'] != version
+
+    @property
+    def version(self):
+        return self.meta['version']
+
+    @property
+    def waves(self):
+        return list(self.meta['waves'])
+
+    @property
+    def attributes(self):
+        return {name: list(values) for name, values in self.meta['attributes'].items()}
+
+    def _partial_path(self, wave, attribute=None):
+        name = 'counts.npy' if attribute is None else f"by_{_slug(attribute)}.npy"
+        return os.path.join(self.path, _slug(wave), name)
+
+    def _load_partial(self, wave, attribute=None):
+        path = self._partial_path(wave, attribute)
+        n_reasons, n_statuses = len(self.meta['reasons']), len(self.meta['statuses'])
+        if attribute is None:
+            shape = (n_reasons, n_statuses)
+        else:
+            shape = (len(self.meta['attributes'][attribute]), n_reasons, n_statuses)
+        if not os.path.exists(path):
+            return np.zeros(shape, dtype=np.int64)
+        return _pad_to(np.load(path, mmap_mode='r'), shape)
+
+    def _encode(self, values, labels):
+        """Integer codes for a column without missing values, appending unseen labels to the store's dictionary"""
+        values = values.astype('category')
+        categories = [str(label) for label in values.cat.categories]
+        known = set(labels)
+        labels.extend(label for label in categories if label not in known)
+        positions = {label: i for i, label in enumerate(labels)}
+        lookup = np.array([positions[label] for label in categories], dtype=np.int64)
+        return lookup[values.cat.codes.to_numpy()]
+
+    def ingest(self, chunks, wave, attribute_columns=()):
+        """Add a batch of respondent chunks to one wave's partials"""
+
+        wave = str(wave)
+        meta = self.meta
+        # Attribute partials must cover every batch, so the tracked set is fixed by the first ingest
+        if meta['waves'] and set(attribute_columns) != set(meta['attributes']):
+            raise ValueError(f"This store tracks attributes {sorted(meta['attributes'])}; "
+                             f"every batch must provide exactly those, got {sorted(attribute_columns)}")
+        for name in attribute_columns:
+            meta['attributes'].setdefault(name, [])
+
+        # Start from this wave's existing partials; no other wave is touched
+        counts = np.array(self._load_partial(wave), dtype=np.int64)
+        tensors = {name: np.array(self._load_partial(wave, name), dtype=np.int64) for name in attribute_columns}
+
+        for chunk in chunks:
+            chunk = chunk.dropna(subset=[REASON_COLUMN, STATUS_COLUMN])
+            reasons = self._encode(chunk[REASON_COLUMN], meta['reasons'])
+            statuses = self._encode(chunk[STATUS_COLUMN], meta['statuses'])
+            n_reasons, n_statuses = len(meta['reasons']), len(meta['statuses'])
+
+            # Reduce each chunk with one bincount so memory stays bounded by the chunk size
+            cells = reasons * n_statuses + statuses
+            counts = _pad_to(counts, (n_reasons, n_statuses))
+            counts += np.bincount(cells, minlength=n_reasons * n_statuses).reshape(n_reasons, n_statuses)
+
+            for name in attribute_columns:
+                column = chunk[name]
+                present = column.notna().to_numpy()
+                values = self._encode(column[present], meta['attributes'][name])
+                shape = (len(meta['attributes'][name]), n_reasons, n_statuses)
+                tensors[name] = _pad_to(tensors[name], shape)
+                tensors[name] += np.bincount(values * (n_reasons * n_statuses) + cells[present],
+                                             minlength=int(np.prod(shape))).reshape(shape)
+
+        os.makedirs(os.path.dirname(self._partial_path(wave)), exist_ok=True)
+        _atomic_save(self._partial_path(wave), counts)
+        for name, tensor in tensors.items():
+            _atomic_save(self._partial_path(wave, name), tensor)
+
+        wave_meta = meta['waves'].setdefault(wave, {'respondents': 0, 'batches': 0})
+        wave_meta['respondents'] = int(counts.sum())
+        wave_meta['batches'] += 1
+        meta['version'] += 1
+        self._write_meta()
+        return wave_meta
+
+    def ingest_file(self, path, wave, attribute_columns=(), chunksize=DEFAULT_CHUNKSIZE):
+        columns = [REASON_COLUMN, STATUS_COLUMN] + list(attribute_columns)
+        return self.ingest(iter_respondent_chunks(path, columns=columns, chunksize=chunksize), wave, attribute_columns)
+
+    def counts(self, waves=None, attribute=None, values=None):
+        """Merged reason x status counts for some waves, optionally limited to some values of one attribute"""
+
+        waves = self.waves if not waves else [str(wave) for wave in waves]
+        n_reasons, n_statuses = len(self.meta['reasons']), len(self.meta['statuses'])
+        total = np.zeros((n_reasons, n_statuses), dtype=np.int64)
+
+        if attribute and values:
+            positions = [self.meta['attributes'][attribute].index(value) for value in values]
+            for wave in waves:
+                total += self._load_partial(wave, attribute)[positions].sum(axis=0)
+        else:
+            for wave in waves:
+                total += self._load_partial(wave)
+        return total
+
+    def flow(self, waves=None, attribute=None, values=None):
+        """FlowMatrix for the merged partials, ready for the chart functions"""
+        counts = self.counts(waves, attribute, values)
+        return FlowMatrix(counts, self.meta['reasons'], self.meta['statuses'], percentages=whole_percentages(counts))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Maintain the incremental aggregate store")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    ingest_parser = commands.add_parser('ingest', help="Add a batch of responses to a wave")
+    ingest_parser.add_argument('store')
+    ingest_parser.add_argument('files', nargs='+', help="Respondent-level CSV/Parquet files")
+    ingest_parser.add_argument('--wave', required=True, help="Survey wave (e.g. the survey year)")
+    ingest_parser.add_argument('--attributes', default='', help="Comma-separated attribute columns to keep partials for")
+
+    show_parser = commands.add_parser('show', help="Summarise the store")
+    show_parser.add_argument('store')
+
+    args = parser.parse_args(argv)
+    store = AggregateStore(args.store)
+
+    if args.command == 'ingest':
+        attributes = [c.strip() for c in args.attributes.split(',') if c.strip()]
+        for path in args.files:
+            wave_meta = store.ingest_file(path, args.wave, attributes)
+            print(f"{path}: wave {args.wave} now has {wave_meta['respondents']:,} respondents")
+    else:
+        print(f"Store version {store.version}: {len(store.meta['reasons'])} reasons, "
+              f"{len(store.meta['statuses'])} statuses")
+        for wave, wave_meta in store.meta['waves'].items():
+            print(f"  wave {wave}: {wave_meta['respondents']:,} respondents in {wave_meta['batches']} batches")
+        for name, values in store.attributes.items():
+            print(f"  attribute {name}: {len(values)} values")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,270 @@
+"""Shared aggregation service for running several dashboard replicas.
+
+One asyncio process loads the data once and serves reason x status matrices,
+totals and drill-down filter results over HTTP or a Unix socket. Results are
+kept in a shared cache, and identical requests that arrive while a result is
+being computed wait for that one computation instead of repeating it.
+
+Usage:
+    python aggregation_service.py --port 8765 [--data responses.parquet --attributes Nationality,Region]
+    python aggregation_service.py --unix /tmp/internationalflow.sock
+
+Point the dashboard at it with INTERNATIONALFLOW_SERVICE_URL=http://127.0.0.1:8765
+(or unix:///tmp/internationalflow.sock).
+"""
+import argparse
+import asyncio
+import http.client
+import json
+import os
+import queue
+import socket
+import threading
+from collections import OrderedDict
+from urllib.parse import parse_qs, quote, urlsplit
+
+from flow_matrix import FlowMatrix
+
+
+def _canonical(selection):
+    """Stable cache key for a drill-down selection; empty selections mean 'everyone'"""
+    selection = {name: sorted(values) for name, values in (selection or {}).items() if values}
+    return json.dumps(selection, sort_keys=True)
+
+
+def flow_to_payload(flow):
+    return {
+        'reasons': flow.reasons,
+        'statuses': flow.statuses,
+        'counts': flow.counts.tolist(),
+        'cohort_sizes': flow.cohort_sizes.tolist(),
+        'percentages': flow.percentages.tolist(),
+        'row_totals': flow.row_totals.tolist(),
+        'column_totals': flow.column_totals.tolist(),
+        'grand_total': flow.grand_total,
+        'fingerprint': flow.fingerprint,
+    }
+
+
+def flow_from_payload(payload):
+    return FlowMatrix(payload['counts'], payload['reasons'], payload['statuses'],
+                      cohort_sizes=payload['cohort_sizes'], percentages=payload['percentages'])
+
+
+class LocalAggregationBackend:
+    """In-process stand-in with the same interface as AggregationClient (also what the service serves)"""
+
+    def __init__(self, source=None, attribute_columns=(), editions_dir=None):
+        from shared_data import build_dataset
+        self._flow, self._index = build_dataset(source, attribute_columns, editions_dir)
+
+    @property
+    def values(self):
+        """Attribute name -> selectable values for drill-down (empty without microdata)"""
+        return dict(self._index.values) if self._index else {}
+
+    def flow(self, selection=None):
+        if any((selection or {}).values()):
+            if self._index is None:
+                raise ValueError("Drill-down filters need respondent-level data with attribute columns")
+            return self._index.flow(selection)
+        return self._flow
+
+
+class AggregationService:
+    """Shared result cache and request coalescing in front of a backend"""
+
+    def __init__(self, backend, cache_size=256):
+        self.backend = backend
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._inflight = {}
+        self.stats = {'hits': 0, 'misses': 0, 'coalesced': 0}
+
+    def _compute(self, selection):
+        flow = self.backend.flow(selection)
+        return json.dumps(flow_to_payload(flow), separators=(',', ':')).encode()
+
+    async def flow_payload(self, selection):
+        key = _canonical(selection)
+        if key in self._cache:
+            self._cache.move_to_end(key)
+            self.stats['hits'] += 1
+            return self._cache[key]
+        if key in self._inflight:
+            # Someone is already computing this exact result; share it
+            self.stats['coalesced'] += 1
+            return await asyncio.shield(self._inflight[key])
+
+        self.stats['misses'] += 1
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            payload = await asyncio.get_running_loop().run_in_executor(None, self._compute, json.loads(key))
+        except Exception as exc:
+            future.set_exception(exc)
+            future.exception()  # Mark retrieved when nobody else was waiting
+            raise
+        finally:
+            del self._inflight[key]
+
+        future.set_result(payload)
+        self._cache[key] = payload
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return payload
+
+    async def handle(self, method, target):
+        """Route one request; returns (status, JSON body bytes)"""
+        url = urlsplit(target)
+        if method != 'GET':
+            return 405, b'{"error":"method not allowed"}'
+        if url.path == '/health':
+            return 200, b'{"status":"ok"}'
+        if url.path == '/stats':
+            return 200, json.dumps(dict(self.stats, cached=len(self._cache))).encode()
+        if url.path == '/attributes':
+            return 200, json.dumps(self.backend.values).encode()
+        if url.path == '/flow':
+            query = parse_qs(url.query)
+            try:
+                selection = json.loads(query.get('filters', ['{}'])[0])
+                return 200, await self.flow_payload(selection)
+            except (ValueError, KeyError) as exc:
+                return 400, json.dumps({'error': str(exc)}).encode()
+        return 404, b'{"error":"not found"}'
+
+    async def serve_connection(self, reader, writer):
+        """Minimal HTTP/1.1 with keep-alive, enough for the dashboard's pooled client"""
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, target, _ = request_line.decode('latin-1').split(' ', 2)
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                if int(headers.get('content-length', 0)):
+                    await reader.readexactly(int(headers['content-length']))
+
+                status, body = await self.handle(method, target)
+                keep_alive = headers.get('connection', '').lower() != 'close'
+                writer.write(
+                    f"HTTP/1.1 {status} {http.client.responses.get(status, '')}\r\n"
+                    f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode('latin-1') + body
+                )
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def start(self, host='127.0.0.1', port=8765, unix_path=None):
+        if unix_path:
+            if os.path.exists(unix_path):
+                os.unlink(unix_path)
+            return await asyncio.start_unix_server(self.serve_connection, path=unix_path)
+        return await asyncio.start_server(self.serve_connection, host, port)
+
+
+class _UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, path, timeout):
+        super().__init__('localhost', timeout=timeout)
+        self._path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self._path)
+
+
+class AggregationClient:
+    """Thin client for the aggregation service, reusing a small pool of keep-alive connections"""
+
+    def __init__(self, url, pool_size=4, timeout=30):
+        self.url = url
+        self.timeout = timeout
+        self._pool = queue.LifoQueue(maxsize=pool_size)
+        self._values = None
+        self._lock = threading.Lock()
+
+    def _new_connection(self):
+        url = urlsplit(self.url)
+        if url.scheme == 'unix':
+            return _UnixHTTPConnection(url.path, self.timeout)
+        return http.client.HTTPConnection(url.hostname, url.port or 80, timeout=self.timeout)
+
+    def _get(self, path):
+        for attempt in range(2):
+            try:
+                connection = self._pool.get_nowait()
+            except queue.Empty:
+                connection = self._new_connection()
+            try:
+                connection.request('GET', path)
+                response = connection.getresponse()
+                body = response.read()
+            except (ConnectionError, http.client.HTTPException, OSError):
+                # A pooled connection may have been closed by the server; retry once on a fresh one
+                connection.close()
+                if attempt:
+                    raise
+                continue
+            try:
+                self._pool.put_nowait(connection)
+            except queue.Full:
+                connection.close()
+            if response.status != 200:
+                raise RuntimeError(f"Aggregation service returned {response.status}: {body.decode(errors='replace')}")
+            return json.loads(body)
+
+    @property
+    def values(self):
+        """Attribute name -> selectable values for drill-down (fetched once)"""
+        with self._lock:
+            if self._values is None:
+                self._values = self._get('/attributes')
+        return self._values
+
+    def flow(self, selection=None):
+        return flow_from_payload(self._get('/flow?filters=' + quote(_canonical(selection))))
+
+    def stats(self):
+        return self._get('/stats')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve aggregated survey flows to dashboard replicas")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--unix', help="Listen on this Unix socket instead of TCP")
+    parser.add_argument('--data', default=os.environ.get('INTERNATIONALFLOW_DATA'),
+                        help="Respondent-level CSV/Parquet export (defaults to the published figures)")
+    parser.add_argument('--attributes', default=os.environ.get('INTERNATIONALFLOW_ATTRIBUTES', ''),
+                        help="Comma-separated attribute columns to allow drill-down filters on")
+    parser.add_argument('--cache-size', type=int, default=256)
+    args = parser.parse_args(argv)
+
+    attributes = [c.strip() for c in args.attributes.split(',') if c.strip()]
+    service = AggregationService(LocalAggregationBackend(args.data, attributes), args.cache_size)
+
+    async def run():
+        server = await service.start(args.host, args.port, args.unix)
+        where = args.unix or f"http://{args.host}:{args.port}"
+        print(f"Aggregation service listening on {where}", flush=True)
+        async with server:
+            await server.serve_forever()
+
+    asyncio.run(run())
+
+
+if __name__ == '__main__':
+    main()
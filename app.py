@@ -1,155 +1,170 @@
 import streamlit as st
-import pandas as pd
 import plotly.graph_objects as go
-import plotly.express as px
-from plotly.subplots import make_subplots
 import numpy as np
+import json
+import os
+
+# pandas (and the modules built on it: ingest, filters, aggregate_store) is imported
+# inside the functions that need it, so the default Overview never pays for it at startup
+from bootstrap import flow_intervals
+from downsample import fit_to_budget, point_budget
+from editions import EDITIONS_DIR as DEFAULT_EDITIONS_DIR, YearCatalog, edition_counts, edition_to_data, latest_edition, list_editions, published_sample, read_edition, status_share_table
+from figure_cache import FigureCache
+from flow_matrix import FlowMatrix
+from insights import flow_insights
+from instrumentation import NullTrace, RerunTrace, append_trace
+from precompile import code_version, load_precompiled_figure, read_manifest
+from scenarios import project_totals, scenario_batch, scenario_flow
+from sankey import build_links, build_multistage_flows, build_node_colors, rgba_palette
+from taxonomy import display_language, load_taxonomy
+
+# Optional respondent-level export (CSV or Parquet) to use instead of the published figures
+DATA_SOURCE = os.environ.get('INTERNATIONALFLOW_DATA')
+# Directory of published survey editions, one <year>.json per edition
+EDITIONS_DIR = os.environ.get('INTERNATIONALFLOW_EDITIONS', DEFAULT_EDITIONS_DIR)
+# Set to pre-render every chart/filter combination into the figure cache at startup
+WARM_FIGURE_CACHE = os.environ.get('INTERNATIONALFLOW_WARM_CACHE', '').lower() in ('1', 'true', 'yes')
+# Directory written by `python precompile.py`; figures are then loaded instead of rebuilt
+FIGURE_DIR = os.environ.get('INTERNATIONALFLOW_FIGURE_DIR')
+YEAR_CACHE_SIZE = int(os.environ.get('INTERNATIONALFLOW_YEAR_CACHE_SIZE', '8'))
+FIGURE_CACHE_SIZE = int(os.environ.get('INTERNATIONALFLOW_FIGURE_CACHE_SIZE', '256'))
+# Time each stage of every rerun (also available from the sidebar) and optionally log traces as JSON lines
+PROFILE_RERUNS = os.environ.get('INTERNATIONALFLOW_PROFILE', '').lower() in ('1', 'true', 'yes')
+TRACE_FILE = os.environ.get('INTERNATIONALFLOW_TRACE_FILE')
+# Shared aggregation service (`python aggregation_service.py`); when set, this replica holds no data itself
+SERVICE_URL = os.environ.get('INTERNATIONALFLOW_SERVICE_URL')
+# Incremental aggregate store written by `python aggregate_store.py ingest`; used instead of the data above
+STORE_DIR = os.environ.get('INTERNATIONALFLOW_STORE')
+# Comma-separated respondent attribute columns to drill down by (e.g. "Nationality,Age Band,Region")
+ATTRIBUTE_COLUMNS = tuple(c.strip() for c in os.environ.get('INTERNATIONALFLOW_ATTRIBUTES', '').split(',') if c.strip())
+# File the loaded data is shared through by every server process on the host (e.g. /dev/shm/internationalflow.bin)
+SHARED_DATA = os.environ.get('INTERNATIONALFLOW_SHARED_DATA')
+# Most respondent rows offered as an in-app download; larger extracts are pointed at `python export.py`
+EXPORT_ROW_LIMIT = int(os.environ.get('INTERNATIONALFLOW_EXPORT_ROWS', '100000'))
+# Comma-separated wave columns in that export (e.g. "Original Reason,Year 1,Year 3,Year 5")
+WAVE_COLUMNS = tuple(c.strip() for c in os.environ.get('INTERNATIONALFLOW_WAVES', '').split(',') if c.strip())
 
 # Complete data structure with absolute numbers
 @st.cache_data
-def load_data():
-    # Corrected cohort sizes (calculated from the survey data percentages)
-    cohort_sizes = {
-        'For a specific job opportunity': 475,
-        'To live with my partner who was living here': 518,
-        'To study/do research': 281,
-        'To seek employment': 216,
-        'My spouse/partner was offered a job': 367
-    }
-    
-    # Percentage breakdowns within each cohort (from the original data)
-    percentage_data = {
-        'For a specific job opportunity': {
-            'Working': 85, 'Applying': 5, 'Studying': 2,  'Stay-at-home': 2, 'Other': 3, 'Left': 4
-        },
-        'To live with my partner who was living here': {
-            'Working': 59, 'Applying': 20, 'Studying': 5,  'Stay-at-home': 5, 'Other': 6, 'Left': 4
-        },
-        'To study/do research': {
-            'Working': 55, 'Applying': 13, 'Studying': 18,  'Stay-at-home': 1, 'Other': 3, 'Left': 9
-        },
-        'To seek employment': {
-            'Working': 53, 'Applying': 23, 'Studying': 10,  'Stay-at-home': 2, 'Other': 3, 'Left': 10
-        },
-        'My spouse/partner was offered a job': {
-            'Working': 48, 'Applying': 22, 'Studying': 4,  'Stay-at-home': 14, 'Other': 6, 'Left': 5
-        }
-    }
-    
-    # Convert percentages to absolute numbers
-    absolute_data = {}
-    for reason, size in cohort_sizes.items():
-        absolute_data[reason] = {}
-        for status, percentage in percentage_data[reason].items():
-            absolute_data[reason][status] = round(size * percentage / 100)
-    
-    # Create comprehensive DataFrame
-    rows = []
-    for original_reason, statuses in percentage_data.items():
-        for current_status, percentage in statuses.items():
-            absolute_count = absolute_data[original_reason][current_status]
-            rows.append({
-                'Original Reason': original_reason,
-                'Current Status': current_status,
-                'Percentage': percentage,
-                'Absolute Count': absolute_count,
-                'Cohort Size': cohort_sizes[original_reason]
-            })
-    
-    return pd.DataFrame(rows), absolute_data, percentage_data, cohort_sizes
-
-# Color scheme - intuitive and accessible
-STATUS_COLORS = {
-    'Working': '#2E8B57',        # Sea Green - positive outcome
-    'Studying': '#4169E1',       # Royal Blue - education
-    'Applying': '#FF8C00',       # Dark Orange - in transition
-    'Stay-at-home': '#9370DB',   # Medium Purple - lifestyle choice
-    'Other': '#708090',          # Slate Gray - unclear
-    'Left': '#DC143C'            # Crimson - negative outcome
-}
-
-REASON_COLORS = {
-    'For a specific job opportunity': STATUS_COLORS['Working'],
-    'To live with my partner who was living here': '#BC8F8F',
-    'To study/do research': STATUS_COLORS['Studying'],
-    'To seek employment': STATUS_COLORS['Applying'],
-    'My spouse/partner was offered a job': '#8B4513'
-}
-
-def create_sankey_diagram(absolute_data, cohort_sizes, selected_node=None):
-    """Create a Sankey diagram showing absolute flows from reasons to outcomes"""
-    
-    reasons = list(absolute_data.keys())
-    statuses = ['Working', 'Studying', 'Applying', 'Stay-at-home', 'Other', 'Left']
-    # Calculate totals for each final status across all cohorts
-    status_totals = {}
-    for status in statuses:
-        total = sum(absolute_data[reason][status] for reason in reasons)        
-        status_totals[status] = total
+def load_data(source=None):
+    if source:
+        # Aggregate raw respondent rows in chunks so memory stays bounded
+        from ingest import load_respondent_file
+        return load_respondent_file(source)
+
+    # Published figures for the latest survey edition
+    return edition_to_data(read_edition(latest_edition(EDITIONS_DIR), EDITIONS_DIR))
+
+@st.cache_resource
+def load_flow_matrix(source=None):
+    # Built once per data source; shared read-only by every rerun and chart
+    if SHARED_DATA:
+        return get_shared_dataset(SHARED_DATA, source, ATTRIBUTE_COLUMNS).flow
+    # The same loader the aggregation service and shared-data publisher use; pandas stays off the edition path
+    from shared_data import build_dataset
+    return build_dataset(source, (), EDITIONS_DIR)[0]
+
+@st.cache_resource
+def get_shared_dataset(path, source, attribute_columns):
+    # Attach zero-copy to data another worker published; the first worker builds and publishes it
+    from shared_data import attach_or_publish, build_dataset, dataset_key
+    key = dataset_key(source, attribute_columns, EDITIONS_DIR)
+    return attach_or_publish(path, key, lambda: build_dataset(source, attribute_columns, EDITIONS_DIR))
+
+@st.cache_data
+def load_published_sample():
+    # Overall figures published with the latest edition, tagged with that edition's fingerprint
+    # (None when there are no editions, e.g. when the data comes from a respondent export or the store)
+    if not list_editions(EDITIONS_DIR):
+        return None
+    edition = read_edition(latest_edition(EDITIONS_DIR), EDITIONS_DIR)
+    sample = published_sample(edition)
+    if sample is None:
+        return None
+    absolute_data, percentage_data, cohort_sizes = edition_counts(edition)
+    return FlowMatrix.from_dicts(absolute_data, cohort_sizes, percentage_data).fingerprint, sample
+
+def current_sample(flow):
+    """(people currently in Denmark, {status: (percent, people)}) for the data on screen.
+
+    The published overall figures cover respondents outside the tracked cohorts too,
+    so they are used whenever the unfiltered published edition is shown; any other
+    data gets them from its own counts, leaving out people who have left.
+    """
+    published = load_published_sample()
+    if published and published[0] == flow.fingerprint:
+        return published[1]
+    statuses = [status for status in flow.statuses if status != 'Left']
+    totals = flow.column_totals[flow.status_columns(statuses)]
+    sample_size = int(totals.sum())
+    shares = np.round(totals * 100 / max(sample_size, 1)).astype(int)
+    return sample_size, {status: (int(share), int(total)) for status, share, total in zip(statuses, shares, totals)}
+
+# Most marks (bars, bubbles) a chart draws; beyond it the smallest cohorts are merged into one
+POINT_BUDGET = point_budget()
 
+# Cohorts (largest first) that get their own slider in the What-if view
+MAX_SCENARIO_SLIDERS = 10
+# Outcome samples drawn for the selected scenario's range
+SCENARIO_DRAWS = 2000
 
+# Category labels and colours (taxonomy.json), in the display language
+TAXONOMY = load_taxonomy(language=display_language())
+STATUSES, REASONS = TAXONOMY.statuses, TAXONOMY.reasons
+
+def status_label(status):
+    """Display label of one status (also the status widgets' format_func)"""
+    return STATUSES.long([status])[0]
+
+def create_sankey_diagram(flow, selected_node=None):
+    """Create a Sankey diagram showing absolute flows from reasons to outcomes"""
+    
+    # One link per reason and status, up to the point budget; smaller cohorts beyond it are merged
+    flow = fit_to_budget(flow, POINT_BUDGET)
+    reasons = flow.reasons
+    statuses = STATUSES.order(flow.statuses)
+    status_columns = flow.status_columns(statuses)
+    # Status totals across all cohorts come precomputed with the flow matrix
+    status_totals = flow.column_totals[status_columns]
+    counts = flow.counts[:, status_columns]
     
     # Create node lists with cohort sizes
-    source_nodes = [f"{reason}\n({cohort_sizes[reason]} people in total)" for reason in reasons]
-    target_nodes = [f"Now: {status}\n({status_totals[status]} people in total)" for status in statuses]
+    source_nodes = [f"{label}\n({size} people in total)" for label, size in zip(REASONS.long(reasons), flow.cohort_sizes)]
+    target_nodes = [f"Now: {label}\n({total} people in total)" for label, total in zip(STATUSES.long(statuses), status_totals)]
     all_nodes = source_nodes + target_nodes
     
-    # Create links with absolute numbers
-    source_indices = []
-    target_indices = []
-    values = []
-    colors = []
-    
-    for i, reason in enumerate(reasons):
-        for j, status in enumerate(statuses):
-            count = absolute_data[reason][status]
-            if count > 0:  # Only include non-zero flows
-                source_indices.append(i)
-                target_indices.append(len(reasons) + j)
-                values.append(count)
-                
-                # Color logic based on selection
-                if selected_node is None:
-                    colors.append(f"rgba{tuple(list(px.colors.hex_to_rgb(STATUS_COLORS[status])) + [0.6])}")
-                else:
-                    # Check if this flow should be highlighted
-                    reason_match = (selected_node == reason or 
-                                  selected_node in source_nodes[i])
-                    status_match = (selected_node == f"Now: {status}" or 
-                                  selected_node == status)
-                    
-                    if reason_match or status_match:
-                        colors.append(f"rgba{tuple(list(px.colors.hex_to_rgb(STATUS_COLORS[status])) + [0.8])}")
-                    else:
-                        colors.append("rgba(200, 200, 200, 0.3)")
+    # Highlight masks: a selection matches a reason, or a status with or without the "Now: " prefix
+    if selected_node is None:
+        link_highlight = node_highlight = None
+    else:
+        reason_match = np.array([selected_node == reason for reason in reasons])
+        status_match = np.array([selected_node in (status, f"Now: {status}") for status in statuses])
+        link_highlight = reason_match[:, None] | status_match[None, :]
+        node_highlight = np.concatenate([reason_match, status_match])
+    
+    # Create links with absolute numbers, colored by final status
+    status_codes = STATUSES.encode(statuses)
+    source_indices, target_indices, values, colors = build_links(
+        counts, 0, len(reasons),
+        palette=STATUSES.palette(0.6)[status_codes],
+        highlighted_palette=STATUSES.palette(0.8)[status_codes],
+        highlight=link_highlight
+    )
     
     # Node colors with highlighting
-    node_colors = []
-    for i, node in enumerate(all_nodes):
-        if selected_node is None:
-            if i < len(reasons):  # Source node
-                node_colors.append(REASON_COLORS.get(reasons[i], '#808080'))
-            else:  # Target node
-                status_name = node.replace('Now: ', '')
-                node_colors.append(STATUS_COLORS.get(status_name, '#808080'))
-        else:
-            # Highlight logic
-            should_highlight = False
-            if i < len(reasons):  # Source node
-                should_highlight = (selected_node == reasons[i] or selected_node in node)
-            else:  # Target node
-                status_name = node.replace('Now: ', '')
-                should_highlight = (selected_node == f"Now: {status_name}" or 
-                                  selected_node == status_name)
-            
-            if should_highlight:
-                if i < len(reasons):
-                    node_colors.append(REASON_COLORS.get(reasons[i], '#808080'))
-                else:
-                    status_name = node.replace('Now: ', '')
-                    node_colors.append(STATUS_COLORS.get(status_name, '#808080'))
-            else:
-                node_colors.append('rgba(200, 200, 200, 0.7)')
+    node_palette = np.concatenate([REASONS.color(reasons), STATUSES.colors[status_codes]])
+    node_colors = build_node_colors(node_palette, node_highlight)
+    
+    # Bootstrap confidence intervals for each flow and each status total, shown on hover
+    # (only for the statuses drawn, so the interval columns line up with the link targets)
+    intervals = flow_intervals(flow, statuses=statuses)
+    link_rows, link_cols = source_indices, target_indices - len(reasons)
+    link_ci = np.column_stack([intervals.flow_lower[link_rows, link_cols],
+                               intervals.flow_upper[link_rows, link_cols]])
+    node_ci = [''] * len(reasons) + [
+        f"<br>{intervals.label}: {lower:.0f}–{upper:.0f} people"
+        for lower, upper in zip(intervals.total_lower, intervals.total_upper)
+    ]
     
     fig = go.Figure(data=[go.Sankey(
         node=dict(
@@ -158,14 +173,18 @@ def create_sankey_diagram(absolute_data, cohort_sizes, selected_node=None):
             line=dict(color="white", width=2),
             label=all_nodes,
             color=node_colors,
+            customdata=node_ci,
+            hovertemplate='%{label}%{customdata}<extra></extra>'
         ),
         link=dict(
             source=source_indices,
             target=target_indices,
             value=values,
             color=colors,
-            # Custom hover text showing absolute numbers
-            hovertemplate='%{source.label} → %{target.label}<br>%{value} people<extra></extra>'
+            customdata=link_ci,
+            # Custom hover text showing absolute numbers and their uncertainty
+            hovertemplate='%{source.label} → %{target.label}<br>%{value} people'
+                          f'<br>{intervals.label}: ' '%{customdata[0]:.0f}–%{customdata[1]:.0f}<extra></extra>'
         )
     )])
     
@@ -183,56 +202,47 @@ def create_sankey_diagram(absolute_data, cohort_sizes, selected_node=None):
     
     return fig
 
-def create_stacked_bar_chart(df, use_absolute=False):
+def create_stacked_bar_chart(flow, use_absolute=False):
     """Create stacked bar chart with option for absolute or percentage view"""
     
+    status_order = TAXONOMY.stack_order
+    # Statuses without their own colour go into "Other"; the smallest cohorts are merged past the budget
+    flow = fit_to_budget(flow, POINT_BUDGET, statuses=status_order)
+    
     if use_absolute:
         # Use absolute counts
-        pivot_df = df.pivot(index='Original Reason', columns='Current Status', values='Absolute Count').fillna(0)
+        values = flow.counts
         title_suffix = "(Absolute Numbers)"
         value_format = lambda x: f'{int(x)}' if x > 5 else ''
         x_title = "Number of People"
     else:
         # Use percentages
-        pivot_df = df.pivot(index='Original Reason', columns='Current Status', values='Percentage').fillna(0)
+        values = flow.percentages
         title_suffix = "(Percentages)"
-        value_format = lambda x: f'{x}%' if x > 3 else ''
+        value_format = lambda x: f'{x:g}%' if x > 3 else ''
         x_title = "Percentage"
     
-    # Sort by working rate and create short labels
-    working_col = 'Working'
-    if use_absolute:
-        # For absolute numbers, sort by percentage but display absolute
-        percentage_pivot = df.pivot(index='Original Reason', columns='Current Status', values='Percentage').fillna(0)
-        sort_order = percentage_pivot.sort_values('Working', ascending=True).index
-        pivot_df = pivot_df.reindex(sort_order)
-    else:
-        pivot_df = pivot_df.sort_values('Working', ascending=True)
+    # Sort by working rate (always by percentage, even when displaying absolute numbers)
+    sort_order = np.argsort(flow.percentages[:, flow.status_index['Working']], kind='stable')
+    sorted_values = values[sort_order]
     
-    short_labels = {
-        'For a specific job opportunity': 'Job opportunity',
-        'To live with my partner who was living here': 'Joined partner',
-        'To study/do research': 'Study/research',
-        'To seek employment': 'Sought job',
-        'My spouse/partner was offered a job': 'Spouse job offer'
-    }
-    pivot_df.index = pivot_df.index.map(short_labels)
+    labels = REASONS.short(flow.reasons)[sort_order].tolist()
 
     fig = go.Figure()
-    status_order = ['Working', 'Studying', 'Other', 'Stay-at-home', 'Applying', 'Left']
     
-    for status in status_order:
-        if status in pivot_df.columns:
+    for status, label, color in zip(status_order, STATUSES.long(status_order), STATUSES.color(status_order)):
+        if status in flow.status_index:
+            column = sorted_values[:, flow.status_index[status]]
             fig.add_trace(go.Bar(
-                name=status,
-                x=pivot_df[status],
-                y=pivot_df.index,
+                name=label,
+                x=column,
+                y=labels,
                 orientation='h',
-                marker_color=STATUS_COLORS[status],
-                text=pivot_df[status].apply(value_format),
+                marker_color=color,
+                text=[value_format(x) for x in column],
                 textposition='inside',
                 textfont=dict(color='white', size=10, family="Arial Bold"),
-                hovertemplate=f'{status}: %{{x}}<extra></extra>'
+                hovertemplate=f'{label}: %{{x}}<extra></extra>'
             ))
 
     fig.update_layout(
@@ -242,55 +252,61 @@ def create_stacked_bar_chart(df, use_absolute=False):
         barmode='stack',
         height=500,
         legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1),
-        yaxis=dict(categoryorder='array', categoryarray=pivot_df.index.tolist())
+        yaxis=dict(categoryorder='array', categoryarray=labels)
     )
 
     return fig
 
-def create_cohort_overview(cohort_sizes, absolute_data):
+def create_cohort_overview(flow):
     """Create an overview chart showing cohort sizes and outcomes"""
     
-    # Calculate working counts for each cohort
-    cohort_data = []
-    for reason, size in cohort_sizes.items():
-        working_count = absolute_data[reason]['Working']
-        working_rate = round(working_count / size * 100, 1)
-        
-        cohort_data.append({
-            'Reason': reason,
-            'Total Size': size,
-            'Working Count': working_count,
-            'Working Rate': working_rate
-        })
+    # One bubble per cohort, up to the point budget; smaller cohorts beyond it are merged
+    flow = fit_to_budget(flow, POINT_BUDGET, marks_per_reason=1)
     
-    cohort_df = pd.DataFrame(cohort_data)
+    # Working counts and rates for each cohort come straight from the flow matrix
+    # Only the working column is bootstrapped; the other statuses are drawn as one
+    intervals = flow_intervals(flow, statuses=('Working',))
+    working_count = flow.column('Working')
+    working_rate = flow.working_rates
+    count_low, count_high = intervals.flow_lower[:, 0], intervals.flow_upper[:, 0]
+    rate_low, rate_high = intervals.rate_lower[:, 0], intervals.rate_upper[:, 0]
     
-    # Create bubble chart
+    # Create bubble chart: a single trace with per-cohort arrays, so the payload grows by values, not traces
     fig = go.Figure()
     
-    for _, row in cohort_df.iterrows():
-        fig.add_trace(go.Scatter(
-            x=[row['Working Rate']],
-            y=[row['Working Count']],
-            mode='markers+text',
-            marker=dict(
-                size=row['Total Size'] / 10,  # Scale bubble size
-                color=REASON_COLORS.get(row['Reason'], '#808080'),
-                opacity=0.7,
-                line=dict(width=2, color='white')
-            ),
-            text=row['Reason'].replace(' who was living here', '').replace('My spouse/partner was offered a job', 'Spouse job'),
-            textposition="middle center",
-            textfont=dict(size=11, color='black', family="Arial Bold"),
-            hovertemplate=f"<b>{row['Reason']}</b><br>" +
-                         f"Total cohort: {row['Total Size']} people<br>" +
-                         f"Currently working: {row['Working Count']} people<br>" +
-                         f"Working rate: {row['Working Rate']}%<extra></extra>",
-            showlegend=False
-        ))
+    # Bubble diameter is a tenth of the cohort size, scaled down when cohorts are large
+    bubble_scale = min(0.1, 60 / max(int(flow.cohort_sizes.max()), 1))
+    fig.add_trace(go.Scatter(
+        x=working_rate,
+        y=working_count,
+        mode='markers+text',
+        # Bootstrap confidence intervals as error bars on both axes
+        error_x=dict(type='data', symmetric=False, color='gray', thickness=1,
+                     array=rate_high - working_rate, arrayminus=working_rate - rate_low),
+        error_y=dict(type='data', symmetric=False, color='gray', thickness=1,
+                     array=count_high - working_count, arrayminus=working_count - count_low),
+        marker=dict(
+            size=flow.cohort_sizes * bubble_scale,
+            color=REASONS.color(flow.reasons),
+            opacity=0.7,
+            line=dict(width=2, color='white')
+        ),
+        text=REASONS.short(flow.reasons),
+        textposition="middle center",
+        textfont=dict(size=11, color='black', family="Arial Bold"),
+        hovertext=REASONS.long(flow.reasons),
+        customdata=np.column_stack([flow.cohort_sizes, count_low, count_high, rate_low, rate_high]),
+        hovertemplate="<b>%{hovertext}</b><br>" +
+                     "Total cohort: %{customdata[0]} people<br>" +
+                     "Currently working: %{y} people " +
+                     f"({intervals.label}: %{{customdata[1]:.0f}}–%{{customdata[2]:.0f}})<br>" +
+                     "Working rate: %{x}% " +
+                     f"({intervals.label}: %{{customdata[3]}}–%{{customdata[4]}}%)<extra></extra>",
+        showlegend=False
+    ))
     
     fig.update_layout(
-        title="Cohort Sizes vs Working Outcomes (Bubble size = cohort size)",
+        title=f"Cohort Sizes vs Working Outcomes (Bubble size = cohort size, bars = {intervals.label})",
         xaxis_title="Working Rate (%)",
         yaxis_title="Number Currently Working",
         height=500,
@@ -300,6 +316,340 @@ def create_cohort_overview(cohort_sizes, absolute_data):
     
     return fig
 
+@st.cache_resource
+def get_aggregation_client(url):
+    # One pooled client per server process, shared by all sessions
+    from aggregation_service import AggregationClient
+    return AggregationClient(url)
+
+@st.cache_resource
+def open_aggregate_store(path):
+    from aggregate_store import AggregateStore
+    return AggregateStore(path)
+
+@st.cache_resource(max_entries=64)
+def load_store_flow(path, version, waves, attribute, values):
+    # Keyed by store version, so a newly ingested batch is picked up on the next rerun
+    return open_aggregate_store(path).flow(list(waves), attribute, list(values))
+
+@st.cache_resource
+def load_drilldown_index(source, attribute_columns):
+    # Bitmap index over respondent attributes, built once and shared by every session
+    if SHARED_DATA:
+        return get_shared_dataset(SHARED_DATA, source, attribute_columns).index
+    from filters import load_respondent_index
+    return load_respondent_index(source, attribute_columns)
+
+@st.cache_resource
+def get_year_catalog(editions_dir, store_dir=None):
+    # Each year's data loads on first use (bounded LRU); a store's catalog follows its refreshed
+    # waves and version, so newly ingested batches show up without restarting
+    if store_dir:
+        return YearCatalog.from_store(open_aggregate_store(store_dir), maxsize=YEAR_CACHE_SIZE)
+    return YearCatalog.from_directory(editions_dir, maxsize=YEAR_CACHE_SIZE)
+
+@st.cache_resource
+def get_figure_cache():
+    # One cache per server process, shared by all sessions
+    return FigureCache(maxsize=FIGURE_CACHE_SIZE)
+
+@st.cache_resource
+def precompiled_figure_dir(fingerprint):
+    # Only trust precompiled figures that were built from the same data by the same chart code
+    manifest = read_manifest(FIGURE_DIR) if FIGURE_DIR else None
+    if manifest is None or manifest.get('fingerprint') != fingerprint or manifest.get('code_version') != code_version(TAXONOMY.language, POINT_BUDGET):
+        return None
+    return FIGURE_DIR
+
+def cached_figure(flow, builder, *params, trace=NullTrace()):
+    """Return builder(flow, *params), reusing a cached or precompiled figure for the same data and view"""
+    key = (builder.__name__, flow.fingerprint) + params
+    built = []
+    
+    def build():
+        built.append(True)
+        figure_dir = precompiled_figure_dir(flow.fingerprint)
+        if figure_dir:
+            fig = load_precompiled_figure(figure_dir, builder.__name__, params)
+            if fig is not None:
+                return fig
+        return builder(flow, *params)
+    
+    with trace.stage(f"figure: {builder.__name__}"):
+        fig = get_figure_cache().get_or_build(key, build)
+    trace.count('figure cache miss' if built else 'figure cache hit')
+    return fig
+
+def figure_views(flow):
+    """Every (builder, params) combination the dashboard can request for this data"""
+    views = [(create_stacked_bar_chart, (use_absolute,)) for use_absolute in (True, False)]
+    views.append((create_cohort_overview, ()))
+    for selected_node in [None] + flow.reasons + STATUSES.order(flow.statuses):
+        views.append((create_sankey_diagram, (selected_node,)))
+    if 'Working' in flow.status_index:
+        views.append((create_sensitivity_chart, ('Working', False)))
+    return views
+
+@st.cache_resource
+def warm_figure_cache(fingerprint, _flow):
+    # Keyed by fingerprint so each dataset is pre-rendered once per process
+    for builder, params in figure_views(_flow):
+        cached_figure(_flow, builder, *params)
+    return len(get_figure_cache())
+
+@st.cache_resource
+def load_transition_model(source, wave_columns):
+    # Per-reason status transitions pooled over consecutive waves; projections are cached on the model
+    from ingest import load_transition_file
+    from transitions import transition_model
+    return transition_model(*load_transition_file(source, wave_columns))
+
+@st.cache_data
+def load_wave_flows(source, wave_columns):
+    from ingest import load_wave_file
+    return load_wave_file(source, wave_columns)
+
+def create_multistage_sankey(stage_labels, transitions, stage_names, min_value=0):
+    """Create a Sankey diagram chaining several survey waves (one transition matrix per step)"""
+    
+    node_offsets, node_totals, sources, targets, values = build_multistage_flows(transitions, min_value)
+    
+    # Node labels and colors, laid out stage by stage in the same order as the engine's indices
+    labels = []
+    for k, (name, stage) in enumerate(zip(stage_names, stage_labels)):
+        stage_totals = node_totals[node_offsets[k]:node_offsets[k] + len(stage)]
+        labels.extend(f"{name}: {label}\n({total} people)" for label, total in zip(stage, stage_totals))
+    node_hex = tuple(TAXONOMY.color_of(label) for stage in stage_labels for label in stage)
+    
+    # Each link takes the color of the category it flows into
+    link_colors = rgba_palette(node_hex, 0.6)[targets]
+    
+    fig = go.Figure(data=[go.Sankey(
+        node=dict(
+            pad=15,
+            thickness=20,
+            line=dict(color="white", width=1),
+            label=labels,
+            color=list(node_hex),
+        ),
+        link=dict(
+            source=sources,
+            target=targets,
+            value=values,
+            color=link_colors,
+            hovertemplate='%{source.label} → %{target.label}<br>%{value} people<extra></extra>'
+        )
+    )])
+    
+    title_text = f"Flow Across Survey Waves ({' → '.join(stage_names)})"
+    if min_value > 1:
+        title_text += f" (Flows under {min_value} people hidden)"
+    
+    fig.update_layout(
+        title=title_text,
+        height=700,
+        font=dict(family="Arial", size=14, color="gray"),
+        paper_bgcolor='white',
+        plot_bgcolor='white'
+    )
+    
+    return fig
+
+def create_trend_chart(share_table, status):
+    """Create a line chart of each reason's share in one status across survey years"""
+    
+    fig = go.Figure()
+    years = [str(year) for year in share_table.index]
+    status_text = status_label(status)
+    
+    reasons = list(share_table.columns)
+    for reason, label, color in zip(reasons, REASONS.long(reasons), REASONS.color(reasons)):
+        fig.add_trace(go.Scatter(
+            x=years,
+            y=share_table[reason],
+            mode='lines+markers',
+            name=label,
+            line=dict(color=color, width=3),
+            connectgaps=False,
+            hovertemplate=f"<b>{label}</b><br>%{{x}}: %{{y}}% {status_text}<extra></extra>"
+        ))
+    
+    fig.update_layout(
+        title=f"Share Currently '{status_text}' by Original Reason, per Survey Year",
+        xaxis_title="Survey Year",
+        yaxis_title=f"% of cohort {status_text}",
+        xaxis=dict(type='category'),
+        height=500,
+        legend=dict(orientation="h", yanchor="top", y=-0.2, xanchor="left", x=0),
+        paper_bgcolor='white',
+        plot_bgcolor='white'
+    )
+    
+    return fig
+
+def create_scenario_totals_chart(flow, projected, lower=None, upper=None):
+    """Create grouped bars of current vs projected status totals for one scenario"""
+    
+    fig = go.Figure()
+    fig.add_trace(go.Bar(
+        name="Current",
+        x=flow.statuses,
+        y=flow.column_totals,
+        marker_color='rgba(160, 160, 160, 0.6)',
+        hovertemplate="%{x}: %{y:,} people now<extra></extra>"
+    ))
+    error_y = None
+    if lower is not None:
+        # Spread of the sampled outcomes around the expected projection
+        error_y = dict(type='data', symmetric=False, color='gray', thickness=1,
+                       array=upper - projected, arrayminus=projected - lower)
+    fig.add_trace(go.Bar(
+        name="Scenario",
+        x=flow.statuses,
+        y=np.round(projected),
+        marker_color=STATUSES.color(flow.statuses),
+        error_y=error_y,
+        hovertemplate="%{x}: %{y:,.0f} people in this scenario<extra></extra>"
+    ))
+    
+    fig.update_layout(
+        title="Current vs Projected People in Each Status",
+        yaxis_title="Number of People",
+        barmode='group',
+        height=450,
+        legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1),
+        paper_bgcolor='white',
+        plot_bgcolor='white'
+    )
+    
+    return fig
+
+def create_sensitivity_chart(flow, status, stochastic=False):
+    """Create a tornado chart of how each cohort's growth moves the overall share in one status"""
+    
+    # One bar per cohort, so the smallest cohorts are merged to fit the budget; every status is kept
+    flow = fit_to_budget(flow, POINT_BUDGET, marks_per_reason=1, statuses=flow.statuses)
+    batch = scenario_batch(flow, stochastic=stochastic)
+    effects = batch.effect(status)
+    order = np.argsort(np.abs(effects), kind='stable')
+    labels = REASONS.short(flow.reasons)[order].tolist()
+    low, high = batch.share_range(status)
+    
+    fig = go.Figure(go.Bar(
+        x=effects[order],
+        y=labels,
+        orientation='h',
+        marker_color=np.where(effects[order] >= 0, STATUSES.color_of('Working'), STATUSES.color_of('Left')),
+        hovertemplate="%{y}: %{x:+.2f} pp per +10% arrivals<extra></extra>"
+    ))
+    
+    fig.update_layout(
+        title=f"Effect on Overall '{status_label(status)}' Share per +10% Arrivals "
+              f"({len(batch.multipliers):,} scenarios, 90% of them between {low:.1f}% and {high:.1f}%)",
+        xaxis_title="Percentage points",
+        height=max(350, 40 * len(labels)),
+        paper_bgcolor='white',
+        plot_bgcolor='white'
+    )
+    
+    return fig
+
+def create_projection_chart(model, status, steps):
+    """Create a line chart of each cohort's projected share in one status, ending at the long-run share"""
+    
+    shares = model.share(status, steps)
+    steady = model.steady_state()[:, model.statuses.index(status)] * 100
+    status_text = status_label(status)
+    horizon = ["Now"] + [f"+{step}" for step in range(1, steps + 1)]
+    
+    fig = go.Figure()
+    reasons = model.reasons
+    for i, (reason, label, color) in enumerate(zip(REASONS.long(reasons), REASONS.short(reasons), REASONS.color(reasons))):
+        fig.add_trace(go.Scatter(
+            x=horizon + ["Long run"],
+            y=np.append(shares[:, i], steady[i]),
+            mode='lines+markers',
+            name=label,
+            line=dict(color=color, width=3),
+            hovertemplate=f"<b>{reason}</b><br>%{{x}}: %{{y:.1f}}% {status_text}<extra></extra>"
+        ))
+    
+    fig.update_layout(
+        title=f"Projected Share '{status_text}' by Original Reason (waves ahead)",
+        xaxis_title="Survey waves from the latest one",
+        yaxis_title=f"% of cohort {status_text}",
+        xaxis=dict(type='category'),
+        height=500,
+        legend=dict(orientation="h", yanchor="top", y=-0.2, xanchor="left", x=0),
+        paper_bgcolor='white',
+        plot_bgcolor='white'
+    )
+    
+    return fig
+
+def create_timing_waterfall(trace):
+    """Create a waterfall of the stages timed during one rerun"""
+    
+    names = [name for name, _, _ in trace.stages]
+    offsets = [offset * 1000 for _, offset, _ in trace.stages]
+    durations = [duration * 1000 for _, _, duration in trace.stages]
+    
+    fig = go.Figure(go.Bar(
+        x=durations,
+        base=offsets,
+        y=names,
+        orientation='h',
+        marker_color=STATUSES.color_of('Studying'),
+        text=[f"{d:.1f} ms" for d in durations],
+        textposition='outside',
+        hovertemplate='%{y}<br>starts at %{base:.1f} ms, takes %{x:.1f} ms<extra></extra>'
+    ))
+    
+    fig.update_layout(
+        title=f"Rerun Timing ({trace.total_seconds * 1000:.0f} ms total)",
+        xaxis_title="Milliseconds since rerun start",
+        height=max(250, 40 * len(names) + 120),
+        yaxis=dict(autorange='reversed'),
+        paper_bgcolor='white',
+        plot_bgcolor='white'
+    )
+    
+    return fig
+
+def export_data_section(flow, selection):
+    """Download buttons for the current slice; files are only encoded, in chunks, when clicked"""
+    from export import EXPORT_FORMATS, ExportStream, available_formats, flow_batches, iter_export, respondent_batches, summary_batches
+    
+    export_format = st.selectbox("Format:", available_formats(), format_func=str.upper, key='export_format')
+    mime, extension = EXPORT_FORMATS[export_format]
+    downloads = [
+        ("Flow matrix", "flow_matrix", lambda: flow_batches(flow)),
+        ("Cohort summary", "cohort_summary", lambda: summary_batches(flow)),
+    ]
+    # Respondent rows exist only for microdata loaded in this process. Streamlit holds a download's
+    # whole file in memory, so only extracts up to EXPORT_ROW_LIMIT rows are offered here
+    respondent_note = None
+    if DATA_SOURCE and not STORE_DIR and not SERVICE_URL:
+        if flow.grand_total <= EXPORT_ROW_LIMIT:
+            downloads.append(("Respondent rows", "respondents",
+                              lambda: respondent_batches(DATA_SOURCE, selection, max_rows=EXPORT_ROW_LIMIT)))
+        else:
+            filters = json.dumps({name: list(values) for name, values in selection.items() if values})
+            respondent_note = (f"Respondent rows: {flow.grand_total:,} match, more than the {EXPORT_ROW_LIMIT:,} "
+                               f"offered here. Export them with `python export.py respondents{extension} "
+                               f"--data {DATA_SOURCE} --filters '{filters}'`.")
+    
+    for label, stem, batches in downloads:
+        st.download_button(
+            f"⬇️ {label}",
+            data=lambda batches=batches: ExportStream(iter_export(batches(), export_format)),
+            file_name=stem + extension,
+            mime=mime,
+            key=f"export:{stem}"
+        )
+    if respondent_note:
+        st.caption(respondent_note)
+
 def main():
     st.set_page_config(
         page_title="Danish Journey Analyser",
@@ -308,8 +658,65 @@ def main():
         initial_sidebar_state="expanded"
     )
     
+    # Instrumentation is opt-in: env var or the sidebar checkbox (read from the previous run's state)
+    profiling = PROFILE_RERUNS or st.session_state.get('show_timings', False)
+    trace = RerunTrace() if profiling or TRACE_FILE else NullTrace()
+    
     # Load all data
-    df, absolute_data, percentage_data, cohort_sizes = load_data()
+    with trace.stage("load data"):
+        if SERVICE_URL:
+            # Thin-client mode: the shared aggregation service owns the data
+            service = get_aggregation_client(SERVICE_URL)
+            flow = service.flow()
+        elif STORE_DIR:
+            # Every wave in the store; the editions directory isn't read at all
+            store = open_aggregate_store(STORE_DIR)
+            store.refresh()
+            flow = load_store_flow(STORE_DIR, store.version, (), None, ())
+        else:
+            flow = load_flow_matrix(DATA_SOURCE)
+    if WARM_FIGURE_CACHE:
+        with trace.stage("warm figure cache"):
+            warm_figure_cache(flow.fingerprint, flow)
+    
+    # Drill-down filters currently applied to respondent-level data
+    selection = {}
+    
+    # Merge the incremental store's partials for the selected waves (and attribute values)
+    if STORE_DIR:
+        with st.sidebar:
+            st.header("Survey Waves")
+            waves = st.multiselect("Waves", store.waves, placeholder="All waves")
+            attribute = st.selectbox("Break down by", ["None"] + list(store.attributes))
+            values = []
+            if attribute != "None":
+                values = st.multiselect(attribute, store.attributes[attribute], placeholder="All")
+            st.markdown("---")
+        with trace.stage("merge store partials"):
+            flow = load_store_flow(STORE_DIR, store.version, tuple(waves),
+                                   None if attribute == "None" else attribute, tuple(values))
+        if flow.grand_total == 0:
+            st.warning("No respondents match the selected waves and filters.")
+            st.stop()
+    
+    # Drill down by respondent attributes when microdata with attribute columns is loaded
+    elif SERVICE_URL or (DATA_SOURCE and ATTRIBUTE_COLUMNS):
+        with trace.stage("load drill-down index"):
+            drilldown = service if SERVICE_URL else load_drilldown_index(DATA_SOURCE, ATTRIBUTE_COLUMNS)
+            attribute_values = drilldown.values
+        selection = {}
+        if attribute_values:
+            with st.sidebar:
+                st.header("Drill Down")
+                selection = {name: st.multiselect(name, values, placeholder="All")
+                             for name, values in attribute_values.items()}
+                st.markdown("---")
+        if any(selection.values()):
+            with trace.stage("filter respondents"):
+                flow = drilldown.flow(selection)
+            if flow.grand_total == 0:
+                st.warning("No respondents match the selected filters.")
+                st.stop()
     
     # Header
     st.title("🇩🇰 From Arrival to Current Circumstances")
@@ -319,14 +726,15 @@ def main():
     """)
     
     # Key statistics at the top
+    sample_size, overall = current_sample(flow)
     col1, col2, col3 = st.columns(3)
     with col1:
-        total_original = sum(cohort_sizes.values())
+        total_original = flow.total_cohort_size
         st.metric("Original Cohorts", f"{total_original:,}", help="Estimated total people in tracked categories. The number is smaller because of rounding, dropping certain categories like refugees out of the analysis and possibly people have multiple motivations for coming to Denmark")
     with col2:
-        st.metric("Current Sample", "2,028", help="People currently in Denmark")
+        st.metric("Current Sample", f"{sample_size:,}", help="People currently in Denmark")
     with col3:
-        total_working = sum(data['Working'] for data in absolute_data.values())
+        total_working = flow.status_total('Working')
         st.metric("Currently Working", f"{total_working:,}", help="Total people working across all cohorts")
                 
     # Sidebar controls
@@ -335,7 +743,10 @@ def main():
         
         view_mode = st.selectbox(
             "Choose Analysis View:",
-            ["📊 Overview Dashboard", "🌊 Flow Analysis", "💡 Cohort Comparison"])
+            ["📊 Overview Dashboard", "🌊 Flow Analysis", "💡 Cohort Comparison", "🧪 What-if Scenarios"]
+            + (["🔁 Multi-wave Flow"] if DATA_SOURCE and len(WAVE_COLUMNS) > 1 else [])
+            + (["🔮 Projection"] if DATA_SOURCE and len(WAVE_COLUMNS) > 2 else [])
+            + (["📈 Trends"] if len(get_year_catalog(EDITIONS_DIR, STORE_DIR).years) > 1 else []))
         
         st.markdown("---")
         # Only show the toggle on Overview Dashboard
@@ -344,36 +755,42 @@ def main():
                                help="Toggle between absolute counts and percentages")
         else:
             show_absolute = True  # Default to True for other views    
+        
+        st.checkbox("Show performance timings", value=PROFILE_RERUNS, key='show_timings',
+                    help="Time each stage of the page and count figure cache hits")
+        
+        st.markdown("---")
+        st.header("Export")
+        export_data_section(flow, selection)
     # Main content area
     if view_mode == "📊 Overview Dashboard":
         col1, col2 = st.columns([3, 2])
         
         with col1:
             st.subheader("Current Status Distribution")
-            fig_stacked = create_stacked_bar_chart(df, use_absolute=show_absolute)
-            st.plotly_chart(fig_stacked, use_container_width=True)
+            fig_stacked = cached_figure(flow, create_stacked_bar_chart, show_absolute, trace=trace)
+            with trace.stage("render: st.plotly_chart"):
+                st.plotly_chart(fig_stacked, use_container_width=True)
         
         with col2:
             st.subheader("Key Insights")
             
             # Cohort size insights
-            largest_cohort = max(cohort_sizes, key=cohort_sizes.get)
-            smallest_cohort = min(cohort_sizes, key=cohort_sizes.get)
+            insights = flow_insights(flow, labels=REASONS.short_map(), status_labels=STATUSES.long_map())
+            largest_cohort = flow.reasons[insights.largest]
+            smallest_cohort = flow.reasons[insights.smallest]
             
-            st.metric("Largest Cohort", f"{cohort_sizes[largest_cohort]} people", 
-                     help=f"{largest_cohort}")
-            st.metric("Smallest Cohort", f"{cohort_sizes[smallest_cohort]} people", 
-                     help=f"{smallest_cohort}")
+            st.metric("Largest Cohort", f"{flow.cohort_size(largest_cohort)} people", 
+                     help=REASONS.long([largest_cohort])[0])
+            st.metric("Smallest Cohort", f"{flow.cohort_size(smallest_cohort)} people", 
+                     help=REASONS.long([smallest_cohort])[0])
             
                        
             # Overall statistics
             st.markdown("---")
-            st.markdown("**Overall Sample (n=2,028)**")
-            st.markdown("• Working: 68% (1,380 people)")
-            st.markdown("• Applying: 14% (284 people)")
-            st.markdown("• Studying: 7% (142 people)")
-            st.markdown("• Stay-at-home: 4% (81 people)")
-            st.markdown("• Other: 6% (122 people)")
+            st.markdown(f"**Overall Sample (n={sample_size:,})**")
+            for label, (percentage, people) in zip(STATUSES.long(list(overall)), overall.values()):
+                st.markdown(f"• {label}: {percentage}% ({people:,} people)")
     
     elif view_mode == "🌊 Flow Analysis":
         st.subheader("Journey Flow: From Intention to Reality")
@@ -381,18 +798,22 @@ def main():
         # Interactive selection
         col1, col2, col3 = st.columns([1, 2, 1])
         with col2:
-            filter_options = ["Show All"] + list(cohort_sizes.keys()) + list(STATUS_COLORS.keys())
+            statuses = STATUSES.order(flow.statuses)
+            filter_labels = dict(zip(flow.reasons, REASONS.long(flow.reasons)))
+            filter_labels.update(zip(statuses, STATUSES.long(statuses)))
             selected_filter = st.selectbox(
                 "🎯 Focus on specific reason or outcome:",
-                filter_options,
+                ["Show All"] + flow.reasons + statuses,
+                format_func=lambda option: filter_labels.get(option, option),
                 help="Select a category to highlight its flows and grey out others"
             )
         
         # Determine what to highlight
         selected_node = None if selected_filter == "Show All" else selected_filter
         
-        fig_sankey = create_sankey_diagram(absolute_data, cohort_sizes, selected_node)
-        st.plotly_chart(fig_sankey, use_container_width=True)
+        fig_sankey = cached_figure(flow, create_sankey_diagram, selected_node, trace=trace)
+        with trace.stage("render: st.plotly_chart"):
+            st.plotly_chart(fig_sankey, use_container_width=True)
         
         # Add interpretation
         st.markdown("""
@@ -407,58 +828,61 @@ def main():
         # Show detailed stats for selected category
         if selected_node and selected_node != "Show All":
             st.markdown("---")
-            if selected_node in absolute_data:
+            if selected_node in flow.reason_index:
                 # Selected an original reason
-                reason_stats = absolute_data[selected_node]
-                cohort_size = cohort_sizes[selected_node]
-                st.subheader(f"📊 Detailed Breakdown: {selected_node}")
+                reason_row = flow.reason_index[selected_node]
+                reason_stats = dict(zip(flow.statuses, flow.counts[reason_row].tolist()))
+                cohort_size = flow.cohort_size(selected_node)
+                st.subheader(f"📊 Detailed Breakdown: {REASONS.long([selected_node])[0]}")
                 st.markdown(f"**Original cohort size**: {cohort_size:,} people")
                 
                 # Create columns for each status
                 status_cols = st.columns(len(reason_stats))
+                status_colors, status_tints = STATUSES.color(flow.statuses), STATUSES.rgba(flow.statuses, 0.1)
+                status_labels = STATUSES.long(flow.statuses)
                 for i, (status, count) in enumerate(reason_stats.items()):
                     with status_cols[i]:
                         percentage = round(count / cohort_size * 100, 1) if cohort_size > 0 else 0
-                        color = STATUS_COLORS.get(status, "#808080")
+                        color, tint, label = status_colors[i], status_tints[i], status_labels[i]
                         
                         st.markdown(
                             f"""<div style="padding: 15px; border-left: 4px solid {color}; 
-                            background-color: rgba{tuple(list(px.colors.hex_to_rgb(color)) + [0.1])}; 
+                            background-color: {tint}; 
                             border-radius: 5px; margin: 5px 0;">
-                            <strong>{status}</strong><br>
+                            <strong>{label}</strong><br>
                             <span style="font-size: 20px;">{count:,} people</span><br>
                             <span style="color: gray;">({percentage}%)</span>
                             </div>""", 
                             unsafe_allow_html=True
                         )
             
-            elif selected_node in STATUS_COLORS:
+            elif selected_node in flow.status_index:
                 # Selected a current status
-                st.subheader(f"📊 Who ends up '{selected_node}'?")
-                status_breakdown = {}
-                total_in_status = 0
-                
-                for reason, outcomes in absolute_data.items():
-                    if outcomes[selected_node] > 0:
-                        status_breakdown[reason] = outcomes[selected_node]
-                        total_in_status += outcomes[selected_node]
+                status_text = status_label(selected_node)
+                st.subheader(f"📊 Who ends up '{status_text}'?")
+                status_counts = flow.column(selected_node)
+                status_breakdown = {reason: int(count) for reason, count in zip(flow.reasons, status_counts) if count > 0}
+                total_in_status = flow.status_total(selected_node)
                 
                 if status_breakdown:
-                    st.markdown(f"**Total people currently '{selected_node}'**: {total_in_status:,}")
+                    st.markdown(f"**Total people currently '{status_text}'**: {total_in_status:,}")
                     
                     sorted_reasons = sorted(status_breakdown.items(), key=lambda x: x[1], reverse=True)
-                    for reason, count in sorted_reasons:
-                        color = REASON_COLORS.get(reason, "#808080")
-                        cohort_size = cohort_sizes[reason]
+                    reason_names = [reason for reason, _ in sorted_reasons]
+                    reason_colors, reason_tints = REASONS.color(reason_names), REASONS.rgba(reason_names, 0.1)
+                    reason_labels = REASONS.long(reason_names)
+                    for (reason, count), color, tint, reason_label in zip(sorted_reasons, reason_colors,
+                                                                          reason_tints, reason_labels):
+                        cohort_size = flow.cohort_size(reason)
                         percentage_of_cohort = round(count / cohort_size * 100, 1) if cohort_size > 0 else 0
                         percentage_of_status = round(count / total_in_status * 100, 1) if total_in_status > 0 else 0
                         
                         st.markdown(
                             f"""<div style="margin: 10px 0; padding: 12px; border-left: 3px solid {color}; 
-                            background-color: rgba{tuple(list(px.colors.hex_to_rgb(color)) + [0.1])}; 
+                            background-color: {tint}; 
                             border-radius: 5px;">
-                            <strong>{count:,} people ({percentage_of_status}% of all {selected_node})</strong><br>
-                            From: <em>{reason}</em><br>
+                            <strong>{count:,} people ({percentage_of_status}% of all {status_text})</strong><br>
+                            From: <em>{reason_label}</em><br>
                             <small>({percentage_of_cohort}% of that cohort)</small>
                             </div>""", 
                             unsafe_allow_html=True
@@ -470,85 +894,157 @@ def main():
         col1, col2 = st.columns(2)
         
         with col1:
-            fig_bubble = create_cohort_overview(cohort_sizes, absolute_data)
-            st.plotly_chart(fig_bubble, use_container_width=True)
+            fig_bubble = cached_figure(flow, create_cohort_overview, trace=trace)
+            with trace.stage("render: st.plotly_chart"):
+                st.plotly_chart(fig_bubble, use_container_width=True)
         
         with col2:
             st.markdown("### Cohort Analysis")
             
             # Create summary table
-            summary_data = []
-            for reason, size in cohort_sizes.items():
-                working_count = absolute_data[reason]['Working']
-                left_count = absolute_data[reason]['Left']
-                applying_count = absolute_data[reason]['Applying']
-                
-                summary_data.append({
-                    'Reason': reason.replace('To live with my partner who was living here', 'Join partner')
-                             .replace('For a specific job opportunity', 'Job opportunity')
-                             .replace('My spouse/partner was offered a job', 'Spouse job offer'),
-                    'Total': size,
-                    'Working': working_count,
-                    'Applying': applying_count,
-                    'Left DK': left_count,
-                    'Success Rate': f"{round(working_count/size*100, 1)}%"
-                })
-            
-            summary_df = pd.DataFrame(summary_data)
+            summary_df = {
+                'Reason': REASONS.short(flow.reasons),
+                'Total': flow.cohort_sizes,
+                'Working': flow.column('Working'),
+                'Applying': flow.column('Applying'),
+                'Left DK': flow.column('Left'),
+                'Success Rate': [f"{rate}%" for rate in flow.working_rates]
+            }
             st.dataframe(summary_df, use_container_width=True, hide_index=True)
             
             st.markdown("### Key Patterns")
-            st.markdown("""
-            **Size vs Success**: Larger cohorts don't necessarily have better outcomes.
-            
-            **Job Opportunity** (475 people): Highest success rate at 85% working.
-            
-            **Partner Join** (518 people): Largest cohort, moderate success at 59% working.
-            
-            **Spouse Job** (367 people): Lowest working rate at 48%, highest stay-at-home rate.
-            """)
+            st.markdown(flow_insights(flow, labels=REASONS.short_map(), status_labels=STATUSES.long_map()).patterns)
     
-    # Footer insights
-    st.markdown("---")
-    st.subheader("💡 Key Takeaways")
-    
-    col1, col2, col3 = st.columns(3)
+    elif view_mode == "🧪 What-if Scenarios":
+        st.subheader("What If the Cohort Mix Changed?")
+        st.markdown("Change how many people arrive for each reason; each cohort keeps its current mix of outcomes.")
+        
+        # Sliders for the largest cohorts; any others keep their current size
+        multipliers = np.ones(len(flow.reasons))
+        slider_rows = np.argsort(-flow.cohort_sizes, kind='stable')[:MAX_SCENARIO_SLIDERS]
+        slider_columns = st.columns(2)
+        for position, row in enumerate(slider_rows):
+            reason = flow.reasons[row]
+            with slider_columns[position % 2]:
+                change = st.slider(REASONS.short([reason])[0], -50, 100, 0, step=5, format="%d%%",
+                                   key=f"scenario:{reason}", help=reason)
+            multipliers[row] = 1 + change / 100
+        stochastic = st.checkbox("Sample outcomes instead of using expected values",
+                                 help=f"Draws {SCENARIO_DRAWS:,} outcome samples and shows the 90% range")
+        
+        with trace.stage("project scenario"):
+            projected = project_totals(flow, multipliers)[0]
+            lower = upper = None
+            if stochastic:
+                draws = project_totals(flow, np.repeat(multipliers[None], SCENARIO_DRAWS, axis=0), stochastic=True)
+                lower, upper = np.quantile(draws, [0.05, 0.95], axis=0)
+            projected_flow = scenario_flow(flow, multipliers)
+        
+        col1, col2 = st.columns([2, 3])
+        with col1:
+            with trace.stage("figure: create_scenario_totals_chart"):
+                fig_totals = create_scenario_totals_chart(flow, projected, lower, upper)
+            with trace.stage("render: st.plotly_chart"):
+                st.plotly_chart(fig_totals, use_container_width=True)
+        with col2:
+            fig_scenario = cached_figure(projected_flow, create_sankey_diagram, None, trace=trace)
+            with trace.stage("render: st.plotly_chart"):
+                st.plotly_chart(fig_scenario, use_container_width=True)
+        
+        st.markdown("### Sensitivity Across Random Scenarios")
+        sensitivity_status = st.selectbox("Status:", flow.statuses, key="sensitivity_status",
+                                          format_func=status_label, index=flow.status_index.get('Working', 0))
+        fig_sensitivity = cached_figure(flow, create_sensitivity_chart, sensitivity_status, stochastic, trace=trace)
+        with trace.stage("render: st.plotly_chart"):
+            st.plotly_chart(fig_sensitivity, use_container_width=True)
     
-    with col1:
-        job_opp_working = absolute_data['For a specific job opportunity']['Working']
-        job_opp_total = cohort_sizes['For a specific job opportunity']
-        st.markdown(f"""
-        **Most Successful Path:**  
-        Coming with a specific job opportunity: **{job_opp_working} out of {job_opp_total} people** (85%) 
-        are currently working – the highest success rate.
-        """)
+    elif view_mode == "🔁 Multi-wave Flow":
+        st.subheader("Journey Across Survey Waves")
+        
+        with trace.stage("load wave data"):
+            stage_labels, transitions = load_wave_flows(DATA_SOURCE, WAVE_COLUMNS)
+        respondents = int(transitions[0].sum())
+        
+        # Pruning small links keeps large diagrams responsive in the browser
+        min_share = st.slider(
+            "Hide flows smaller than (% of respondents):",
+            min_value=0.0, max_value=5.0, value=0.5, step=0.1,
+            help="Small flows are dropped from the diagram; node totals still include them"
+        )
+        min_value = max(1, int(np.ceil(respondents * min_share / 100)))
+        
+        with trace.stage("figure: create_multistage_sankey"):
+            fig_waves = create_multistage_sankey(stage_labels, transitions, list(WAVE_COLUMNS), min_value)
+        with trace.stage("render: st.plotly_chart"):
+            st.plotly_chart(fig_waves, use_container_width=True)
     
-    with col2:
-        partner_working = absolute_data['To live with my partner who was living here']['Working']
-        partner_total = cohort_sizes['To live with my partner who was living here']
-        spouse_working = absolute_data['My spouse/partner was offered a job']['Working']
-        spouse_total = cohort_sizes['My spouse/partner was offered a job']
+    elif view_mode == "🔮 Projection":
+        st.subheader("Where Each Cohort Is Heading")
+        st.markdown("Status changes between consecutive survey waves, estimated separately for each "
+                    "original reason, projected forward from the latest wave. People who left stay gone.")
         
-        st.markdown(f"""
-        **Partnership Paradox:**  
-        **Joining partner already here**: {partner_working}/{partner_total} working (59%)  
-        **Following spouse's job**: {spouse_working}/{spouse_total} working (48%)  
+        with trace.stage("load transition model"):
+            model = load_transition_model(DATA_SOURCE, WAVE_COLUMNS)
+        col1, col2 = st.columns([3, 1])
+        with col1:
+            steps = st.slider("Waves ahead:", 1, 20, 5)
+        with col2:
+            projection_status = st.selectbox("Status:", model.statuses, format_func=status_label,
+                                             index=model.statuses.index('Left') if 'Left' in model.statuses else 0)
         
-        *Network quality matters more than just having a partner*
-        """)
+        with trace.stage("figure: create_projection_chart"):
+            fig_projection = create_projection_chart(model, projection_status, steps)
+        with trace.stage("render: st.plotly_chart"):
+            st.plotly_chart(fig_projection, use_container_width=True)
+        
+        # Retention is everyone who hasn't left
+        if 'Left' in model.statuses:
+            left = model.statuses.index('Left')
+            projected = model.project(steps)
+            st.markdown("**Retention (% of cohort still in Denmark)**")
+            st.dataframe({
+                'Reason': REASONS.short(model.reasons),
+                'Now': np.round(100 - projected[0, :, left] * 100, 1),
+                f'In {steps} waves': np.round(100 - projected[-1, :, left] * 100, 1),
+                'Long run': np.round(100 - model.steady_state()[:, left] * 100, 1),
+            }, use_container_width=True, hide_index=True)
     
-    with col3:
-        study_working = absolute_data['To study/do research']['Working']
-        study_total = cohort_sizes['To study/do research']
-        study_studying = absolute_data['To study/do research']['Studying']
+    elif view_mode == "📈 Trends":
+        st.subheader("Year-over-Year Shifts in Outcomes")
         
-        st.markdown(f"""
-        **Education Path:**  
-        Study/research cohort ({study_total} people):  
-        • {study_working} working (55%)  
-        • {study_studying} still studying (18%)  
-        • Strong pipeline effect
-        """)
+        catalog = get_year_catalog(EDITIONS_DIR, STORE_DIR)
+        col1, col2 = st.columns([3, 1])
+        with col1:
+            years = st.multiselect("Survey years:", catalog.years, default=catalog.years[-5:],
+                                   help="Each year's data is loaded only when selected")
+        with col2:
+            trend_status = st.selectbox("Status:", STATUSES.names, format_func=status_label)
+        
+        if years:
+            with trace.stage("load year cubes"):
+                share_table = status_share_table(catalog, sorted(years), trend_status)
+            with trace.stage("figure: create_trend_chart"):
+                fig_trend = create_trend_chart(share_table, trend_status)
+            with trace.stage("render: st.plotly_chart"):
+                st.plotly_chart(fig_trend, use_container_width=True)
+            
+            # Change between consecutive selected years, in percentage points
+            if len(share_table) > 1:
+                st.markdown("**Change from previous selected year (percentage points)**")
+                changes = share_table.diff().iloc[1:].round(1)
+                changes.index = [str(year) for year in changes.index]
+                st.dataframe(changes, use_container_width=True)
+        else:
+            st.info("Select at least one survey year.")
+    
+    # Footer insights
+    st.markdown("---")
+    st.subheader("💡 Key Takeaways")
+    
+    takeaways = flow_insights(flow, labels=REASONS.short_map(), status_labels=STATUSES.long_map()).takeaways
+    for column, takeaway in zip(st.columns(3), takeaways):
+        with column:
+            st.markdown(takeaway)
 
 # === WATERMARK/FOOTER ===
     st.markdown("---")
@@ -572,6 +1068,17 @@ def main():
         """, 
         unsafe_allow_html=True
     )
+    
+    # Per-rerun performance panel
+    if trace.stages:
+        trace.label = view_mode
+        if TRACE_FILE:
+            append_trace(TRACE_FILE, trace)
+        if profiling:
+            with st.expander("⏱️ Rerun timing", expanded=True):
+                st.plotly_chart(create_timing_waterfall(trace), use_container_width=True)
+                st.markdown(" · ".join(f"**{event}**: {n}" for event, n in sorted(trace.counters.items()))
+                            or "No cache lookups this run")
 
 if __name__ == "__main__":
     main()
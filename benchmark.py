@@ -0,0 +1,147 @@
+"""Benchmark load_data and the chart builders on synthetic data of increasing size.
+
+Usage:
+    python benchmark.py --scales small medium --output results.json
+    python benchmark.py --baseline results.json --tolerance 0.25
+
+Each result records wall time, peak traced memory and (for charts) the figure's
+JSON size. With --baseline the run fails (exit code 1) when any measurement is
+slower than the baseline by more than the tolerance.
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+
+# name: (reasons, statuses, respondents)
+SCALES = {
+    'small': (5, 6, 10**3),
+    'medium': (50, 10, 10**5),
+    'large': (200, 20, 10**6),
+    'xlarge': (1000, 50, 10**7),
+    'huge': (1000, 50, 10**8),
+}
+DEFAULT_SCALES = ['small', 'medium', 'large']
+
+
+def measure(func, *args, repeat=1, setup=None):
+    """Best-of-`repeat` wall time and peak traced memory (bytes) for func(*args).
+
+    `setup` runs untimed before every repeat, e.g. to clear memos so each run is cold.
+    """
+    best_time = peak_memory = None
+    result = None
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        tracemalloc.start()
+        start = time.perf_counter()
+        result = func(*args)
+        elapsed = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        best_time = elapsed if best_time is None else min(best_time, elapsed)
+        peak_memory = peak if peak_memory is None else max(peak_memory, peak)
+    return result, best_time, peak_memory
+
+
+def benchmark_scale(name, repeat=1, microdata_dir=None):
+    """Time every benchmarked function at one scale and return a list of result dicts"""
+    import app
+    from bootstrap import clear_cache
+    from synthetic import synthetic_flow, write_synthetic_respondents
+
+    n_reasons, n_statuses, n_respondents = SCALES[name]
+    results = []
+
+    def record(target, elapsed, peak, figure=None, **extra):
+        entry = {'scale': name, 'target': target, 'reasons': n_reasons, 'statuses': n_statuses,
+                 'respondents': n_respondents, 'seconds': round(elapsed, 6), 'peak_bytes': peak}
+        if figure is not None:
+            entry['json_bytes'] = len(figure.to_json())
+        entry.update(extra)
+        results.append(entry)
+        print(f"{name:>7} {target:<32} {elapsed * 1000:10.1f} ms {peak / 2**20:9.1f} MiB", file=sys.stderr)
+
+    # load_data on respondent-level microdata (bypassing the Streamlit cache)
+    with tempfile.TemporaryDirectory(dir=microdata_dir) as tmp:
+        path = os.path.join(tmp, 'respondents.parquet')
+        write_synthetic_respondents(path, n_reasons, n_statuses, n_respondents)
+        _, elapsed, peak = measure(app.load_data.__wrapped__, path, repeat=repeat)
+        record('load_data', elapsed, peak, file_bytes=os.path.getsize(path))
+
+    flow = synthetic_flow(n_reasons, n_statuses, n_respondents)
+    charts = [
+        ('create_sankey_diagram', app.create_sankey_diagram, ()),
+        ('create_sankey_diagram[Working]', app.create_sankey_diagram, ('Working',)),
+        ('create_stacked_bar_chart[absolute]', app.create_stacked_bar_chart, (True,)),
+        ('create_stacked_bar_chart[percent]', app.create_stacked_bar_chart, (False,)),
+        ('create_cohort_overview', app.create_cohort_overview, ()),
+    ]
+    for target, builder, params in charts:
+        # Memoized bootstrap intervals would make every repeat after the first a warm build
+        figure, elapsed, peak = measure(builder, flow, *params, repeat=repeat, setup=clear_cache)
+        record(target, elapsed, peak, figure=figure)
+
+    return results
+
+
+def find_regressions(results, baseline, tolerance):
+    """Measurements slower than their baseline counterpart by more than `tolerance` (a fraction)"""
+    previous = {(r['scale'], r['target']): r for r in baseline['results']}
+    regressions = []
+    for result in results:
+        before = previous.get((result['scale'], result['target']))
+        if before and result['seconds'] > before['seconds'] * (1 + tolerance):
+            regressions.append({'scale': result['scale'], 'target': result['target'],
+                                'baseline_seconds': before['seconds'], 'seconds': result['seconds']})
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark data loading and chart construction")
+    parser.add_argument('--scales', nargs='+', choices=list(SCALES), default=DEFAULT_SCALES)
+    parser.add_argument('--repeat', type=int, default=3, help="Runs per measurement; the fastest is kept")
+    parser.add_argument('--output', help="Write results as JSON to this file (default: stdout)")
+    parser.add_argument('--baseline', help="Previous results file to compare against")
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help="Allowed slowdown versus the baseline, as a fraction (default 0.25)")
+    parser.add_argument('--tmp-dir', help="Where to write temporary microdata files")
+    args = parser.parse_args(argv)
+
+    results = []
+    for scale in args.scales:
+        results.extend(benchmark_scale(scale, repeat=args.repeat, microdata_dir=args.tmp_dir))
+
+    report = {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'results': results,
+    }
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            regressions = find_regressions(results, json.load(f), args.tolerance)
+        report['regressions'] = regressions
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+
+    for regression in regressions:
+        print(f"REGRESSION {regression['scale']} {regression['target']}: "
+              f"{regression['baseline_seconds']:.4f}s -> {regression['seconds']:.4f}s", file=sys.stderr)
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,105 @@
+import numpy as np
+
+from lru import LRUCache
+
+DEFAULT_REPLICATES = 10_000
+DEFAULT_CONFIDENCE = 0.95
+# Draws made at once (about 32 MB of int64); replicates are drawn in blocks of this size
+BLOCK_CELLS = 2**22
+# Draws kept for the percentiles (64 MB of int32); past it, large flows get fewer replicates (but at least MIN_REPLICATES)
+MAX_DRAW_CELLS = 2**24
+MIN_REPLICATES = 1000
+MIN_BLOCK = 100
+
+
+class FlowIntervals:
+    """Bootstrap confidence intervals for a FlowMatrix's flows, status totals and rates"""
+
+    def __init__(self, flow_lower, flow_upper, total_lower, total_upper, rate_lower, rate_upper,
+                 replicates, confidence, statuses=None):
+        self.flow_lower = flow_lower      # reasons x statuses, people
+        self.flow_upper = flow_upper
+        self.total_lower = total_lower    # statuses, people
+        self.total_upper = total_upper
+        self.rate_lower = rate_lower      # reasons x statuses, % of cohort
+        self.rate_upper = rate_upper
+        self.replicates = replicates
+        self.confidence = confidence
+        self.statuses = statuses          # the statuses the columns stand for
+
+    @property
+    def label(self):
+        return f"{self.confidence:.0%} CI"
+
+
+def replicate_plan(n_cells, replicates=DEFAULT_REPLICATES):
+    """(replicates, block size) that keep a bootstrap over `n_cells` cells within the draw budgets"""
+    n_cells = max(n_cells, 1)
+    replicates = min(replicates, max(MIN_REPLICATES, MAX_DRAW_CELLS // n_cells))
+    block = min(replicates, max(MIN_BLOCK, BLOCK_CELLS // n_cells))
+    return replicates, block
+
+
+def bootstrap_flow(flow, replicates=DEFAULT_REPLICATES, confidence=DEFAULT_CONFIDENCE, seed=0, statuses=None):
+    """Multinomial bootstrap of every cohort at once.
+
+    Each replicate redraws every cohort's outcomes from its observed shares, with
+    the published cohort size as the number of trials. Replicates are drawn in
+    blocks of shape (block, reasons, statuses) and copied into one int32 buffer
+    (replicate_plan keeps it within MAX_DRAW_CELLS cells unless that would mean
+    fewer than MIN_REPLICATES), whose percentiles are then taken in place, so the intervals are exactly np.quantile over every
+    replicate. With `statuses`, only those columns are bootstrapped: the rest of each cohort
+    is drawn as one lumped outcome, which leaves the chosen columns' joint
+    distribution unchanged.
+    """
+
+    rng = np.random.default_rng(seed)
+    sizes = flow.cohort_sizes
+    counts = flow.counts
+    if statuses is not None:
+        statuses = [status for status in statuses if status in flow.status_index]
+        columns = flow.status_columns(statuses)
+        counts = np.column_stack([counts[:, columns], flow.row_totals - counts[:, columns].sum(axis=1)])
+    n_columns = counts.shape[1] - (statuses is not None)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        shares = np.where(flow.row_totals[:, None] > 0, counts / flow.row_totals[:, None], 0.0)
+    # Empty cohorts get a dummy distribution; with zero trials they draw nothing anyway
+    shares[flow.row_totals == 0, 0] = 1.0
+
+    replicates, block = replicate_plan(counts.size, replicates)
+    tail = (1 - confidence) / 2
+    quantiles = [tail, 1 - tail]
+    flow_draws = np.empty((replicates, len(sizes), n_columns), dtype=np.int32)
+    total_draws = np.empty((replicates, n_columns), dtype=np.int64)
+    for start in range(0, replicates, block):
+        stop = min(start + block, replicates)
+        draws = rng.multinomial(sizes, shares, size=(stop - start, len(sizes)))[..., :n_columns]
+        flow_draws[start:stop] = draws
+        total_draws[start:stop] = draws.sum(axis=1)
+    # overwrite_input lets np.quantile partition the buffers instead of copying them
+    flow_lower, flow_upper = np.quantile(flow_draws, quantiles, axis=0, overwrite_input=True)
+    total_lower, total_upper = np.quantile(total_draws, quantiles, axis=0, overwrite_input=True)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        scale = np.where(sizes > 0, 100 / sizes, 0.0)[:, None]
+    rate_lower, rate_upper = flow_lower * scale, flow_upper * scale
+
+    return FlowIntervals(flow_lower, flow_upper, total_lower, total_upper,
+                         np.round(rate_lower, 1), np.round(rate_upper, 1), replicates, confidence,
+                         list(flow.statuses) if statuses is None else list(statuses))
+
+
+_cache = LRUCache(maxsize=16)
+
+
+def flow_intervals(flow, replicates=DEFAULT_REPLICATES, confidence=DEFAULT_CONFIDENCE, seed=0, statuses=None):
+    """bootstrap_flow(), memoized per data fingerprint (and statuses)"""
+
+    statuses = None if statuses is None else tuple(statuses)
+    key = (flow.fingerprint, replicates, confidence, seed, statuses)
+    return _cache.get_or_build(key, lambda: bootstrap_flow(flow, replicates, confidence, seed, statuses))
+
+
+def clear_cache():
+    """Forget every memoized interval (benchmarks use it to time cold builds)"""
+    _cache.clear()
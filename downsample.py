@@ -0,0 +1,90 @@
+"""Top-k bucketing that keeps chart payloads bounded however many categories the data has.
+
+Charts draw at most a budget of marks (bars, bubbles). Reasons beyond the budget
+are merged, smallest cohorts first, into a single "other" row, and statuses
+beyond MAX_STATUSES into the existing "Other" status (or a new one), so the
+figure JSON and the browser's render time stop growing with cardinality.
+"""
+import os
+
+import numpy as np
+
+from flow_matrix import FlowMatrix
+
+DEFAULT_POINT_BUDGET = 300
+# Beyond this many statuses a stacked bar's colours stop being distinguishable
+MAX_STATUSES = 8
+OTHER_STATUS = 'Other'
+
+
+def point_budget():
+    """Most marks a chart draws (INTERNATIONALFLOW_POINT_BUDGET, default DEFAULT_POINT_BUDGET)"""
+    return int(os.environ.get('INTERNATIONALFLOW_POINT_BUDGET', DEFAULT_POINT_BUDGET))
+
+
+def other_reasons_label(n):
+    return f"Other reasons ({n})"
+
+
+def _keep_top(totals, k):
+    """Boolean mask of the k largest totals, ties broken by position"""
+    keep = np.zeros(len(totals), dtype=bool)
+    keep[np.argsort(-np.asarray(totals), kind='stable')[:k]] = True
+    return keep
+
+
+def bucket_statuses(flow, max_statuses=MAX_STATUSES, keep=None):
+    """Fold statuses into OTHER_STATUS, keeping those named in `keep` or else the ones with the most people"""
+
+    other = flow.status_index.get(OTHER_STATUS)
+    if keep is None:
+        if len(flow.statuses) <= max_statuses:
+            return flow
+        totals = flow.column_totals.astype(float)
+        if other is not None:
+            totals[other] = -np.inf
+        kept = _keep_top(totals, max_statuses - 1)
+    else:
+        kept = np.isin(flow.statuses, list(keep))
+    if other is not None:
+        kept[other] = False
+    fold = ~kept
+    if fold.sum() == (0 if other is None else 1):
+        return flow  # Nothing beyond the existing "Other" to fold
+
+    statuses = [status for status, k in zip(flow.statuses, kept) if k] + [OTHER_STATUS]
+    # Shares within a cohort add up, so folded percentages are just the sum of their columns
+    counts = np.column_stack([flow.counts[:, kept], flow.counts[:, fold].sum(axis=1)])
+    percentages = np.column_stack([flow.percentages[:, kept], flow.percentages[:, fold].sum(axis=1)])
+    return FlowMatrix(counts, flow.reasons, statuses, cohort_sizes=flow.cohort_sizes, percentages=percentages)
+
+
+def bucket_reasons(flow, max_reasons):
+    """Keep the largest cohorts (in their original order) and merge the rest into one row"""
+
+    if len(flow.reasons) <= max_reasons:
+        return flow
+    keep = _keep_top(flow.cohort_sizes, max(max_reasons - 1, 1))
+    fold = ~keep
+
+    reasons = [reason for reason, kept in zip(flow.reasons, keep) if kept] + [other_reasons_label(int(fold.sum()))]
+    counts = np.vstack([flow.counts[keep], flow.counts[fold].sum(axis=0)])
+    sizes = np.append(flow.cohort_sizes[keep], flow.cohort_sizes[fold].sum())
+    # The merged row's shares come from its counts; kept rows keep their (possibly published) percentages
+    with np.errstate(divide='ignore', invalid='ignore'):
+        merged = np.where(sizes[-1] > 0, counts[-1] * 100 / sizes[-1], 0.0)
+    percentages = np.vstack([flow.percentages[keep], np.round(merged, 1)])
+    return FlowMatrix(counts, reasons, flow.statuses, cohort_sizes=sizes, percentages=percentages)
+
+
+def fit_to_budget(flow, budget=DEFAULT_POINT_BUDGET, marks_per_reason=None, statuses=None):
+    """Bucket a flow so a chart drawing `marks_per_reason` marks per cohort stays within `budget` marks.
+
+    `marks_per_reason` defaults to one mark per status (a stacked bar); pass 1 for
+    charts with one mark per cohort. `statuses` names the statuses the chart draws
+    on its own; any others are folded into "Other".
+    """
+
+    flow = bucket_statuses(flow, keep=statuses)
+    per_reason = len(flow.statuses) if marks_per_reason is None else marks_per_reason
+    return bucket_reasons(flow, max(budget // max(per_reason, 1), 2))
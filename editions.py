@@ -0,0 +1,149 @@
+import json
+import os
+import re
+from functools import lru_cache
+
+import numpy as np
+
+from flow_matrix import FlowMatrix
+
+# Published survey editions, one JSON file per year (e.g. editions/2025.json)
+EDITIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'editions')
+
+
+def list_editions(directory=EDITIONS_DIR):
+    """Years with an edition file, found from file names alone so startup cost stays flat"""
+    if not os.path.isdir(directory):
+        return []
+    return sorted(int(name[:-5]) for name in os.listdir(directory) if re.fullmatch(r'\d{4}\.json', name))
+
+
+def latest_edition(directory=EDITIONS_DIR):
+    """Most recent year with an edition file; FileNotFoundError naming `directory` if there is none"""
+    years = list_editions(directory)
+    if not years:
+        raise FileNotFoundError(f"No published editions (<year>.json files) in {directory}")
+    return years[-1]
+
+
+def read_edition(year, directory=EDITIONS_DIR):
+    with open(os.path.join(directory, f"{year}.json"), encoding='utf-8') as f:
+        return json.load(f)
+
+
+def edition_counts(edition):
+    """Absolute counts for a published edition: (absolute_data, percentage_data, cohort_sizes)"""
+    from reconstruct import reconstruct_counts
+
+    # Corrected cohort sizes (calculated from the survey data percentages)
+    cohort_sizes = edition['cohort_sizes']
+    # Percentage breakdowns within each cohort (from the original data)
+    percentage_data = edition['percentage_data']
+
+    reasons = list(cohort_sizes)
+    statuses = list(dict.fromkeys(status for reason in reasons for status in percentage_data[reason]))
+    percentages = [[percentage_data[reason].get(status, 0) for status in statuses] for reason in reasons]
+    # Published overall shares, where given, pick between the tables the rounding allows
+    overall = edition.get('overall_percentages', {})
+    column_shares = [overall.get(status, np.nan) for status in statuses] if overall else None
+
+    # Whole counts whose rows add up to the cohort sizes and whose shares round to the published ones
+    counts = reconstruct_counts(percentages, [cohort_sizes[reason] for reason in reasons], column_shares)
+    # Every reason gets every status, with 0 where the edition publishes none, so the table is rectangular
+    absolute_data = {reason: {status: int(counts[i, j]) for j, status in enumerate(statuses)}
+                     for i, reason in enumerate(reasons)}
+
+    return absolute_data, percentage_data, cohort_sizes
+
+
+def published_sample(edition):
+    """(sample size, {status: (published percentage, people)}) for an edition's overall marginals.
+
+    The people per status add up to the sample size and each rounds to its published
+    percentage. Returns None when the edition doesn't publish overall figures.
+    """
+    from reconstruct import reconstruct_counts
+
+    overall = edition.get('overall_percentages')
+    if not overall or 'sample_size' not in edition:
+        return None
+    counts = reconstruct_counts([list(overall.values())], [edition['sample_size']])[0]
+    return edition['sample_size'], {status: (percentage, int(count))
+                                    for (status, percentage), count in zip(overall.items(), counts)}
+
+
+def edition_to_data(edition):
+    """Turn a published edition into the (df, absolute, percentage, sizes) contract"""
+    import pandas as pd
+
+    absolute_data, percentage_data, cohort_sizes = edition_counts(edition)
+
+    # Create comprehensive DataFrame
+    rows = []
+    for original_reason, statuses in percentage_data.items():
+        for current_status, percentage in statuses.items():
+            absolute_count = absolute_data[original_reason][current_status]
+            rows.append({
+                'Original Reason': original_reason,
+                'Current Status': current_status,
+                'Percentage': percentage,
+                'Absolute Count': absolute_count,
+                'Cohort Size': cohort_sizes[original_reason]
+            })
+
+    return pd.DataFrame(rows), absolute_data, percentage_data, cohort_sizes
+
+
+class YearCatalog:
+    """Per-year flow matrices, loaded only when a year is requested and kept in a bounded LRU.
+
+    `years` is a list, or a callable returning the current list for sources that
+    grow. `version`, if given, is a callable returning the source's version;
+    it is part of the cache key, so data loaded before a change is not served after it.
+    """
+
+    def __init__(self, years, loader, maxsize=8, version=None):
+        self._years = years if callable(years) else list(years)
+        self._version = version
+        self._load = lru_cache(maxsize=maxsize)(lambda version, year: loader(year))
+
+    @classmethod
+    def from_directory(cls, directory=EDITIONS_DIR, maxsize=8):
+        def load(year):
+            absolute_data, percentage_data, cohort_sizes = edition_counts(read_edition(year, directory))
+            return FlowMatrix.from_dicts(absolute_data, cohort_sizes, percentage_data)
+        return cls(list_editions(directory), load, maxsize)
+
+    @classmethod
+    def from_store(cls, store, maxsize=8):
+        """Treat each wave of an AggregateStore as a year, following the store as batches are ingested"""
+        return cls(lambda: store.waves, lambda wave: store.flow(waves=[wave]), maxsize,
+                   version=lambda: store.version)
+
+    @property
+    def years(self):
+        return self._years() if callable(self._years) else self._years
+
+    def __getitem__(self, year):
+        if year not in self.years:
+            raise KeyError(f"No data for {year}")
+        return self._load(self._version() if self._version else None, year)
+
+    @property
+    def loaded(self):
+        return self._load.cache_info().currsize
+
+
+def status_share_table(catalog, years, status):
+    """Share (%) of each reason's cohort in `status`, one row per selected year.
+
+    Reasons missing from an edition show as NaN rather than 0, so gaps are visible.
+    """
+    import pandas as pd
+
+    columns = {}
+    for year in years:
+        flow = catalog[year]
+        if status in flow.status_index:
+            columns[year] = pd.Series(flow.percentages[:, flow.status_index[status]], index=flow.reasons)
+    return pd.DataFrame(columns).T.astype(float)
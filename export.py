@@ -0,0 +1,213 @@
+"""Chunked exports of the current slice: flow matrix, cohort summary and respondent rows.
+
+Tables are produced as a stream of DataFrame chunks and encoded chunk by chunk
+into CSV, Arrow IPC (stream format) or Parquet, so a large respondent-level
+extract is never held in memory as one table. Arrow and Parquet need pyarrow.
+
+Usage:
+    python export.py respondents.parquet --data responses.csv --filters '{"Nationality": ["DE"]}'
+    python export.py flow.csv --table flow
+"""
+import argparse
+import importlib.util
+import io
+import json
+import os
+
+from ingest import DEFAULT_CHUNKSIZE, iter_respondent_chunks
+
+# Format -> (MIME type, file extension)
+EXPORT_FORMATS = {
+    'csv': ('text/csv', '.csv'),
+    'arrow': ('application/vnd.apache.arrow.stream', '.arrows'),
+    'parquet': ('application/vnd.apache.parquet', '.parquet'),
+}
+EXPORT_TABLES = ('flow', 'summary', 'respondents')
+
+
+def available_formats():
+    """CSV always; Arrow and Parquet when pyarrow is installed"""
+    if importlib.util.find_spec('pyarrow') is None:
+        return ['csv']
+    return list(EXPORT_FORMATS)
+
+
+def flow_batches(flow):
+    """The reason x status matrix in long form, one row per cell"""
+    import numpy as np
+    import pandas as pd
+
+    n_reasons, n_statuses = flow.shape
+    yield pd.DataFrame({
+        'Original Reason': np.repeat(flow.reasons, n_statuses),
+        'Current Status': np.tile(flow.statuses, n_reasons),
+        'People': flow.counts.ravel(),
+        'Percentage': flow.percentages.ravel(),
+        'Cohort Size': np.repeat(flow.cohort_sizes, n_statuses),
+    })
+
+
+def summary_batches(flow):
+    """One row per cohort: size, people in each status and the working rate"""
+    import pandas as pd
+
+    columns = {'Original Reason': flow.reasons, 'Cohort Size': flow.cohort_sizes}
+    for j, status in enumerate(flow.statuses):
+        columns[status] = flow.counts[:, j]
+    if 'Working' in flow.status_index:
+        columns['Working Rate (%)'] = flow.working_rates
+    yield pd.DataFrame(columns)
+
+
+def file_columns(path):
+    """Every column of a respondent-level export, read from the header or schema only"""
+    if os.path.splitext(str(path))[1].lower() in ('.parquet', '.pq'):
+        import pyarrow.parquet as pq
+        return pq.ParquetFile(path).schema_arrow.names
+    import pandas as pd
+    return list(pd.read_csv(path, nrows=0).columns)
+
+
+def respondent_batches(path, selection=None, chunksize=DEFAULT_CHUNKSIZE, max_rows=None):
+    """Respondent rows matching a drill-down selection ({attribute: [values]}), chunk by chunk.
+
+    With `max_rows`, the stream stops after that many rows.
+    """
+    import pandas as pd
+
+    selection = {name: set(values) for name, values in (selection or {}).items() if values}
+    remaining = max_rows
+    for chunk in iter_respondent_chunks(path, columns=file_columns(path), chunksize=chunksize):
+        if remaining is not None and remaining <= 0:
+            return
+        for name, chosen in selection.items():
+            chunk = chunk[chunk[name].astype(str).isin(chosen)]
+        if remaining is not None:
+            chunk = chunk.iloc[:remaining]
+            remaining -= len(chunk)
+        # Plain columns keep the schema identical from chunk to chunk
+        for name in chunk.columns:
+            if isinstance(chunk[name].dtype, pd.CategoricalDtype):
+                chunk[name] = chunk[name].astype(chunk[name].cat.categories.dtype)
+        if len(chunk):
+            yield chunk
+
+
+class _Sink:
+    """Write-only file that hands back whatever was written since the last drain"""
+
+    def __init__(self):
+        self._parts = []
+        self._position = 0
+        self.closed = False
+
+    def write(self, data):
+        self._parts.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self):
+        data = b''.join(self._parts)
+        self._parts.clear()
+        return data
+
+
+def iter_export(batches, fmt):
+    """Encode a stream of DataFrame chunks, yielding the file's bytes as each chunk is written"""
+
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unsupported export format {fmt!r}; choose from {', '.join(EXPORT_FORMATS)}")
+
+    if fmt == 'csv':
+        header = True
+        for batch in batches:
+            yield batch.to_csv(index=False, header=header).encode('utf-8')
+            header = False
+        return
+
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError as exc:
+        raise ImportError("Arrow and Parquet exports require pyarrow (pip install pyarrow)") from exc
+
+    sink, writer, schema = _Sink(), None, None
+    for batch in batches:
+        if writer is None:
+            schema = pa.Schema.from_pandas(batch, preserve_index=False)
+            writer = pa.ipc.new_stream(sink, schema) if fmt == 'arrow' else pq.ParquetWriter(sink, schema)
+        # Each chunk becomes its own record batch (Arrow) or row group (Parquet)
+        writer.write_table(pa.Table.from_pandas(batch, schema=schema, preserve_index=False))
+        yield sink.drain()
+    if writer is not None:
+        writer.close()
+        yield sink.drain()
+
+
+class ExportStream(io.RawIOBase):
+    """Read-only file object over iter_export(), for APIs that take a file"""
+
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self._buffer = b''
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        while not self._buffer:
+            try:
+                self._buffer = next(self._chunks)
+            except StopIteration:
+                return 0
+        size = min(len(buffer), len(self._buffer))
+        buffer[:size] = self._buffer[:size]
+        self._buffer = self._buffer[size:]
+        return size
+
+
+def write_export(batches, fmt, path):
+    with open(path, 'wb') as f:
+        for chunk in iter_export(batches, fmt):
+            f.write(chunk)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export survey data in chunks")
+    parser.add_argument('output', help="Output file; the format follows the extension (.csv, .arrows, .parquet)")
+    parser.add_argument('--table', choices=EXPORT_TABLES, default='respondents')
+    parser.add_argument('--data', default=os.environ.get('INTERNATIONALFLOW_DATA'),
+                        help="Respondent-level CSV/Parquet export (defaults to the published figures)")
+    parser.add_argument('--filters', default='{}', help='Drill-down selection as JSON, e.g. {"Nationality": ["DE"]}')
+    args = parser.parse_args(argv)
+
+    extension = os.path.splitext(args.output)[1].lower()
+    fmt = next((name for name, (_, ext) in EXPORT_FORMATS.items() if ext == extension), None)
+    if fmt is None:
+        parser.error(f"Unrecognised output extension {extension!r}")
+    selection = json.loads(args.filters)
+
+    if args.table == 'respondents':
+        if not args.data:
+            parser.error("Exporting respondent rows needs --data")
+        batches = respondent_batches(args.data, selection)
+    else:
+        from shared_data import build_dataset
+        flow, index = build_dataset(args.data, list(selection))
+        if index is not None and any(selection.values()):
+            flow = index.flow(selection)
+        batches = flow_batches(flow) if args.table == 'flow' else summary_batches(flow)
+    write_export(batches, fmt, args.output)
+
+
+if __name__ == '__main__':
+    main()
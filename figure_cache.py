@@ -0,0 +1,5 @@
+from lru import LRUCache
+
+
+class FigureCache(LRUCache):
+    """Thread-safe LRU cache of built figures, keyed by chart name, data fingerprint and view parameters"""
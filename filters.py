@@ -0,0 +1,147 @@
+import numpy as np
+
+from flow_matrix import FlowMatrix, whole_percentages
+from ingest import REASON_COLUMN, STATUS_COLUMN, STATUS_ORDER, iter_respondent_chunks
+
+
+class _Encoder:
+    """Maps labels to stable integer codes as chunks stream in"""
+
+    def __init__(self):
+        self.labels = []
+        self.codes = {}
+
+    def encode(self, values):
+        values = values.astype('category')
+        categories = [str(label) for label in values.cat.categories]
+        for label in categories:
+            if label not in self.codes:
+                self.codes[label] = len(self.labels)
+                self.labels.append(label)
+        # Translate this chunk's category codes to global codes in one take()
+        lookup = np.array([self.codes[label] for label in categories] + [-1], dtype=np.int32)
+        return lookup[values.cat.codes.to_numpy()]
+
+
+class RespondentIndex:
+    """Respondent attributes held as integer codes with one packed bitmap per attribute value.
+
+    A filter ORs the bitmaps of the selected values within an attribute, ANDs the
+    results across attributes, and turns the surviving respondents into a
+    reason x status matrix with a single bincount.
+    """
+
+    def __init__(self, reason_codes, status_codes, reasons, statuses, attributes):
+        self.reasons = list(reasons)
+        self.statuses = list(statuses)
+        self.size = len(reason_codes)
+
+        # Flat reason x status cell per respondent, ready for bincount
+        self.cells = reason_codes.astype(np.int64) * len(self.statuses) + status_codes
+
+        self.values = {}
+        self.bitmaps = {}
+        for name, (codes, labels) in attributes.items():
+            self.values[name] = list(labels)
+            bitmaps = [np.packbits(codes == code) for code in range(len(labels))]
+            self.bitmaps[name] = np.stack(bitmaps) if bitmaps else np.zeros((0, (self.size + 7) // 8), dtype=np.uint8)
+
+    @classmethod
+    def from_arrays(cls, cells, bitmaps, reasons, statuses, values, size):
+        """Wrap already-encoded arrays (e.g. views into shared memory) without copying them"""
+        index = cls.__new__(cls)
+        index.reasons = list(reasons)
+        index.statuses = list(statuses)
+        index.size = size
+        index.cells = cells
+        index.values = {name: list(labels) for name, labels in values.items()}
+        index.bitmaps = dict(bitmaps)
+        return index
+
+    @property
+    def attributes(self):
+        return list(self.values)
+
+    def mask(self, selection):
+        """Packed bitmap of respondents matching every attribute in `selection` ({name: [values]})"""
+
+        result = None
+        for name, chosen in selection.items():
+            if not chosen:
+                continue  # Nothing selected means no restriction on this attribute
+            positions = [self.values[name].index(value) for value in chosen]
+            attribute_bits = np.bitwise_or.reduce(self.bitmaps[name][positions], axis=0)
+            result = attribute_bits if result is None else result & attribute_bits
+        return result
+
+    def counts(self, selection=None):
+        """Reason x status counts for the respondents matching `selection`"""
+
+        packed = self.mask(selection or {})
+        cells = self.cells if packed is None else self.cells[np.unpackbits(packed, count=self.size).view(bool)]
+        n_cells = len(self.reasons) * len(self.statuses)
+        return np.bincount(cells, minlength=n_cells).reshape(len(self.reasons), len(self.statuses))
+
+    def flow(self, selection=None):
+        """FlowMatrix for the respondents matching `selection`, ready for the chart functions"""
+        # Whole percentages, like the unfiltered flow built from the same microdata
+        counts = self.counts(selection)
+        return FlowMatrix(counts, self.reasons, self.statuses, percentages=whole_percentages(counts))
+
+
+def build_respondent_index(chunks, attribute_columns, reason_column=REASON_COLUMN, status_column=STATUS_COLUMN):
+    """Encode a stream of respondent chunks into a RespondentIndex"""
+
+    reason_encoder, status_encoder = _Encoder(), _Encoder()
+    attribute_encoders = {name: _Encoder() for name in attribute_columns}
+    reason_parts, status_parts = [], []
+    attribute_parts = {name: [] for name in attribute_columns}
+
+    for chunk in chunks:
+        chunk = chunk.dropna(subset=[reason_column, status_column])
+        reason_parts.append(reason_encoder.encode(chunk[reason_column]))
+        status_parts.append(status_encoder.encode(chunk[status_column]))
+        for name in attribute_columns:
+            attribute_parts[name].append(attribute_encoders[name].encode(chunk[name]))
+
+    if not reason_parts:
+        raise ValueError("No respondent rows with both a reason and a status were found")
+
+    # Put statuses in registry order (taxonomy.json), then any the registry doesn't know
+    statuses = STATUS_ORDER + [s for s in status_encoder.labels if s not in STATUS_ORDER]
+    status_order = np.array([statuses.index(label) for label in status_encoder.labels], dtype=np.int32)
+
+    attributes = {}
+    for name, encoder in attribute_encoders.items():
+        # Sort values for the widgets and remap codes to match; missing values (-1) match no bitmap
+        labels = _natural_order(encoder.labels)
+        remap = np.array([labels.index(label) for label in encoder.labels] + [-1], dtype=np.int32)
+        attributes[name] = (remap[np.concatenate(attribute_parts[name])], labels)
+
+    return RespondentIndex(
+        np.concatenate(reason_parts),
+        status_order[np.concatenate(status_parts)],
+        reason_encoder.labels,
+        statuses,
+        attributes,
+    )
+
+
+def _natural_order(labels):
+    """Attribute values in natural order (numbers numerically, then text)"""
+
+    def key(label):
+        try:
+            return (0, float(label), label)
+        except ValueError:
+            return (1, 0.0, label)
+
+    return sorted(labels, key=key)
+
+
+def load_respondent_index(path, attribute_columns, chunksize=None):
+    """Stream a respondent export into a RespondentIndex over the given attribute columns"""
+
+    columns = [REASON_COLUMN, STATUS_COLUMN] + list(attribute_columns)
+    kwargs = {} if chunksize is None else {'chunksize': chunksize}
+    return build_respondent_index(iter_respondent_chunks(path, columns=columns, **kwargs), list(attribute_columns))
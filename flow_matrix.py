@@ -0,0 +1,115 @@
+import hashlib
+
+import numpy as np
+
+
+class FlowMatrix:
+    """Reason x status counts backed by a NumPy array, with every total computed once"""
+
+    def __init__(self, counts, reasons, statuses, cohort_sizes=None, percentages=None):
+        self.counts = np.array(counts, dtype=np.int64)
+        self.reasons = list(reasons)
+        self.statuses = list(statuses)
+
+        if self.counts.shape != (len(self.reasons), len(self.statuses)):
+            raise ValueError(
+                f"Count matrix has shape {self.counts.shape}, expected "
+                f"({len(self.reasons)}, {len(self.statuses)})"
+            )
+
+        # Index maps so lookups by name never scan the label lists
+        self.reason_index = {reason: i for i, reason in enumerate(self.reasons)}
+        self.status_index = {status: j for j, status in enumerate(self.statuses)}
+
+        self.row_totals = self.counts.sum(axis=1)
+        self.column_totals = self.counts.sum(axis=0)
+        self.grand_total = int(self.counts.sum())
+
+        # Published cohort sizes can differ from the row sums because of rounding
+        if cohort_sizes is None:
+            self.cohort_sizes = self.row_totals.copy()
+        else:
+            self.cohort_sizes = np.array(cohort_sizes, dtype=np.int64)
+
+        if percentages is None:
+            self.percentages = _percent(self.counts, self.cohort_sizes[:, None])
+        else:
+            self.percentages = np.array(percentages)
+
+        # Share of each cohort (and of everyone) in each status, as used by the charts
+        self.rates = np.round(_percent(self.counts, self.cohort_sizes[:, None]), 1)
+        self.status_shares = np.round(_percent(self.column_totals, self.grand_total), 1)
+
+        for matrix in (self.counts, self.row_totals, self.column_totals, self.cohort_sizes,
+                       self.percentages, self.rates, self.status_shares):
+            matrix.setflags(write=False)
+
+        # Stable content hash, used to key caches of anything derived from this matrix
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(repr((self.reasons, self.statuses)).encode())
+        for matrix in (self.counts, self.cohort_sizes, self.percentages):
+            digest.update(str(matrix.dtype).encode())
+            digest.update(np.ascontiguousarray(matrix).tobytes())
+        self.fingerprint = digest.hexdigest()
+
+    @classmethod
+    def from_dicts(cls, absolute_data, cohort_sizes=None, percentage_data=None):
+        """Build a flow matrix from the nested dicts returned by load_data()"""
+
+        reasons = list(absolute_data)
+        # Ordered union: a status only some reasons report still gets a column (zero elsewhere)
+        statuses = list(dict.fromkeys(status for row in absolute_data.values() for status in row))
+        counts = [[absolute_data[reason].get(status, 0) for status in statuses] for reason in reasons]
+
+        sizes = None if cohort_sizes is None else [cohort_sizes[reason] for reason in reasons]
+        percentages = None
+        if percentage_data is not None:
+            percentages = [[percentage_data[reason].get(status, 0) for status in statuses] for reason in reasons]
+
+        return cls(counts, reasons, statuses, cohort_sizes=sizes, percentages=percentages)
+
+    @property
+    def shape(self):
+        return self.counts.shape
+
+    @property
+    def total_cohort_size(self):
+        return int(self.cohort_sizes.sum())
+
+    def count(self, reason, status):
+        return int(self.counts[self.reason_index[reason], self.status_index[status]])
+
+    def cohort_size(self, reason):
+        return int(self.cohort_sizes[self.reason_index[reason]])
+
+    def column(self, status):
+        """Counts for one status across all reasons"""
+        return self.counts[:, self.status_index[status]]
+
+    def rate(self, status):
+        """Percentage of each cohort currently in the given status (one decimal)"""
+        return self.rates[:, self.status_index[status]]
+
+    def status_total(self, status):
+        return int(self.column_totals[self.status_index[status]])
+
+    @property
+    def working_rates(self):
+        return self.rate('Working')
+
+    def status_columns(self, statuses):
+        """Column indices for a list of status names, skipping unknown ones"""
+        return np.array([self.status_index[s] for s in statuses if s in self.status_index], dtype=np.intp)
+
+
+def whole_percentages(counts):
+    """Each cohort's shares rounded to whole percent, the way the survey publishes them"""
+    counts = np.asarray(counts)
+    return np.rint(_percent(counts, counts.sum(axis=1, keepdims=True))).astype(np.int64)
+
+
+def _percent(numerator, denominator):
+    denominator = np.asarray(denominator, dtype=float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        result = np.where(denominator > 0, numerator * 100 / denominator, 0.0)
+    return np.asarray(result, dtype=float)
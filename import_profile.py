@@ -0,0 +1,85 @@
+"""Import-time profile and time-to-first-paint for the dashboard.
+
+Usage:
+    python import_profile.py [--top 20] [--json]
+
+Streamlit is imported first (the server has already loaded it when the script
+runs), then `import app` is profiled with `python -X importtime`. First paint is
+measured in a fresh interpreter as importing app plus building and serializing
+the Overview Dashboard's figure.
+"""
+import argparse
+import json
+import subprocess
+import sys
+
+FIRST_PAINT_SCRIPT = """
+import logging, sys, time
+logging.disable(logging.CRITICAL)
+import streamlit
+start = time.perf_counter()
+import app
+imported = time.perf_counter()
+flow = app.load_flow_matrix(app.DATA_SOURCE)
+app.create_stacked_bar_chart(flow, use_absolute=True).to_json()
+painted = time.perf_counter()
+heavy = [name for name in ('pandas', 'plotly.express', 'pyarrow', 'scipy') if name in sys.modules]
+print(f"{imported - start} {painted - start} {','.join(heavy)}")
+"""
+
+
+def profile_imports():
+    """(module, self_us, cumulative_us) for every module first imported by `import app`"""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import streamlit; print("---", flush=True); import app'],
+        capture_output=True, text=True, check=True
+    )
+    # importtime lines for app come after everything streamlit pulled in
+    lines = result.stderr.splitlines()
+    streamlit_done = max(i for i, line in enumerate(lines) if line.rstrip().endswith('| streamlit'))
+    modules = []
+    for line in lines[streamlit_done + 1:]:
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        modules.append((name.strip(), int(self_us), int(cumulative_us)))
+    return modules
+
+
+def measure_first_paint():
+    result = subprocess.run([sys.executable, '-c', FIRST_PAINT_SCRIPT], capture_output=True, text=True, check=True)
+    import_seconds, paint_seconds, heavy = result.stdout.split('\n')[-2].split(' ')
+    return {'import_app_seconds': float(import_seconds), 'first_paint_seconds': float(paint_seconds),
+            'heavy_modules_loaded': [name for name in heavy.split(',') if name]}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Profile app.py startup")
+    parser.add_argument('--top', type=int, default=20, help="Number of modules to list")
+    parser.add_argument('--json', action='store_true', help="Print a machine-readable report")
+    args = parser.parse_args(argv)
+
+    modules = profile_imports()
+    # Top-level packages only, so nested submodules don't double count
+    packages = sorted((m for m in modules if '.' not in m[0]), key=lambda m: m[2], reverse=True)
+    report = {
+        'import_app_total_ms': round(sum(m[1] for m in modules) / 1000, 1),
+        'modules': [{'module': name, 'self_ms': self_us / 1000, 'cumulative_ms': cumulative_us / 1000}
+                    for name, self_us, cumulative_us in packages[:args.top]],
+        **measure_first_paint(),
+    }
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    print(f"import app (after streamlit): {report['import_app_total_ms']:.1f} ms")
+    for module in report['modules']:
+        print(f"  {module['cumulative_ms']:9.1f} ms  {module['module']}")
+    print(f"Overview first paint: {report['first_paint_seconds'] * 1000:.1f} ms "
+          f"(import {report['import_app_seconds'] * 1000:.1f} ms)")
+    print(f"Heavy modules loaded: {', '.join(report['heavy_modules_loaded']) or 'none'}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,200 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from flow_matrix import whole_percentages
+from taxonomy import load_taxonomy
+
+# Column names expected in respondent-level survey exports
+REASON_COLUMN = 'Original Reason'
+STATUS_COLUMN = 'Current Status'
+
+# Order used for statuses throughout the dashboard: the registry's (taxonomy.json); unknown statuses are appended
+STATUS_ORDER = list(load_taxonomy().statuses.names)
+
+DEFAULT_CHUNKSIZE = 500_000
+
+
+def iter_respondent_chunks(path, columns=None, chunksize=DEFAULT_CHUNKSIZE):
+    """Yield respondent rows from a CSV or Parquet export in bounded-size chunks"""
+
+    columns = columns or [REASON_COLUMN, STATUS_COLUMN]
+    extension = os.path.splitext(str(path))[1].lower()
+
+    if extension in ('.parquet', '.pq'):
+        try:
+            import pyarrow.parquet as pq
+        except ImportError as exc:
+            raise ImportError("Reading Parquet exports requires pyarrow (pip install pyarrow)") from exc
+
+        parquet_file = pq.ParquetFile(path)
+        for batch in parquet_file.iter_batches(batch_size=chunksize, columns=columns):
+            yield batch.to_pandas()
+    else:
+        # Categorical dtype keeps each chunk small - answers repeat a handful of strings
+        dtypes = {column: 'category' for column in columns}
+        for chunk in pd.read_csv(path, usecols=columns, dtype=dtypes, chunksize=chunksize):
+            yield chunk
+
+
+def aggregate_counts(chunks, reason_column=REASON_COLUMN, status_column=STATUS_COLUMN):
+    """Reduce a stream of respondent chunks to a reason x status count matrix"""
+
+    total = None
+    for chunk in chunks:
+        chunk = chunk.dropna(subset=[reason_column, status_column])
+        part = chunk.groupby([reason_column, status_column], observed=True, sort=False).size()
+        total = part if total is None else total.add(part, fill_value=0)
+
+    if total is None or total.empty:
+        raise ValueError("No respondent rows with both a reason and a status were found")
+
+    counts = total.astype(np.int64).unstack(fill_value=0)
+    counts.index = counts.index.astype(str)
+    counts.columns = counts.columns.astype(str)
+
+    # Keep the dashboard's status order and make sure every known status exists
+    extra_statuses = [status for status in counts.columns if status not in STATUS_ORDER]
+    counts = counts.reindex(columns=STATUS_ORDER + extra_statuses, fill_value=0)
+    counts.index.name = REASON_COLUMN
+    counts.columns.name = STATUS_COLUMN
+    return counts
+
+
+def build_dashboard_data(counts):
+    """Turn a reason x status count matrix into the (df, absolute, percentage, sizes) contract"""
+
+    values = counts.to_numpy(dtype=np.int64)
+    sizes = values.sum(axis=1)
+    percentages = whole_percentages(values)
+
+    reasons = counts.index.tolist()
+    statuses = counts.columns.tolist()
+
+    cohort_sizes = dict(zip(reasons, sizes.tolist()))
+    absolute_data = {reason: dict(zip(statuses, row)) for reason, row in zip(reasons, values.tolist())}
+    percentage_data = {reason: dict(zip(statuses, row)) for reason, row in zip(reasons, percentages.tolist())}
+
+    df = pd.DataFrame({
+        'Original Reason': np.repeat(reasons, len(statuses)),
+        'Current Status': np.tile(statuses, len(reasons)),
+        'Percentage': percentages.ravel(),
+        'Absolute Count': values.ravel(),
+        'Cohort Size': np.repeat(sizes, len(statuses))
+    })
+
+    return df, absolute_data, percentage_data, cohort_sizes
+
+
+def load_respondent_file(path, chunksize=DEFAULT_CHUNKSIZE):
+    """Stream a respondent-level export and return the dashboard data contract"""
+
+    counts = aggregate_counts(iter_respondent_chunks(path, chunksize=chunksize))
+    return build_dashboard_data(counts)
+
+
+def _stage_order(labels):
+    """Known statuses first in dashboard order, then anything else alphabetically"""
+    labels = set(labels)
+    return [s for s in STATUS_ORDER if s in labels] + sorted(labels - set(STATUS_ORDER))
+
+
+def aggregate_transitions(chunks, stage_columns):
+    """Reduce respondent chunks to one count matrix per consecutive pair of survey waves"""
+
+    pairs = list(zip(stage_columns[:-1], stage_columns[1:]))
+    if not pairs:
+        raise ValueError("At least two wave columns are needed to build transitions")
+
+    totals = [None] * len(pairs)
+    for chunk in chunks:
+        for k, (before, after) in enumerate(pairs):
+            # Respondents missing from either wave simply drop out of that transition
+            part = chunk.groupby([before, after], observed=True, sort=False).size()
+            totals[k] = part if totals[k] is None else totals[k].add(part, fill_value=0)
+
+    if any(total is None or total.empty for total in totals):
+        raise ValueError("Every pair of waves needs at least one respondent present in both")
+
+    # A wave's categories are shared by the transition into it and the one out of it
+    stage_labels = []
+    for k in range(len(stage_columns)):
+        labels = set()
+        if k > 0:
+            labels.update(totals[k - 1].index.get_level_values(1).astype(str))
+        if k < len(pairs):
+            labels.update(totals[k].index.get_level_values(0).astype(str))
+        stage_labels.append(_stage_order(labels))
+
+    transitions = []
+    for k, total in enumerate(totals):
+        matrix = total.astype(np.int64).unstack(fill_value=0)
+        matrix.index = matrix.index.astype(str)
+        matrix.columns = matrix.columns.astype(str)
+        matrix = matrix.reindex(index=stage_labels[k], columns=stage_labels[k + 1], fill_value=0)
+        transitions.append(matrix.to_numpy())
+
+    return stage_labels, transitions
+
+
+def load_wave_file(path, stage_columns, chunksize=DEFAULT_CHUNKSIZE):
+    """Stream a multi-wave export and return (stage_labels, transition matrices)"""
+
+    chunks = iter_respondent_chunks(path, columns=list(stage_columns), chunksize=chunksize)
+    return aggregate_transitions(chunks, list(stage_columns))
+
+
+def aggregate_reason_transitions(chunks, stage_columns):
+    """Pool status-to-status moves between consecutive waves, separately for each origin reason.
+
+    `stage_columns` starts with the reason column, followed by the status waves in
+    order. Returns (reasons, statuses, transition counts reasons x statuses x statuses,
+    counts in the latest wave reasons x statuses).
+    """
+
+    reason_column, status_columns = stage_columns[0], list(stage_columns[1:])
+    if len(status_columns) < 2:
+        raise ValueError("At least two status waves are needed to estimate transitions")
+    pairs = list(zip(status_columns[:-1], status_columns[1:]))
+
+    moves, latest = None, None
+    for chunk in chunks:
+        for before, after in pairs:
+            # Respondents missing from either wave simply drop out of that transition
+            part = chunk.groupby([reason_column, before, after], observed=True, sort=False).size()
+            part.index = part.index.set_names(['reason', 'before', 'after'])
+            moves = part if moves is None else moves.add(part, fill_value=0)
+        part = chunk.groupby([reason_column, status_columns[-1]], observed=True, sort=False).size()
+        part.index = part.index.set_names(['reason', 'status'])
+        latest = part if latest is None else latest.add(part, fill_value=0)
+
+    if moves is None or moves.empty:
+        raise ValueError("No respondents were present in two consecutive waves")
+
+    reasons = sorted(set(moves.index.get_level_values('reason').astype(str)))
+    statuses = _stage_order(set(moves.index.get_level_values('before').astype(str))
+                            | set(moves.index.get_level_values('after').astype(str))
+                            | set(latest.index.get_level_values('status').astype(str)))
+    reason_codes = {label: i for i, label in enumerate(reasons)}
+    status_codes = {label: i for i, label in enumerate(statuses)}
+
+    counts = np.zeros((len(reasons), len(statuses), len(statuses)), dtype=np.int64)
+    index = moves.index.to_frame(index=False).astype(str)
+    np.add.at(counts, (index['reason'].map(reason_codes).to_numpy(), index['before'].map(status_codes).to_numpy(),
+                       index['after'].map(status_codes).to_numpy()), moves.to_numpy(dtype=np.int64))
+
+    current = np.zeros((len(reasons), len(statuses)), dtype=np.int64)
+    index = latest.index.to_frame(index=False).astype(str)
+    known = index['reason'].isin(reason_codes).to_numpy()
+    np.add.at(current, (index['reason'][known].map(reason_codes).to_numpy(),
+                        index['status'][known].map(status_codes).to_numpy()), latest.to_numpy(dtype=np.int64)[known])
+
+    return reasons, statuses, counts, current
+
+
+def load_transition_file(path, stage_columns, chunksize=DEFAULT_CHUNKSIZE):
+    """Stream a multi-wave export and return per-reason transition counts (see aggregate_reason_transitions)"""
+
+    chunks = iter_respondent_chunks(path, columns=list(stage_columns), chunksize=chunksize)
+    return aggregate_reason_transitions(chunks, list(stage_columns))
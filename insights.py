@@ -0,0 +1,142 @@
+"""Key patterns and takeaways derived from a FlowMatrix instead of written by hand.
+
+Every statistic the text needs (rankings, extremes, gaps and the status each
+cohort over-indexes on) comes out of one pass over the rate matrix; the text is
+filled in from templates, so a different or larger dataset gets correct wording
+without code changes. Results are memoized per data fingerprint.
+"""
+from collections import OrderedDict
+
+import numpy as np
+
+from lru import LRUCache
+
+DEFAULT_OUTCOME = 'Working'
+# Rank correlation between cohort size and success above which size is called a trend
+SIZE_TREND_THRESHOLD = 0.7
+
+SIZE_TEMPLATES = {
+    1: "**Size vs Success**: Larger cohorts tend to have better outcomes.",
+    0: "**Size vs Success**: Larger cohorts don't necessarily have better outcomes.",
+    -1: "**Size vs Success**: Larger cohorts tend to have worse outcomes.",
+}
+PATTERN_TEMPLATE = "**{label}** ({size:,} people): {phrases}."
+BEST_TEMPLATE = "**Most Successful Path:**  \n{label}: **{count:,} out of {size:,} people** ({rate:.0f}%) \nare currently {outcome} – the highest success rate."
+GAP_TEMPLATE = ("**Widest Gap:**  \n**{best_label}**: {best_count:,}/{best_size:,} {outcome} ({best_rate:.0f}%)  \n"
+                "**{worst_label}**: {worst_count:,}/{worst_size:,} {outcome} ({worst_rate:.0f}%)  \n\n"
+                "*A {gap:.0f} percentage point spread between cohorts*")
+DISTINCT_TEMPLATE = ("**Distinctive Outcome:**  \n{label} cohort ({size:,} people):  \n"
+                     "• {count:,} {outcome} ({rate:.0f}%)  \n"
+                     "• {status_count:,} {status} ({status_rate:.0f}%, vs {overall_rate:.0f}% overall)  \n"
+                     "• The most over-represented outcome of any cohort")
+
+
+class FlowInsights:
+    """Derived statistics for one flow matrix, plus the rendered markdown"""
+
+    def __init__(self, flow, outcome=DEFAULT_OUTCOME, labels=None, status_labels=None):
+        labels, status_labels = labels or {}, status_labels or {}
+        self.outcome = outcome if outcome in flow.status_index else flow.statuses[0]
+        self.labels = [labels.get(reason, reason) for reason in flow.reasons]
+        self.status_labels = [status_labels.get(status, status) for status in flow.statuses]
+        self.sizes = flow.cohort_sizes
+        self.counts = flow.counts
+        self.statuses = flow.statuses
+
+        # Published percentages where the data has them, so the text quotes the published figures
+        rates = np.asarray(flow.percentages, dtype=float)
+        outcome_column = flow.status_index[self.outcome]
+        outcome_rates = rates[:, outcome_column]
+        n_reasons = len(flow.reasons)
+
+        # Rankings and extremes, all from the same few array reductions
+        self.outcome_column = outcome_column
+        self.outcome_rates = outcome_rates
+        self.ranking = np.argsort(-outcome_rates, kind='stable')
+        self.best, self.worst = int(self.ranking[0]), int(self.ranking[-1])
+        self.largest, self.smallest = int(np.argmax(self.sizes)), int(np.argmin(self.sizes))
+        self.spread = float(outcome_rates[self.best] - outcome_rates[self.worst])
+
+        # Spearman rank correlation between cohort size and success
+        size_ranks = np.argsort(np.argsort(self.sizes, kind='stable'), kind='stable')
+        rate_ranks = np.argsort(np.argsort(outcome_rates, kind='stable'), kind='stable')
+        if n_reasons > 1:
+            squared = float(((size_ranks - rate_ranks) ** 2).sum())
+            self.size_correlation = 1 - 6 * squared / (n_reasons * (n_reasons ** 2 - 1))
+        else:
+            self.size_correlation = 0.0
+
+        # How far each cohort's share of each other status sits above everyone's share
+        self.lift = rates - flow.status_shares[None, :]
+        self.lift[:, outcome_column] = -np.inf
+        self.leaders = np.argmax(rates, axis=0)
+        self.rates = rates
+
+        self.patterns = self._render_patterns()
+        self.takeaways = self._render_takeaways()
+
+    def _render_patterns(self):
+        trend = int(np.sign(self.size_correlation)) if abs(self.size_correlation) >= SIZE_TREND_THRESHOLD else 0
+        lines = [SIZE_TEMPLATES[trend]]
+
+        phrases = OrderedDict()
+        outcome = self.status_labels[self.outcome_column].lower()
+        phrases.setdefault(self.best, []).append(
+            f"Highest success rate at {self.outcome_rates[self.best]:.0f}% {outcome}")
+        if self.largest not in (self.best, self.worst):
+            position = int(np.flatnonzero(self.ranking == self.largest)[0]) + 1
+            phrases.setdefault(self.largest, []).append(
+                f"Largest cohort, ranked {position} of {len(self.ranking)} at "
+                f"{self.outcome_rates[self.largest]:.0f}% {outcome}")
+        if self.worst != self.best:
+            worst_phrases = phrases.setdefault(self.worst, [])
+            worst_phrases.append(f"Lowest {outcome} rate at {self.outcome_rates[self.worst]:.0f}%")
+            # Call out any other status this cohort has the highest share of
+            led = [j for j in np.argsort(-self.lift[self.worst]) if self.leaders[j] == self.worst
+                   and j != self.outcome_column]
+            if led:
+                worst_phrases.append(f"highest {self.status_labels[led[0]].lower()} rate")
+        for reason in (self.best, self.worst):
+            if reason == self.largest:
+                phrases[reason].append("largest cohort")
+
+        for reason, reason_phrases in phrases.items():
+            lines.append(PATTERN_TEMPLATE.format(label=self.labels[reason], size=int(self.sizes[reason]),
+                                                 phrases=", ".join(reason_phrases)))
+        return "\n\n".join(lines)
+
+    def _render_takeaways(self):
+        outcome = self.status_labels[self.outcome_column].lower()
+        best, worst = self.best, self.worst
+        takeaways = [BEST_TEMPLATE.format(
+            label=self.labels[best], count=int(self.counts[best, self.outcome_column]),
+            size=int(self.sizes[best]), rate=self.outcome_rates[best], outcome=outcome)]
+
+        if worst != best:
+            takeaways.append(GAP_TEMPLATE.format(
+                best_label=self.labels[best], best_count=int(self.counts[best, self.outcome_column]),
+                best_size=int(self.sizes[best]), best_rate=self.outcome_rates[best],
+                worst_label=self.labels[worst], worst_count=int(self.counts[worst, self.outcome_column]),
+                worst_size=int(self.sizes[worst]), worst_rate=self.outcome_rates[worst],
+                gap=self.spread, outcome=outcome))
+
+        if len(self.statuses) > 1:
+            reason, status = np.unravel_index(int(np.argmax(self.lift)), self.lift.shape)
+            takeaways.append(DISTINCT_TEMPLATE.format(
+                label=self.labels[reason], size=int(self.sizes[reason]),
+                count=int(self.counts[reason, self.outcome_column]), rate=self.outcome_rates[reason],
+                outcome=outcome, status=self.status_labels[status].lower(),
+                status_count=int(self.counts[reason, status]), status_rate=self.rates[reason, status],
+                overall_rate=self.rates[reason, status] - self.lift[reason, status]))
+        return takeaways
+
+
+_cache = LRUCache(maxsize=32)
+
+
+def flow_insights(flow, outcome=DEFAULT_OUTCOME, labels=None, status_labels=None):
+    """FlowInsights, memoized per data fingerprint (and outcome and labels)"""
+
+    key = (flow.fingerprint, outcome, tuple(sorted((labels or {}).items())),
+           tuple(sorted((status_labels or {}).items())))
+    return _cache.get_or_build(key, lambda: FlowInsights(flow, outcome, labels, status_labels))
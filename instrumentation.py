@@ -0,0 +1,67 @@
+import json
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+
+class RerunTrace:
+    """Timings and cache counters for one run of the Streamlit script"""
+
+    def __init__(self, label=''):
+        self.label = label
+        self.started_at = time.time()
+        self._origin = time.perf_counter()
+        self.stages = []  # (name, offset seconds, duration seconds)
+        self.counters = Counter()
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            end = time.perf_counter()
+            self.stages.append((name, start - self._origin, end - start))
+
+    def count(self, event, n=1):
+        self.counters[event] += n
+
+    @property
+    def total_seconds(self):
+        return time.perf_counter() - self._origin
+
+    def to_record(self):
+        return {
+            'timestamp': self.started_at,
+            'label': self.label,
+            'total_ms': round(self.total_seconds * 1000, 3),
+            'stages': [{'name': name, 'offset_ms': round(offset * 1000, 3), 'ms': round(duration * 1000, 3)}
+                       for name, offset, duration in self.stages],
+            'counters': dict(self.counters),
+        }
+
+
+class NullTrace:
+    """Stand-in used when instrumentation is off, so callers never need to check"""
+
+    label = ''
+    stages = ()
+    counters = Counter()
+
+    @contextmanager
+    def stage(self, name):
+        yield
+
+    def count(self, event, n=1):
+        pass
+
+
+_append_lock = threading.Lock()
+
+
+def append_trace(path, trace):
+    """Append one trace as a JSON line, for offline analysis"""
+    line = json.dumps(trace.to_record())
+    with _append_lock, open(path, 'a', encoding='utf-8') as f:
+        f.write(line + '\n')
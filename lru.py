@@ -0,0 +1,45 @@
+import threading
+from collections import OrderedDict
+
+
+class LRUCache:
+    """Thread-safe LRU memo: values are built on a miss, outside the lock, and the oldest are evicted"""
+
+    def __init__(self, maxsize=64):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._values = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._values)
+
+    def __contains__(self, key):
+        return key in self._values
+
+    def get_or_build(self, key, builder):
+        """Return the cached value for `key`, calling `builder()` to create it on a miss"""
+
+        with self._lock:
+            if key in self._values:
+                self._values.move_to_end(key)
+                self.hits += 1
+                return self._values[key]
+            self.misses += 1
+
+        # Build outside the lock so one slow build doesn't block every other caller
+        value = builder()
+
+        with self._lock:
+            # Another thread may have built the same key meanwhile; keep the first so callers share one object
+            value = self._values.setdefault(key, value)
+            self._values.move_to_end(key)
+            while len(self._values) > self.maxsize:
+                self._values.popitem(last=False)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+            self.hits = self.misses = 0
@@ -0,0 +1,122 @@
+"""Precompile every dashboard chart to minified Plotly JSON (and optionally standalone HTML).
+
+Usage:
+    python precompile.py build/figures [--html] [--data responses.parquet]
+
+Point INTERNATIONALFLOW_FIGURE_DIR at the output directory to make app.py serve
+these files instead of rebuilding figures, or publish the HTML files on any
+static host for read-only audiences.
+"""
+import argparse
+import hashlib
+import html
+import json
+import os
+
+MANIFEST_NAME = 'manifest.json'
+# Files that shape the figures; a change to any of them invalidates precompiled output and reports
+CHART_MODULES = ('app.py', 'flow_matrix.py', 'sankey.py', 'bootstrap.py', 'downsample.py', 'scenarios.py',
+                 'taxonomy.py', 'taxonomy.json')
+
+
+def code_version(language, point_budget):
+    """Hash of the chart-building files, label language and point budget, stored next to the data fingerprint"""
+    digest = hashlib.sha1(f"{language}:{point_budget}".encode())
+    here = os.path.dirname(os.path.abspath(__file__))
+    for module in CHART_MODULES:
+        with open(os.path.join(here, module), 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+def figure_filename(builder_name, params):
+    """Deterministic file name for one chart/view combination"""
+    digest = hashlib.sha1(repr(params).encode()).hexdigest()[:12]
+    return f"{builder_name}-{digest}.json"
+
+
+def read_manifest(figure_dir):
+    manifest_path = os.path.join(figure_dir, MANIFEST_NAME)
+    if not os.path.exists(manifest_path):
+        return None
+    with open(manifest_path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def load_figure_json(path):
+    with open(path, 'rb') as f:
+        return json.loads(f.read())
+
+
+def load_precompiled_figure(figure_dir, builder_name, params):
+    """Load a precompiled figure as a Plotly Figure, or None if it was never built.
+
+    This saves building the figure (and the statistics behind it), not
+    serialising it: st.plotly_chart still validates and re-encodes the Figure.
+    """
+    import plotly.graph_objects as go
+
+    path = os.path.join(figure_dir, figure_filename(builder_name, params))
+    if not os.path.exists(path):
+        return None
+    # Figures were validated when they were built, so skip validation on load
+    return go.Figure(load_figure_json(path), skip_invalid=True)
+
+
+def _view_title(builder_name, params):
+    return f"{builder_name.replace('create_', '').replace('_', ' ').title()} {', '.join(map(str, params))}".strip()
+
+
+def build_figures(out_dir, source=None, write_html=False):
+    """Render every view of the dashboard into `out_dir` and return the manifest"""
+    import plotly.io as pio
+
+    import app
+
+    flow = app.load_flow_matrix(source)
+    os.makedirs(out_dir, exist_ok=True)
+
+    entries = []
+    for builder, params in app.figure_views(flow):
+        fig = builder(flow, *params)
+        filename = figure_filename(builder.__name__, params)
+
+        # Compact separators: plotly's own serializer pads with spaces
+        payload = json.dumps(json.loads(pio.to_json(fig, validate=False, remove_uids=True)), separators=(',', ':'))
+        with open(os.path.join(out_dir, filename), 'w', encoding='utf-8') as f:
+            f.write(payload)
+
+        entry = {'builder': builder.__name__, 'params': list(params), 'json': filename,
+                 'title': _view_title(builder.__name__, params)}
+        if write_html:
+            entry['html'] = filename.replace('.json', '.html')
+            fig.write_html(os.path.join(out_dir, entry['html']), include_plotlyjs='cdn', full_html=True)
+        entries.append(entry)
+
+    manifest = {'fingerprint': flow.fingerprint, 'code_version': code_version(app.TAXONOMY.language, app.POINT_BUDGET), 'source': source, 'figures': entries}
+    with open(os.path.join(out_dir, MANIFEST_NAME), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+
+    if write_html:
+        links = '\n'.join(f'<li><a href="{e["html"]}">{html.escape(e["title"])}</a></li>' for e in entries)
+        with open(os.path.join(out_dir, 'index.html'), 'w', encoding='utf-8') as f:
+            f.write(f"<!DOCTYPE html>\n<html><head><meta charset='utf-8'><title>Danish Journey Analyser</title></head>\n"
+                    f"<body><h1>From Arrival to Current Circumstances</h1>\n<ul>\n{links}\n</ul></body></html>\n")
+
+    return manifest
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Precompile dashboard figures to static files")
+    parser.add_argument('out_dir', help="Directory to write figures and manifest.json into")
+    parser.add_argument('--data', default=os.environ.get('INTERNATIONALFLOW_DATA'),
+                        help="Respondent-level CSV/Parquet export (defaults to the published figures)")
+    parser.add_argument('--html', action='store_true', help="Also write standalone HTML pages and an index")
+    args = parser.parse_args(argv)
+
+    manifest = build_figures(args.out_dir, source=args.data, write_html=args.html)
+    print(f"Wrote {len(manifest['figures'])} figures to {args.out_dir} (data {manifest['fingerprint']})")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,172 @@
+"""Integer count tables consistent with published, rounded percentages.
+
+A published table gives each cohort's size and the share of the cohort in each
+status, rounded to whole percent. Rounding every cell independently gives rows
+that don't add up to the cohort size. Instead, every cell is kept inside the
+interval its rounded percentage allows, every row is made to sum exactly to its
+cohort size, and overall status shares, where published, decide between the
+tables the rounding still allows. The fit is iterative proportional fitting on
+all rows at once, followed by a bounded largest-remainder rounding.
+"""
+import hashlib
+
+import numpy as np
+
+from lru import LRUCache
+
+DEFAULT_ITERATIONS = 50
+# Largest change (in people) between passes at which the fit stops; it is rounded afterwards anyway
+DEFAULT_TOLERANCE = 0.01
+
+
+def rounding_bounds(percentages, sizes, decimals=0):
+    """Smallest and largest whole counts whose share of each row rounds to the published percentage"""
+
+    percentages = np.asarray(percentages, dtype=float)
+    sizes = np.asarray(sizes, dtype=float)[:, None]
+    half = 0.5 * 10.0 ** -decimals
+    # The small slack keeps counts that land exactly on a rounding boundary
+    lower = np.ceil(sizes * (percentages - half) / 100 - 1e-9)
+    upper = np.floor(sizes * (percentages + half) / 100 + 1e-9)
+    return np.clip(lower, 0, sizes).astype(np.int64), np.clip(upper, 0, sizes).astype(np.int64)
+
+
+def fit_proportions(percentages, sizes, column_shares=None, lower=None, upper=None,
+                    iterations=DEFAULT_ITERATIONS, tolerance=DEFAULT_TOLERANCE):
+    """Real-valued table with row sums `sizes`, cells within [lower, upper] and, where given, column shares.
+
+    `column_shares` holds the published overall share of each status, with NaN for
+    statuses that have none; the constrained statuses are matched as shares of the
+    people in them, so cohorts missing from the table don't matter.
+    """
+
+    percentages = np.asarray(percentages, dtype=float)
+    sizes = np.asarray(sizes, dtype=float)
+    if lower is None or upper is None:
+        lower, upper = rounding_bounds(percentages, sizes)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        row_sums = percentages.sum(axis=1, keepdims=True)
+        fitted = np.where(row_sums > 0, sizes[:, None] * percentages / row_sums, 0.0)
+
+    constrained = None
+    if column_shares is not None:
+        column_shares = np.asarray(column_shares, dtype=float)
+        constrained = ~np.isnan(column_shares)
+        # Shares that are all zero say nothing about how the statuses compare
+        if column_shares[constrained].sum() <= 0:
+            constrained[:] = False
+        else:
+            target_shares = column_shares[constrained] / column_shares[constrained].sum()
+
+    previous = np.empty_like(fitted)
+    for _ in range(iterations):
+        previous[...] = fitted
+        if constrained is not None and constrained.any():
+            column_totals = fitted[:, constrained].sum(axis=0)
+            targets = target_shares * column_totals.sum()
+            with np.errstate(divide='ignore', invalid='ignore'):
+                fitted[:, constrained] *= np.where(column_totals > 0, targets / column_totals, 1.0)
+            np.clip(fitted, lower, upper, out=fitted)
+
+        totals = fitted.sum(axis=1)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            fitted *= np.where(totals > 0, sizes / totals, 0.0)[:, None]
+        np.clip(fitted, lower, upper, out=fitted)
+
+        previous -= fitted
+        if np.abs(previous).max(initial=0) < tolerance:
+            break
+    return fitted
+
+
+def apportion(fitted, sizes, lower, upper):
+    """Whole counts near `fitted` with rows summing exactly to `sizes`, kept within [lower, upper].
+
+    Cells start from the rounded-down fit; each pass hands the missing units of
+    every row to the cells with the largest unmet remainder (or takes surplus
+    units from the smallest). Gaps larger than one unit per cell, as in rows whose
+    published percentages are far from 100, are first closed in bulk in proportion
+    to the fit. Rows whose bounds can't be met are relaxed to 0..size.
+    """
+
+    fitted = np.asarray(fitted, dtype=float)
+    sizes = np.asarray(sizes, dtype=np.int64)
+    lower = np.array(lower, dtype=np.int64)
+    upper = np.array(upper, dtype=np.int64)
+    counts = np.clip(np.floor(fitted).astype(np.int64), lower, upper)
+    n_columns = counts.shape[1]
+    positions = np.broadcast_to(np.arange(n_columns), counts.shape)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        row_fits = fitted.sum(axis=1, keepdims=True)
+        weights = np.where(row_fits > 0, fitted / row_fits, 1.0 / max(n_columns, 1))
+
+    # Each bulk pass leaves less than one unit per cell or fills a cell, so this always suffices
+    for _ in range(2 * n_columns + 4):
+        gap = sizes - counts.sum(axis=1)
+        if not gap.any():
+            break
+
+        growing = (gap > 0)[:, None]
+        room = np.where(growing, upper - counts, counts - lower)
+        stuck = room.sum(axis=1) < np.abs(gap)
+        if stuck.any():
+            lower[stuck], upper[stuck] = 0, sizes[stuck, None]
+            continue
+
+        movable = room > 0
+        bulk = np.abs(gap) > movable.sum(axis=1)
+        if bulk.any():
+            share = np.where(movable[bulk], weights[bulk], 0.0)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                share = np.where(share.sum(axis=1, keepdims=True) > 0, share / share.sum(axis=1, keepdims=True),
+                                 movable[bulk] / movable[bulk].sum(axis=1, keepdims=True))
+            moved = np.minimum(np.floor(np.abs(gap[bulk])[:, None] * share).astype(np.int64), room[bulk])
+            counts[bulk] += np.sign(gap[bulk])[:, None] * moved
+            continue
+
+        claim = fitted - counts
+        priority = np.where(movable, np.where(growing, claim, -claim), -np.inf)
+        order = np.argsort(-priority, axis=1, kind='stable')
+        rank = np.empty_like(order)
+        np.put_along_axis(rank, order, positions, axis=1)
+        step = (rank < np.abs(gap)[:, None]) & movable
+        counts += np.sign(gap)[:, None] * step
+
+    missed = np.flatnonzero(counts.sum(axis=1) != sizes)
+    if missed.size:
+        raise ValueError(f"Could not apportion rows {missed.tolist()} to their sizes")
+    return counts
+
+
+def reconstruct_counts_uncached(percentages, sizes, column_shares=None, decimals=0):
+    percentages = np.asarray(percentages, dtype=float)
+    sizes = np.asarray(sizes, dtype=np.int64)
+    lower, upper = rounding_bounds(percentages, sizes, decimals)
+    fitted = fit_proportions(percentages, sizes, column_shares, lower, upper)
+    return apportion(fitted, sizes, lower, upper)
+
+
+_cache = LRUCache(maxsize=32)
+
+
+def reconstruct_counts(percentages, sizes, column_shares=None, decimals=0):
+    """Integer reason x status counts for a published table, memoized per table contents.
+
+    Rows sum exactly to `sizes`; each cell's share of its row rounds to the
+    published percentage whenever the published row allows it.
+    """
+
+    digest = hashlib.blake2b(digest_size=16)
+    for values in (percentages, sizes, [] if column_shares is None else column_shares):
+        array = np.ascontiguousarray(values, dtype=float)
+        digest.update(repr(array.shape).encode())
+        digest.update(array.tobytes())
+    key = (digest.hexdigest(), decimals)
+
+    def build():
+        counts = reconstruct_counts_uncached(percentages, sizes, column_shares, decimals)
+        counts.setflags(write=False)
+        return counts
+
+    return _cache.get_or_build(key, build)
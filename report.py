@@ -0,0 +1,181 @@
+"""Render report bundles (Sankey, status distribution, cohort overview) for many data slices.
+
+Usage:
+    python report.py slices.json reports/ --formats png svg pdf --workers 4
+
+slices.json is a list of slices, each with a "name" and one of:
+    {"name": "Published 2025", "year": 2025}
+    {"name": "Aarhus", "data": "aarhus.parquet"}
+    {"name": "Copenhagen, German", "filters": {"Region": ["Copenhagen"], "Nationality": ["DE"]}}
+Filter slices are cut from --data, indexed over the attributes they use. Slices
+with neither "data" nor "filters" use the published edition for "year" (the
+latest one without it) from --editions.
+
+Slices whose data and chart code are unchanged since the last run are skipped.
+PNG/SVG/PDF need kaleido (pip install kaleido); html and json need nothing extra.
+"""
+import argparse
+import hashlib
+import json
+import os
+import re
+import sys
+import tempfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+MANIFEST_NAME = 'manifest.json'
+DEFAULT_FORMATS = ['png']
+IMAGE_FORMATS = {'png', 'svg', 'pdf', 'jpg', 'jpeg', 'webp'}
+
+# (file stem, builder name in app.py, extra params)
+REPORT_CHARTS = [
+    ('sankey', 'create_sankey_diagram', ()),
+    ('status_distribution', 'create_stacked_bar_chart', (True,)),
+    ('status_distribution_percent', 'create_stacked_bar_chart', (False,)),
+    ('cohort_overview', 'create_cohort_overview', ()),
+]
+
+
+def _slug(name):
+    return re.sub(r'[^A-Za-z0-9]+', '-', name).strip('-').lower() or 'slice'
+
+
+def _code_version():
+    """Hash of the chart code, registry, label language and point budget, so any of them changing re-renders every slice"""
+    from downsample import point_budget
+    from precompile import code_version
+    from taxonomy import display_language
+    return code_version(display_language(), point_budget())
+
+
+def _write_manifest(path, manifest):
+    """Replace the manifest in one step, so an interrupted run keeps the slices it finished"""
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.json.tmp')
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def resolve_slices(slices, data=None, editions_dir=None):
+    """Turn slice specs into (name, FlowMatrix) pairs; cheap compared to rendering"""
+    from editions import EDITIONS_DIR, YearCatalog, latest_edition
+    from filters import load_respondent_index
+    from flow_matrix import FlowMatrix
+    from ingest import load_respondent_file
+
+    filter_attributes = sorted({name for spec in slices for name in spec.get('filters', {})})
+    index = None
+    if filter_attributes:
+        if not data:
+            raise ValueError("Slices with filters need --data pointing at a respondent-level export")
+        index = load_respondent_index(data, filter_attributes)
+    editions_dir = editions_dir or EDITIONS_DIR
+    uses_editions = any('filters' not in spec and 'data' not in spec for spec in slices)
+    catalog = YearCatalog.from_directory(editions_dir) if uses_editions else None
+
+    resolved = []
+    for spec in slices:
+        if 'filters' in spec:
+            flow = index.flow(spec['filters'])
+        elif 'data' in spec:
+            _, absolute_data, percentage_data, cohort_sizes = load_respondent_file(spec['data'])
+            flow = FlowMatrix.from_dicts(absolute_data, cohort_sizes, percentage_data)
+        else:
+            flow = catalog[spec['year'] if 'year' in spec else latest_edition(editions_dir)]
+        resolved.append((spec['name'], flow))
+    return resolved
+
+
+def render_slice(name, flow, out_dir, formats):
+    """Worker: build every report chart for one slice and write it in each format"""
+    import app
+
+    slice_dir = os.path.join(out_dir, _slug(name))
+    os.makedirs(slice_dir, exist_ok=True)
+    written = []
+    for stem, builder_name, params in REPORT_CHARTS:
+        fig = getattr(app, builder_name)(flow, *params)
+        for fmt in formats:
+            path = os.path.join(slice_dir, f"{stem}.{fmt}")
+            if fmt == 'html':
+                fig.write_html(path, include_plotlyjs='cdn')
+            elif fmt == 'json':
+                with open(path, 'w', encoding='utf-8') as f:
+                    f.write(fig.to_json())
+            else:
+                fig.write_image(path, format=fmt, width=1400, height=fig.layout.height or 700)
+            written.append(path)
+    return name, written
+
+
+def render_reports(slices, out_dir, formats=DEFAULT_FORMATS, workers=None, data=None, force=False, editions_dir=None):
+    """Render all slices across a process pool, skipping those whose content hash is unchanged.
+
+    Each slice's hash goes into the manifest as soon as it is written, so a run
+    that fails or is interrupted part-way only redoes the slices it didn't finish.
+    """
+
+    unknown = set(formats) - IMAGE_FORMATS - {'html', 'json'}
+    if unknown:
+        raise ValueError(f"Unsupported formats: {', '.join(sorted(unknown))}")
+    if IMAGE_FORMATS & set(formats):
+        try:
+            import kaleido  # noqa: F401
+        except ImportError as exc:
+            raise ImportError("PNG/SVG/PDF export requires kaleido (pip install kaleido)") from exc
+
+    os.makedirs(out_dir, exist_ok=True)
+    manifest_path = os.path.join(out_dir, MANIFEST_NAME)
+    manifest = {}
+    if os.path.exists(manifest_path):
+        with open(manifest_path, encoding='utf-8') as f:
+            manifest = json.load(f)
+
+    code_version = _code_version()
+    pending, skipped = [], []
+    for name, flow in resolve_slices(slices, data, editions_dir):
+        content_hash = hashlib.sha1(f"{flow.fingerprint}:{code_version}:{sorted(formats)}".encode()).hexdigest()
+        slice_dir = os.path.join(out_dir, _slug(name))
+        if not force and manifest.get(name) == content_hash and os.path.isdir(slice_dir):
+            skipped.append(name)
+        else:
+            pending.append((name, flow, content_hash))
+
+    rendered = []
+    if pending:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {pool.submit(render_slice, name, flow, out_dir, formats): (name, content_hash)
+                       for name, flow, content_hash in pending}
+            for future in as_completed(futures):
+                name, content_hash = futures[future]
+                future.result()
+                manifest[name] = content_hash
+                _write_manifest(manifest_path, manifest)
+                rendered.append(name)
+    return rendered, skipped
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Render chart bundles for many data slices")
+    parser.add_argument('slices', help="JSON file with a list of slice specifications")
+    parser.add_argument('out_dir', help="Directory for the report bundles")
+    parser.add_argument('--formats', nargs='+', default=DEFAULT_FORMATS,
+                        help="Any of png, svg, pdf, jpg, webp, html, json (default: png)")
+    parser.add_argument('--workers', type=int, help="Worker processes (default: one per CPU)")
+    parser.add_argument('--data', default=os.environ.get('INTERNATIONALFLOW_DATA'),
+                        help="Respondent-level export that filter slices are cut from")
+    parser.add_argument('--editions', default=os.environ.get('INTERNATIONALFLOW_EDITIONS'),
+                        help="Directory of published editions that year slices come from")
+    parser.add_argument('--force', action='store_true', help="Re-render every slice")
+    args = parser.parse_args(argv)
+
+    with open(args.slices, encoding='utf-8') as f:
+        slices = json.load(f)
+
+    rendered, skipped = render_reports(slices, args.out_dir, args.formats, args.workers, args.data, args.force,
+                                       args.editions)
+    print(f"Rendered {len(rendered)} slices, skipped {len(skipped)} unchanged", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+from functools import lru_cache
+
+import numpy as np
+
+# Color used for links and nodes outside the current highlight
+DIMMED_LINK_COLOR = 'rgba(200, 200, 200, 0.3)'
+DIMMED_NODE_COLOR = 'rgba(200, 200, 200, 0.7)'
+
+
+def hex_to_rgba(hex_color, alpha):
+    """Convert '#RRGGBB' to the 'rgba(r, g, b, a)' string Plotly expects"""
+    hex_color = hex_color.lstrip('#')
+    r, g, b = (int(hex_color[i:i + 2], 16) for i in (0, 2, 4))
+    return f"rgba({r}, {g}, {b}, {alpha})"
+
+
+@lru_cache(maxsize=64)
+def rgba_palette(hex_colors, alpha):
+    """Precomputed RGBA strings for a tuple of hex colors, indexable with integer arrays"""
+    return np.array([hex_to_rgba(color, alpha) for color in hex_colors], dtype=object)
+
+
+def build_links(counts, source_offset, target_offset, palette, highlighted_palette=None,
+                highlight=None, dimmed_color=DIMMED_LINK_COLOR):
+    """Turn a count matrix into Sankey link arrays without per-link Python work.
+
+    `palette` holds one RGBA string per target column. When a boolean `highlight`
+    mask (same shape as `counts`) is given, highlighted links use
+    `highlighted_palette` and everything else is dimmed.
+    """
+
+    counts = np.asarray(counts)
+    rows, cols = np.nonzero(counts > 0)  # Only include non-zero flows
+
+    if highlight is None:
+        colors = palette[cols]
+    else:
+        if highlighted_palette is None:
+            highlighted_palette = palette
+        colors = np.where(np.asarray(highlight)[rows, cols], highlighted_palette[cols], dimmed_color)
+
+    return rows + source_offset, cols + target_offset, counts[rows, cols], colors
+
+
+def build_node_colors(node_palette, highlight=None, dimmed_color=DIMMED_NODE_COLOR):
+    """Node colors from a precomputed palette, dimming nodes outside the highlight mask"""
+    if highlight is None:
+        return node_palette
+    return np.where(highlight, node_palette, dimmed_color)
+
+
+def build_multistage_flows(transitions, min_value=0):
+    """Chain N transition matrices (stage k -> stage k+1) into one Sankey layout.
+
+    Node indices and totals are assigned stage by stage: the first stage's totals
+    are its outflows, every later stage's totals are its inflows. Links with a
+    value below `min_value` are pruned, but node totals still count them.
+    Returns (node_offsets, node_totals, sources, targets, values).
+    """
+
+    transitions = [np.asarray(matrix) for matrix in transitions]
+    if not transitions:
+        raise ValueError("At least one transition matrix is required")
+    for k in range(1, len(transitions)):
+        if transitions[k - 1].shape[1] != transitions[k].shape[0]:
+            raise ValueError(
+                f"Transition {k - 1} ends in {transitions[k - 1].shape[1]} categories "
+                f"but transition {k} starts from {transitions[k].shape[0]}"
+            )
+
+    node_offsets = [0]
+    node_totals = [transitions[0].sum(axis=1)]
+    sources, targets, values = [], [], []
+
+    for matrix in transitions:
+        source_offset = node_offsets[-1]
+        target_offset = source_offset + matrix.shape[0]
+        node_offsets.append(target_offset)
+        node_totals.append(matrix.sum(axis=0))
+
+        rows, cols = np.nonzero((matrix > 0) & (matrix >= min_value))
+        sources.append(rows + source_offset)
+        targets.append(cols + target_offset)
+        values.append(matrix[rows, cols])
+
+    return (node_offsets, np.concatenate(node_totals),
+            np.concatenate(sources), np.concatenate(targets), np.concatenate(values))
@@ -0,0 +1,100 @@
+"""What-if scenarios for changes in the cohort mix.
+
+A scenario scales each cohort's size by a multiplier ("job-opportunity arrivals
++30%, spouse-job arrivals -20%") and keeps each cohort's outcome distribution.
+Projected status totals for a whole batch of scenarios are one matrix product,
+(scenarios x reasons) @ (reasons x statuses); the stochastic variant draws the
+scenarios' outcomes in batched multinomial calls, a block of scenarios at a time.
+"""
+import numpy as np
+
+from flow_matrix import FlowMatrix
+from lru import LRUCache
+
+DEFAULT_BATCH_SIZE = 5000
+DEFAULT_SPREAD = 0.5
+# Stochastic draws made at once (about 32 MB of int64); scenarios are drawn in blocks of this size
+BLOCK_CELLS = 2**22
+
+
+def outcome_shares(flow):
+    """Reasons x statuses share of each cohort in each status (rows sum to 1; empty cohorts are all 0)"""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(flow.row_totals[:, None] > 0, flow.counts / flow.row_totals[:, None], 0.0)
+
+
+def project_totals(flow, multipliers, stochastic=False, seed=0):
+    """Projected status totals for every scenario: (scenarios x reasons) multipliers -> (scenarios x statuses).
+
+    Deterministic projections are expected values. With `stochastic`, each
+    scenario's cohorts are drawn from their outcome distributions instead, in
+    blocks of scenarios that keep each (block, reasons, statuses) draw within
+    BLOCK_CELLS and are summed over reasons straight away.
+    """
+
+    multipliers = np.atleast_2d(np.asarray(multipliers, dtype=float))
+    sizes = multipliers * flow.cohort_sizes[None, :]
+    shares = outcome_shares(flow)
+    if not stochastic:
+        return sizes @ shares
+
+    rng = np.random.default_rng(seed)
+    # Empty cohorts get a dummy distribution; with zero trials they draw nothing anyway
+    shares[flow.row_totals == 0, 0] = 1.0
+    trials = np.rint(sizes).astype(np.int64)
+    totals = np.empty((len(trials), shares.shape[1]))
+    block = max(1, BLOCK_CELLS // max(shares.size, 1))
+    for start in range(0, len(trials), block):
+        totals[start:start + block] = rng.multinomial(trials[start:start + block], shares).sum(axis=1)
+    return totals
+
+
+def scenario_flow(flow, multipliers):
+    """FlowMatrix for one scenario, with whole counts whose rows add up to the scaled cohort sizes"""
+    from reconstruct import apportion
+
+    sizes = np.rint(np.asarray(multipliers, dtype=float) * flow.cohort_sizes).astype(np.int64)
+    expected = sizes[:, None] * outcome_shares(flow)
+    counts = apportion(expected, sizes, np.zeros_like(expected, dtype=np.int64),
+                       np.broadcast_to(sizes[:, None], expected.shape))
+    return FlowMatrix(counts, flow.reasons, flow.statuses, cohort_sizes=sizes)
+
+
+def random_multipliers(n_reasons, n_scenarios=DEFAULT_BATCH_SIZE, spread=DEFAULT_SPREAD, seed=0):
+    """Scenarios that scale every cohort independently by a factor in [1 - spread, 1 + spread]"""
+    rng = np.random.default_rng(seed)
+    return 1 + rng.uniform(-spread, spread, size=(n_scenarios, n_reasons))
+
+
+class ScenarioBatch:
+    """Projections for a batch of random scenarios and each cohort's effect across them"""
+
+    def __init__(self, flow, n_scenarios=DEFAULT_BATCH_SIZE, spread=DEFAULT_SPREAD, stochastic=False, seed=0):
+        self.statuses = flow.statuses
+        self.multipliers = random_multipliers(len(flow.reasons), n_scenarios, spread, seed)
+        self.totals = project_totals(flow, self.multipliers, stochastic, seed)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            self.shares = self.totals * 100 / self.totals.sum(axis=1, keepdims=True)
+
+        # Least-squares fit of every status share on the multipliers, all statuses at once.
+        # Scaled to 'percentage points per +10% arrivals' for each cohort.
+        design = np.column_stack([np.ones(len(self.multipliers)), self.multipliers - 1])
+        coefficients, *_ = np.linalg.lstsq(design, np.nan_to_num(self.shares), rcond=None)
+        self.effects = coefficients[1:] * 0.1  # reasons x statuses
+
+    def effect(self, status):
+        """Change in the overall share (percentage points) of `status` per +10% in each cohort"""
+        return self.effects[:, self.statuses.index(status)]
+
+    def share_range(self, status, quantiles=(0.05, 0.95)):
+        return np.quantile(self.shares[:, self.statuses.index(status)], quantiles)
+
+
+_cache = LRUCache(maxsize=8)
+
+
+def scenario_batch(flow, n_scenarios=DEFAULT_BATCH_SIZE, spread=DEFAULT_SPREAD, stochastic=False, seed=0):
+    """ScenarioBatch, memoized per data fingerprint and batch settings"""
+
+    key = (flow.fingerprint, n_scenarios, spread, stochastic, seed)
+    return _cache.get_or_build(key, lambda: ScenarioBatch(flow, n_scenarios, spread, stochastic, seed))
@@ -0,0 +1,208 @@
+"""Share the loaded survey data between dashboard worker processes through one memory-mapped file.
+
+The first worker to start builds the flow matrix (and, with microdata, the
+drill-down index) and publishes the arrays into a single file; every other
+worker maps that file read-only and wraps the arrays in place. The operating
+system keeps one copy of the pages however many workers attach, so extra
+workers add almost nothing to resident memory. Put the file on a RAM-backed
+filesystem such as /dev/shm for the same effect as POSIX shared memory, without
+the segment disappearing when the publishing process exits.
+
+Usage:
+    python shared_data.py publish /dev/shm/internationalflow.bin [--data responses.parquet --attributes Nationality,Region]
+    python shared_data.py show /dev/shm/internationalflow.bin
+"""
+import argparse
+import json
+import mmap
+import os
+import struct
+import tempfile
+
+import numpy as np
+
+from flow_matrix import FlowMatrix
+
+MAGIC = b'IFLOWSD1'
+ALIGNMENT = 64
+_HEADER = struct.Struct('<8sQ')
+
+
+def _aligned(offset):
+    return -(-offset // ALIGNMENT) * ALIGNMENT
+
+
+def dataset_key(source=None, attribute_columns=(), editions_dir=None):
+    """Identity of the data behind a published file, so stale files are rebuilt rather than attached"""
+    if source:
+        stat = os.stat(source)
+        origin = [os.path.abspath(source), stat.st_mtime_ns, stat.st_size]
+    else:
+        from editions import EDITIONS_DIR, latest_edition
+        editions_dir = editions_dir or EDITIONS_DIR
+        path = os.path.join(editions_dir, f"{latest_edition(editions_dir)}.json")
+        origin = [os.path.abspath(path), os.stat(path).st_mtime_ns]
+    return json.dumps([origin, sorted(attribute_columns)])
+
+
+def write_arrays(path, arrays, meta):
+    """Write named arrays and JSON metadata into one file, each array 64-byte aligned; atomic"""
+
+    arrays = {name: np.ascontiguousarray(array) for name, array in arrays.items()}
+    layout, offset = {}, 0
+    for name, array in arrays.items():
+        layout[name] = {'dtype': array.dtype.str, 'shape': list(array.shape), 'offset': offset}
+        offset = _aligned(offset + array.nbytes)
+    header = json.dumps({'meta': meta, 'arrays': layout}).encode()
+    data_start = _aligned(_HEADER.size + len(header))
+
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(_HEADER.pack(MAGIC, len(header)) + header)
+            for name, array in arrays.items():
+                f.seek(data_start + layout[name]['offset'])
+                f.write(array.tobytes())
+            f.truncate(data_start + offset)
+        os.chmod(tmp_path, 0o644)  # Readable by workers running under other accounts
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+class SharedArrays:
+    """Read-only, zero-copy views of the arrays in a file written by write_arrays()"""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, header_size = _HEADER.unpack_from(self._map)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a shared data file")
+        header = json.loads(self._map[_HEADER.size:_HEADER.size + header_size])
+        self.meta = header['meta']
+        data_start = _aligned(_HEADER.size + header_size)
+
+        # Each view keeps the mapping alive for as long as anything still references it
+        self.arrays = {}
+        for name, spec in header['arrays'].items():
+            dtype = np.dtype(spec['dtype'])
+            count = int(np.prod(spec['shape']))
+            self.arrays[name] = np.frombuffer(self._map, dtype=dtype, count=count,
+                                              offset=data_start + spec['offset']).reshape(spec['shape'])
+
+    @property
+    def nbytes(self):
+        return len(self._map)
+
+
+class SharedDataset:
+    """The flow matrix and optional drill-down index backed by a SharedArrays file"""
+
+    def __init__(self, shared):
+        self.shared = shared
+        meta, arrays = shared.meta, shared.arrays
+        self.key = meta['key']
+        # The flow matrix is a few hundred cells, so it is copied; the per-respondent arrays are not
+        self.flow = FlowMatrix(arrays['flow/counts'], meta['reasons'], meta['statuses'],
+                               cohort_sizes=arrays['flow/cohort_sizes'], percentages=arrays['flow/percentages'])
+
+        self.index = None
+        if 'index' in meta:
+            from filters import RespondentIndex
+            index_meta = meta['index']
+            bitmaps = {name: arrays[f"index/bitmaps/{name}"] for name in index_meta['values']}
+            self.index = RespondentIndex.from_arrays(arrays['index/cells'], bitmaps, index_meta['reasons'],
+                                                     index_meta['statuses'], index_meta['values'], index_meta['size'])
+
+
+def publish_dataset(path, key, flow, index=None):
+    """Write a flow matrix and optional RespondentIndex where other workers can attach to them"""
+
+    arrays = {'flow/counts': flow.counts, 'flow/cohort_sizes': flow.cohort_sizes,
+              'flow/percentages': flow.percentages}
+    meta = {'key': key, 'reasons': flow.reasons, 'statuses': flow.statuses}
+    if index is not None:
+        arrays['index/cells'] = index.cells
+        for name, bitmaps in index.bitmaps.items():
+            arrays[f"index/bitmaps/{name}"] = bitmaps
+        meta['index'] = {'reasons': index.reasons, 'statuses': index.statuses,
+                         'values': index.values, 'size': index.size}
+    write_arrays(path, arrays, meta)
+
+
+def attach_dataset(path, key=None):
+    """Map a published file; returns None if it is missing or was published for different data"""
+    if not os.path.exists(path):
+        return None
+    dataset = SharedDataset(SharedArrays(path))
+    if key is not None and dataset.key != key:
+        return None
+    return dataset
+
+
+def attach_or_publish(path, key, build):
+    """Attach to the published data, building and publishing it first if needed.
+
+    `build` returns (flow, index_or_None). Workers that race to publish each write
+    a complete file and rename it into place, so readers never see a partial one.
+    """
+    dataset = attach_dataset(path, key)
+    if dataset is None:
+        flow, index = build()
+        publish_dataset(path, key, flow, index)
+        dataset = attach_dataset(path, key)
+    return dataset
+
+
+def build_dataset(source=None, attribute_columns=(), editions_dir=None):
+    """(flow, index) for a respondent-level export, or the latest published edition without one"""
+    if source:
+        from ingest import load_respondent_file
+        _, absolute_data, percentage_data, cohort_sizes = load_respondent_file(source)
+    else:
+        from editions import EDITIONS_DIR, edition_counts, latest_edition, read_edition
+        editions_dir = editions_dir or EDITIONS_DIR
+        edition = read_edition(latest_edition(editions_dir), editions_dir)
+        absolute_data, percentage_data, cohort_sizes = edition_counts(edition)
+    flow = FlowMatrix.from_dicts(absolute_data, cohort_sizes, percentage_data)
+
+    index = None
+    if source and attribute_columns:
+        from filters import load_respondent_index
+        index = load_respondent_index(source, list(attribute_columns))
+    return flow, index
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Publish survey data for dashboard workers to share")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    publish_parser = commands.add_parser('publish', help="Build the data and write it to a shared file")
+    publish_parser.add_argument('path', help="Output file, ideally on a RAM-backed filesystem such as /dev/shm")
+    publish_parser.add_argument('--data', default=os.environ.get('INTERNATIONALFLOW_DATA'),
+                                help="Respondent-level CSV/Parquet export (defaults to the published figures)")
+    publish_parser.add_argument('--attributes', default=os.environ.get('INTERNATIONALFLOW_ATTRIBUTES', ''),
+                                help="Comma-separated attribute columns to include for drill-down")
+
+    show_parser = commands.add_parser('show', help="Summarise a shared file")
+    show_parser.add_argument('path')
+
+    args = parser.parse_args(argv)
+    if args.command == 'publish':
+        attributes = [c.strip() for c in args.attributes.split(',') if c.strip()]
+        flow, index = build_dataset(args.data, attributes)
+        publish_dataset(args.path, dataset_key(args.data, attributes), flow, index)
+
+    shared = SharedArrays(args.path)
+    print(f"{args.path}: {shared.nbytes / 1e6:.1f} MB")
+    for name, array in shared.arrays.items():
+        print(f"  {name}: {array.dtype} {tuple(array.shape)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+"""Synthetic survey data at configurable scales, for benchmarks and load testing."""
+import numpy as np
+import pandas as pd
+
+from flow_matrix import FlowMatrix
+from ingest import REASON_COLUMN, STATUS_COLUMN, STATUS_ORDER
+
+
+def synthetic_labels(n_reasons, n_statuses):
+    """Reason and status labels; the real statuses come first so every chart finds them"""
+    if n_statuses < len(STATUS_ORDER):
+        raise ValueError(f"At least {len(STATUS_ORDER)} statuses are needed, got {n_statuses}")
+    reasons = [f"Reason {i:04d}" for i in range(n_reasons)]
+    statuses = STATUS_ORDER + [f"Status {j:03d}" for j in range(len(STATUS_ORDER), n_statuses)]
+    return reasons, statuses
+
+
+def synthetic_outcome_shares(n_reasons, n_statuses, rng):
+    """Per-reason outcome distributions, skewed towards 'Working' like the real survey"""
+    alpha = np.full(n_statuses, 0.5)
+    alpha[0] = 4.0
+    return rng.dirichlet(alpha, size=n_reasons)
+
+
+def synthetic_counts(n_reasons, n_statuses, n_respondents, seed=0):
+    """A reason x status count matrix summing to n_respondents"""
+    rng = np.random.default_rng(seed)
+    cohort_sizes = rng.multinomial(n_respondents, rng.dirichlet(np.full(n_reasons, 2.0)))
+    shares = synthetic_outcome_shares(n_reasons, n_statuses, rng)
+    return rng.multinomial(cohort_sizes, shares)
+
+
+def synthetic_flow(n_reasons, n_statuses, n_respondents, seed=0):
+    """A FlowMatrix with synthetic labels and counts"""
+    reasons, statuses = synthetic_labels(n_reasons, n_statuses)
+    return FlowMatrix(synthetic_counts(n_reasons, n_statuses, n_respondents, seed), reasons, statuses)
+
+
+def iter_synthetic_respondents(n_reasons, n_statuses, n_respondents, chunksize=200_000, seed=0):
+    """Yield respondent-level DataFrames (reason, status) in chunks, never holding all rows"""
+    rng = np.random.default_rng(seed)
+    reasons, statuses = synthetic_labels(n_reasons, n_statuses)
+    reason_shares = rng.dirichlet(np.full(n_reasons, 2.0))
+    outcome_cdf = np.cumsum(synthetic_outcome_shares(n_reasons, n_statuses, rng), axis=1)
+
+    for start in range(0, n_respondents, chunksize):
+        size = min(chunksize, n_respondents - start)
+        reason_codes = rng.choice(n_reasons, size=size, p=reason_shares)
+        # Inverse-CDF sampling of each respondent's status given their reason
+        draws = rng.random(size)[:, None]
+        status_codes = np.minimum((draws > outcome_cdf[reason_codes]).sum(axis=1), n_statuses - 1)
+        yield pd.DataFrame({
+            REASON_COLUMN: pd.Categorical.from_codes(reason_codes, categories=reasons),
+            STATUS_COLUMN: pd.Categorical.from_codes(status_codes, categories=statuses),
+        })
+
+
+def write_synthetic_respondents(path, n_reasons, n_statuses, n_respondents, chunksize=200_000, seed=0):
+    """Stream synthetic respondents to a CSV or Parquet file"""
+    chunks = iter_synthetic_respondents(n_reasons, n_statuses, n_respondents, chunksize, seed)
+
+    if str(path).endswith(('.parquet', '.pq')):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        writer = None
+        try:
+            for chunk in chunks:
+                table = pa.Table.from_pandas(chunk, preserve_index=False)
+                if writer is None:
+                    writer = pq.ParquetWriter(path, table.schema)
+                writer.write_table(table)
+        finally:
+            if writer is not None:
+                writer.close()
+    else:
+        for i, chunk in enumerate(chunks):
+            chunk.to_csv(path, mode='w' if i == 0 else 'a', header=(i == 0), index=False)
+    return path
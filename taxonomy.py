@@ -0,0 +1,129 @@
+"""Category registry: codes, short and long labels and colours for every status and reason.
+
+Loaded once from taxonomy.json. Each kind of category is held as parallel
+arrays indexed by an integer code, with one extra slot at the end for names the
+file doesn't know (they keep their own name as label and get the default
+colour), so charts look labels and colours up with a single fancy-index instead
+of per-name dictionary lookups or string replaces. New categories and languages
+are added to the file; a language only needs the labels it changes, everything
+else falls back to English.
+"""
+import json
+import os
+from functools import lru_cache
+
+import numpy as np
+
+from sankey import rgba_palette
+
+TAXONOMY_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'taxonomy.json')
+DEFAULT_LANGUAGE = 'en'
+DEFAULT_COLOR = '#808080'
+
+
+def display_language():
+    """Language the charts are labelled in (INTERNATIONALFLOW_LANGUAGE, default English)"""
+    return os.environ.get('INTERNATIONALFLOW_LANGUAGE', DEFAULT_LANGUAGE)
+
+
+class Categories:
+    """One kind of category (statuses or reasons) as code-indexed label and colour tables"""
+
+    def __init__(self, entries, language=DEFAULT_LANGUAGE, default_color=DEFAULT_COLOR):
+        self.names = [entry['name'] for entry in entries]
+        self.codes = {name: code for code, name in enumerate(self.names)}
+        self.unknown = len(self.names)
+
+        long_labels, short_labels = [], []
+        for entry in entries:
+            translated = entry.get('labels', {}).get(language, {})
+            long_label = translated.get('long', entry.get('long', entry['name']))
+            long_labels.append(long_label)
+            short_labels.append(translated.get('short', entry.get('short', long_label)))
+        # The trailing slot belongs to unknown names; their labels are filled in from the names
+        self.long_labels = np.array(long_labels + [''], dtype=object)
+        self.short_labels = np.array(short_labels + [''], dtype=object)
+        self.colors = np.array([entry.get('color', default_color) for entry in entries] + [default_color],
+                               dtype=object)
+        self._encode = lru_cache(maxsize=64)(self._encode_uncached)
+
+    def _encode_uncached(self, names):
+        codes = np.fromiter((self.codes.get(name, self.unknown) for name in names), dtype=np.intp, count=len(names))
+        codes.flags.writeable = False
+        return codes
+
+    def encode(self, names):
+        """Integer code of each name; names not in the registry get `unknown`"""
+        return self._encode(tuple(names))
+
+    def _labels(self, table, names):
+        codes = self.encode(names)
+        labels = table[codes]
+        unknown = codes == self.unknown
+        if unknown.any():
+            labels[unknown] = np.asarray(list(names), dtype=object)[unknown]
+        return labels
+
+    def long(self, names):
+        return self._labels(self.long_labels, names)
+
+    def short(self, names):
+        return self._labels(self.short_labels, names)
+
+    def color(self, names):
+        """Hex colour of each name"""
+        return self.colors[self.encode(names)]
+
+    def rgba(self, names, alpha):
+        """'rgba(r, g, b, a)' string of each name, from a palette built once per alpha"""
+        return self.palette(alpha)[self.encode(names)]
+
+    def palette(self, alpha):
+        return rgba_palette(tuple(self.colors), alpha)
+
+    def color_of(self, name):
+        return self.colors[self.codes.get(name, self.unknown)]
+
+    def short_map(self):
+        """{name: short label} for APIs that take a mapping"""
+        return dict(zip(self.names, self.short_labels[:-1]))
+
+    def long_map(self):
+        """{name: long label} for APIs that take a mapping"""
+        return dict(zip(self.names, self.long_labels[:-1]))
+
+    def order(self, names):
+        """`names` with the registry's ones first, in registry order, then any others as given"""
+        present = set(names)
+        return [name for name in self.names if name in present] + [name for name in names if name not in self.codes]
+
+
+class Taxonomy:
+    """Statuses and reasons, plus the order statuses are stacked in"""
+
+    def __init__(self, data, language=DEFAULT_LANGUAGE):
+        default_color = data.get('default_color', DEFAULT_COLOR)
+        self.language = language
+        self.default_color = default_color
+        self.statuses = Categories(data['statuses'], language, default_color)
+        self.reasons = Categories(data['reasons'], language, default_color)
+        self.stack_order = list(data.get('stack_order', self.statuses.names))
+        self.languages = sorted({DEFAULT_LANGUAGE}.union(*(entry.get('labels', {})
+                                                           for entry in data['statuses'] + data['reasons'])))
+
+    def color_of(self, name):
+        """Colour of a status, else of a reason, else the default"""
+        if name in self.statuses.codes:
+            return self.statuses.color_of(name)
+        return self.reasons.color_of(name)
+
+
+@lru_cache(maxsize=None)
+def load_taxonomy(path=TAXONOMY_FILE, language=DEFAULT_LANGUAGE):
+    """The registry in `path`, read once per process (and language)"""
+    with open(path, encoding='utf-8') as f:
+        data = json.load(f)
+    taxonomy = Taxonomy(data, language)
+    if language not in taxonomy.languages:
+        raise ValueError(f"No {language!r} labels in {path}; available: {', '.join(taxonomy.languages)}")
+    return taxonomy
@@ -0,0 +1,65 @@
+import pandas as pd
+import pytest
+
+from aggregate_store import AggregateStore
+from ingest import REASON_COLUMN, STATUS_COLUMN
+
+
+def batch(rows):
+    return pd.DataFrame(rows, columns=[REASON_COLUMN, STATUS_COLUMN, 'Region'])
+
+
+def counts_of(flow, reason, status):
+    return flow.counts[flow.reasons.index(reason), flow.status_index[status]]
+
+
+def test_ingest_merges_batches_and_waves(tmp_path):
+    store = AggregateStore(tmp_path)
+    store.ingest([batch([('Job', 'Working', 'Aarhus'), ('Job', 'Left', None)])], 2024, ['Region'])
+    store.ingest([batch([('Study', 'Working', 'Odense')])], 2024, ['Region'])
+    store.ingest([batch([('Job', 'Working', 'Aarhus'), ('Job', 'Retired', 'Odense')])], 2025, ['Region'])
+
+    assert store.waves == ['2024', '2025']
+    assert store.meta['waves']['2024'] == {'respondents': 3, 'batches': 2}
+    assert store.counts().sum() == 5
+    assert store.counts(waves=[2024]).sum() == 3
+
+    everyone = store.flow()
+    assert counts_of(everyone, 'Job', 'Working') == 2
+    assert counts_of(everyone, 'Job', 'Retired') == 1
+    aarhus = store.flow(attribute='Region', values=['Aarhus'])
+    assert aarhus.counts.sum() == 2
+
+
+def test_version_counts_ingests_and_refresh_sees_other_writers(tmp_path):
+    store = AggregateStore(tmp_path)
+    reader = AggregateStore(tmp_path)
+    assert store.version == 0
+
+    store.ingest([batch([('Job', 'Working', 'Aarhus')])], 2024)
+
+    assert store.version == 1
+    assert reader.refresh()
+    assert reader.version == 1
+    assert not reader.refresh()
+
+
+def test_attribute_set_is_fixed_by_the_first_ingest(tmp_path):
+    store = AggregateStore(tmp_path)
+    store.ingest([batch([('Job', 'Working', 'Aarhus')])], 2024, ['Region'])
+
+    with pytest.raises(ValueError):
+        store.ingest([batch([('Job', 'Working', 'Aarhus')])], 2024)
+
+
+def test_partial_newer_than_metadata(tmp_path):
+    store = AggregateStore(tmp_path)
+    store.ingest([batch([('Job', 'Working', 'Aarhus')])], 2024)
+    reader = AggregateStore(tmp_path)
+    # A writer has saved a partial with a new reason but not yet the metadata that names it
+    store.ingest([batch([('Study', 'Retired', 'Aarhus')])], 2024)
+
+    counts = reader.counts()
+
+    assert counts.shape == (1, len(reader.meta['statuses']))
+    assert counts.sum() == 1
@@ -0,0 +1,161 @@
+import asyncio
+import json
+import threading
+
+import pandas as pd
+import pytest
+
+from aggregation_service import AggregationClient, AggregationService, LocalAggregationBackend
+from ingest import REASON_COLUMN, STATUS_COLUMN
+
+
+@pytest.fixture
+def backend(tmp_path):
+    path = tmp_path / 'responses.csv'
+    pd.DataFrame({
+        REASON_COLUMN: ['Job', 'Job', 'Study', 'Study', 'Job'],
+        STATUS_COLUMN: ['Working', 'Left', 'Studying', 'Working', 'Working'],
+        'Region': ['Aarhus', 'Odense', 'Aarhus', 'Aarhus', 'Odense'],
+    }).to_csv(path, index=False)
+    return LocalAggregationBackend(str(path), ['Region'])
+
+
+class CountingBackend:
+    """Wraps a backend, counting calls and optionally holding them until released"""
+
+    def __init__(self, backend, error=None):
+        self.backend = backend
+        self.error = error
+        self.calls = 0
+        self.release = threading.Event()
+
+    @property
+    def values(self):
+        return self.backend.values
+
+    def flow(self, selection=None):
+        self.calls += 1
+        self.release.wait(5)
+        if self.error:
+            raise self.error
+        return self.backend.flow(selection)
+
+
+def test_repeated_requests_hit_the_cache(backend):
+    service = AggregationService(backend)
+
+    async def run():
+        first = await service.flow_payload({'Region': ['Aarhus']})
+        second = await service.flow_payload({'Region': ['Aarhus'], 'Unused': []})
+        return first, second
+
+    first, second = asyncio.run(run())
+
+    assert first is second
+    assert service.stats == {'hits': 1, 'misses': 1, 'coalesced': 0}
+    assert sum(map(sum, json.loads(first)['counts'])) == 3
+
+
+def test_concurrent_identical_requests_are_computed_once(backend):
+    counting = CountingBackend(backend)
+    service = AggregationService(counting)
+
+    async def run():
+        requests = [asyncio.create_task(service.flow_payload({})) for _ in range(5)]
+        await asyncio.sleep(0.05)
+        counting.release.set()
+        return await asyncio.gather(*requests)
+
+    payloads = asyncio.run(run())
+
+    assert counting.calls == 1
+    assert len(set(payloads)) == 1
+    assert service.stats['coalesced'] == 4
+
+
+def test_errors_reach_every_coalesced_request(backend):
+    counting = CountingBackend(backend, error=ValueError("bad filter"))
+    service = AggregationService(counting)
+
+    async def run():
+        requests = [asyncio.create_task(service.flow_payload({})) for _ in range(3)]
+        await asyncio.sleep(0.05)
+        counting.release.set()
+        return await asyncio.gather(*requests, return_exceptions=True)
+
+    results = asyncio.run(run())
+
+    assert counting.calls == 1
+    assert all(isinstance(result, ValueError) for result in results)
+    assert not service._inflight and not service._cache
+
+
+@pytest.mark.parametrize('method, target, status', [
+    ('GET', '/health', 200),
+    ('GET', '/flow?filters=%7B%22Region%22%3A%5B%22Aarhus%22%5D%7D', 200),
+    ('GET', '/flow?filters=not-json', 400),
+    ('GET', '/flow?filters=%7B%22Nationality%22%3A%5B%22DE%22%5D%7D', 400),
+    ('GET', '/missing', 404),
+    ('POST', '/flow', 405),
+])
+def test_handle_status_codes(backend, method, target, status):
+    service = AggregationService(backend)
+
+    code, body = asyncio.run(service.handle(method, target))
+
+    assert code == status
+    json.loads(body)
+
+
+@pytest.fixture
+def server_url(backend):
+    """The service on an ephemeral port, run on a background event loop"""
+    service = AggregationService(backend)
+    service.connections = 0
+    serve_connection = service.serve_connection
+
+    async def counted(reader, writer):
+        service.connections += 1
+        await serve_connection(reader, writer)
+
+    service.serve_connection = counted
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    server = asyncio.run_coroutine_threadsafe(service.start(port=0), loop).result()
+    port = server.sockets[0].getsockname()[1]
+    yield f"http://127.0.0.1:{port}", service
+    server.close()
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join()
+
+
+def test_client_reuses_pooled_connections(server_url):
+    url, service = server_url
+    client = AggregationClient(url)
+
+    everyone = client.flow()
+    aarhus = client.flow({'Region': ['Aarhus']})
+
+    assert everyone.grand_total == 5
+    assert aarhus.grand_total == 3
+    assert client.values == {'Region': ['Aarhus', 'Odense']}
+    assert service.connections == 1
+
+
+def test_client_retries_once_on_a_dropped_connection(server_url):
+    url, service = server_url
+    client = AggregationClient(url)
+    client.flow()
+    # The pooled connection dies between requests, as when the server restarts
+    client._pool.queue[0].sock.close()
+
+    assert client.flow().grand_total == 5
+    assert service.connections == 2
+
+
+def test_client_gives_up_after_the_retry():
+    client = AggregationClient('http://127.0.0.1:9', timeout=1)
+
+    with pytest.raises(OSError):
+        client.flow()
@@ -0,0 +1,38 @@
+import numpy as np
+
+import bootstrap
+from bootstrap import bootstrap_flow, replicate_plan
+from synthetic import synthetic_flow
+
+
+def test_blocked_intervals_match_quantiles_over_every_replicate(monkeypatch):
+    flow = synthetic_flow(12, 6, 10**4)
+    monkeypatch.setattr(bootstrap, 'BLOCK_CELLS', 12 * 6 * 150)
+    replicates, block = replicate_plan(flow.counts.size, 1000)
+    assert block < replicates
+
+    intervals = bootstrap_flow(flow, replicates=1000)
+
+    shares = flow.counts / flow.row_totals[:, None]
+    draws = np.random.default_rng(0).multinomial(flow.cohort_sizes, shares, size=(replicates, len(shares)))
+    np.testing.assert_allclose(intervals.flow_lower, np.quantile(draws, 0.025, axis=0))
+    np.testing.assert_allclose(intervals.flow_upper, np.quantile(draws, 0.975, axis=0))
+    np.testing.assert_allclose(intervals.total_lower, np.quantile(draws.sum(axis=1), 0.025, axis=0))
+
+
+def test_selected_statuses_only():
+    flow = synthetic_flow(8, 6, 10**4)
+
+    intervals = bootstrap_flow(flow, replicates=1000, statuses=['Working', 'Unknown'])
+
+    assert intervals.statuses == ['Working']
+    assert intervals.flow_lower.shape == intervals.flow_upper.shape == (8, 1)
+    assert (intervals.flow_lower <= intervals.flow_upper).all()
+    assert (intervals.rate_upper <= 100).all()
+
+
+def test_replicate_plan_stays_within_draw_budget():
+    replicates, block = replicate_plan(10**5)
+
+    assert replicates * 10**5 <= bootstrap.MAX_DRAW_CELLS or replicates == bootstrap.MIN_REPLICATES
+    assert block <= replicates
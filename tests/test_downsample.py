@@ -0,0 +1,60 @@
+import numpy as np
+
+from downsample import MAX_STATUSES, OTHER_STATUS, bucket_reasons, bucket_statuses, fit_to_budget, other_reasons_label
+from synthetic import synthetic_flow
+
+
+def assert_same_people(bucketed, flow):
+    assert bucketed.grand_total == flow.grand_total
+    assert bucketed.cohort_sizes.sum() == flow.cohort_sizes.sum()
+    np.testing.assert_array_equal(bucketed.counts.sum(axis=1), bucketed.row_totals)
+
+
+def test_bucket_reasons_keeps_the_largest_cohorts_in_order():
+    flow = synthetic_flow(50, 6, 10**5)
+
+    bucketed = bucket_reasons(flow, 10)
+
+    assert len(bucketed.reasons) == 10
+    assert bucketed.reasons[-1] == other_reasons_label(41)
+    kept = [flow.reasons.index(reason) for reason in bucketed.reasons[:-1]]
+    assert kept == sorted(kept)
+    assert flow.cohort_sizes[kept].min() >= np.delete(flow.cohort_sizes, kept).max()
+    np.testing.assert_array_equal(bucketed.counts.sum(axis=0), flow.counts.sum(axis=0))
+    assert_same_people(bucketed, flow)
+
+
+def test_bucket_statuses_folds_into_other():
+    flow = synthetic_flow(5, 20, 10**4)
+
+    bucketed = bucket_statuses(flow)
+
+    assert len(bucketed.statuses) <= MAX_STATUSES
+    assert bucketed.statuses[-1] == OTHER_STATUS
+    np.testing.assert_array_equal(bucketed.counts.sum(axis=1), flow.counts.sum(axis=1))
+    assert_same_people(bucketed, flow)
+
+
+def test_bucket_statuses_keeps_the_named_ones():
+    flow = synthetic_flow(5, 12, 10**4)
+
+    bucketed = bucket_statuses(flow, keep=flow.statuses[:2])
+
+    assert bucketed.statuses == flow.statuses[:2] + [OTHER_STATUS]
+    assert_same_people(bucketed, flow)
+
+
+def test_fit_to_budget_stays_within_the_budget():
+    flow = synthetic_flow(400, 20, 10**5)
+
+    for marks_per_reason in (None, 1):
+        fitted = fit_to_budget(flow, 300, marks_per_reason=marks_per_reason)
+        per_reason = len(fitted.statuses) if marks_per_reason is None else 1
+        assert len(fitted.reasons) * per_reason <= 300
+        assert_same_people(fitted, flow)
+
+
+def test_small_flows_are_left_alone():
+    flow = synthetic_flow(5, 6, 10**3)
+
+    assert fit_to_budget(flow, 300) is flow
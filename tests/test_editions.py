@@ -0,0 +1,66 @@
+import json
+
+import pytest
+
+from editions import YearCatalog, edition_counts, latest_edition, list_editions
+
+
+def write_edition(directory, year, percentage_data, cohort_sizes):
+    with open(directory / f"{year}.json", 'w', encoding='utf-8') as f:
+        json.dump({'year': year, 'cohort_sizes': cohort_sizes, 'percentage_data': percentage_data}, f)
+
+
+@pytest.fixture
+def editions_dir(tmp_path):
+    write_edition(tmp_path, 2025, {'Job': {'Working': 80, 'Left': 20}}, {'Job': 100})
+    write_edition(tmp_path, 2019, {'Job': {'Working': 50, 'Left': 50}}, {'Job': 10})
+    write_edition(tmp_path, 2022, {'Job': {'Working': 60, 'Left': 40}, 'Study': {'Studying': 100}},
+                  {'Job': 50, 'Study': 20})
+    (tmp_path / 'notes.json').write_text('{}')
+    return tmp_path
+
+
+def test_years_in_order_ignoring_other_files(editions_dir):
+    assert list_editions(editions_dir) == [2019, 2022, 2025]
+    assert latest_edition(editions_dir) == 2025
+
+
+def test_no_editions_is_a_clear_error(tmp_path):
+    assert list_editions(tmp_path / 'missing') == []
+    with pytest.raises(FileNotFoundError, match='No published editions'):
+        latest_edition(tmp_path)
+
+
+def test_catalog_loads_years_on_demand(editions_dir):
+    catalog = YearCatalog.from_directory(editions_dir, maxsize=2)
+
+    assert catalog.years == [2019, 2022, 2025]
+    assert catalog.loaded == 0
+    assert catalog[2022].reasons == ['Job', 'Study']
+    assert catalog[2022] is catalog[2022]
+    assert catalog.loaded == 1
+    with pytest.raises(KeyError):
+        catalog[2020]
+
+
+def test_catalog_follows_a_growing_versioned_source():
+    data = {'2024': 'first'}
+    version = [0]
+    catalog = YearCatalog(lambda: list(data), lambda year: (data[year], version[0]), version=lambda: version[0])
+
+    assert catalog['2024'] == ('first', 0)
+    data['2024'], data['2025'] = 'second', 'new'
+    version[0] = 1
+
+    assert catalog.years == ['2024', '2025']
+    assert catalog['2024'] == ('second', 1)
+
+
+def test_edition_counts_fill_missing_statuses_with_zero():
+    edition = {'cohort_sizes': {'Job': 50, 'Study': 20},
+               'percentage_data': {'Job': {'Working': 60, 'Left': 40}, 'Study': {'Studying': 100}}}
+
+    absolute_data, _, _ = edition_counts(edition)
+
+    assert absolute_data == {'Job': {'Working': 30, 'Left': 20, 'Studying': 0},
+                             'Study': {'Working': 0, 'Left': 0, 'Studying': 20}}
@@ -0,0 +1,57 @@
+import io
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+from export import ExportStream, iter_export, respondent_batches
+from ingest import REASON_COLUMN, STATUS_COLUMN
+
+
+def respondents(n=1000):
+    rng = np.random.default_rng(0)
+    return pd.DataFrame({
+        REASON_COLUMN: rng.choice(['Job', 'Study'], n),
+        STATUS_COLUMN: rng.choice(['Working', 'Left'], n),
+        'Region': rng.choice(['Aarhus', 'Odense'], n),
+        'Age': rng.integers(20, 70, n),
+    })
+
+
+def read_back(data, fmt):
+    if fmt == 'csv':
+        return pd.read_csv(io.BytesIO(data))
+    if fmt == 'arrow':
+        return pa.ipc.open_stream(data).read_all().to_pandas()
+    return pq.read_table(io.BytesIO(data)).to_pandas()
+
+
+@pytest.mark.parametrize('fmt', ['csv', 'arrow', 'parquet'])
+def test_chunked_export_round_trips(fmt):
+    frame = respondents()
+    batches = (frame.iloc[start:start + 300].reset_index(drop=True) for start in range(0, len(frame), 300))
+
+    data = ExportStream(iter_export(batches, fmt)).read()
+
+    pd.testing.assert_frame_equal(read_back(data, fmt), frame, check_dtype=False)
+
+
+def test_unknown_format():
+    with pytest.raises(ValueError):
+        list(iter_export(iter([respondents()]), 'xlsx'))
+
+
+def test_respondent_batches_filter_and_stop_at_max_rows(tmp_path):
+    frame = respondents()
+    path = tmp_path / 'responses.csv'
+    frame.to_csv(path, index=False)
+
+    aarhus = pd.concat(respondent_batches(path, {'Region': ['Aarhus']}, chunksize=100))
+    capped = pd.concat(respondent_batches(path, {'Region': ['Aarhus']}, chunksize=100, max_rows=150))
+
+    expected = frame[frame['Region'] == 'Aarhus']
+    assert len(aarhus) == len(expected)
+    assert len(capped) == 150
+    np.testing.assert_array_equal(capped['Age'].astype(int).to_numpy(), expected['Age'].to_numpy()[:150])
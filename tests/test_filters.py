@@ -0,0 +1,48 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from filters import build_respondent_index
+from ingest import REASON_COLUMN, STATUS_COLUMN
+
+
+def random_respondents(rng, n=5000):
+    return pd.DataFrame({
+        REASON_COLUMN: rng.choice(['Job', 'Partner', 'Study'], n),
+        STATUS_COLUMN: rng.choice(['Working', 'Studying', 'Left', 'Retired'], n),
+        'Region': rng.choice(['Copenhagen', 'Aarhus', 'Odense', None], n),
+        'Age Band': rng.choice(['20-29', '30-39', '40+'], n),
+    })
+
+
+def groupby_counts(frame, index):
+    counts = frame.groupby([REASON_COLUMN, STATUS_COLUMN]).size().unstack(fill_value=0)
+    return counts.reindex(index=index.reasons, columns=index.statuses, fill_value=0).to_numpy()
+
+
+@pytest.mark.parametrize('selection', [
+    {},
+    {'Region': ['Aarhus']},
+    {'Region': ['Aarhus', 'Odense'], 'Age Band': ['40+']},
+    {'Region': [], 'Age Band': ['20-29']},
+])
+def test_flow_matches_pandas_groupby(selection):
+    frame = random_respondents(np.random.default_rng(0))
+    # Split into chunks so codes are merged across them
+    index = build_respondent_index([frame.iloc[start:start + 2000] for start in range(0, len(frame), 2000)], ['Region', 'Age Band'])
+
+    flow = index.flow(selection)
+
+    expected = frame
+    for name, chosen in selection.items():
+        if chosen:
+            expected = expected[expected[name].isin(chosen)]
+    np.testing.assert_array_equal(flow.counts, groupby_counts(expected, index))
+    np.testing.assert_array_equal(flow.percentages, np.rint(flow.counts * 100 / flow.counts.sum(axis=1, keepdims=True)))
+
+
+def test_statuses_in_dashboard_order_with_unknown_ones_last():
+    index = build_respondent_index([random_respondents(np.random.default_rng(1), 500)], [])
+
+    assert index.statuses[-1] == 'Retired'
+    assert index.statuses.index('Working') < index.statuses.index('Left')
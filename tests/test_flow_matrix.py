@@ -0,0 +1,36 @@
+import numpy as np
+
+from flow_matrix import FlowMatrix
+
+
+def test_from_dicts_keeps_statuses_only_some_reasons_have():
+    absolute_data = {
+        'A': {'Working': 50, 'Left': 10},
+        'B': {'Working': 20, 'Studying': 80, 'Left': 5},
+    }
+
+    flow = FlowMatrix.from_dicts(absolute_data, {'A': 60, 'B': 105})
+
+    assert flow.statuses == ['Working', 'Left', 'Studying']
+    np.testing.assert_array_equal(flow.counts, [[50, 10, 0], [20, 5, 80]])
+    np.testing.assert_array_equal(flow.row_totals, [60, 105])
+    assert flow.status_total('Studying') == 80
+
+
+def test_from_dicts_fills_missing_percentages_with_zero():
+    flow = FlowMatrix.from_dicts({'A': {'Working': 1}, 'B': {'Left': 1}}, {'A': 1, 'B': 1},
+                                 {'A': {'Working': 100}, 'B': {'Left': 100}})
+
+    np.testing.assert_array_equal(flow.percentages, [[100, 0], [0, 100]])
+
+
+def test_totals_and_fingerprint():
+    flow = FlowMatrix([[3, 1], [0, 4]], ['A', 'B'], ['Working', 'Left'])
+    same = FlowMatrix([[3, 1], [0, 4]], ['A', 'B'], ['Working', 'Left'])
+    other = FlowMatrix([[3, 1], [1, 3]], ['A', 'B'], ['Working', 'Left'])
+
+    np.testing.assert_array_equal(flow.column_totals, [3, 5])
+    assert flow.grand_total == 8
+    assert flow.fingerprint == same.fingerprint != other.fingerprint
+    assert not flow.counts.flags.writeable
+
@@ -0,0 +1,43 @@
+import json
+
+import pytest
+
+from instrumentation import NullTrace, RerunTrace, append_trace
+
+
+def test_stages_and_counters_are_recorded():
+    trace = RerunTrace('overview')
+    with trace.stage('load'):
+        pass
+    with pytest.raises(RuntimeError):
+        with trace.stage('chart'):
+            raise RuntimeError
+    trace.count('cache_hit')
+    trace.count('cache_hit', 2)
+
+    record = trace.to_record()
+
+    assert [stage['name'] for stage in record['stages']] == ['load', 'chart']
+    assert all(stage['ms'] >= 0 and stage['offset_ms'] >= 0 for stage in record['stages'])
+    assert record['stages'][1]['offset_ms'] >= record['stages'][0]['offset_ms']
+    assert record['counters'] == {'cache_hit': 3}
+    assert record['label'] == 'overview'
+
+
+def test_null_trace_records_nothing():
+    trace = NullTrace()
+    with trace.stage('load'):
+        trace.count('cache_hit')
+
+    assert trace.stages == ()
+    assert not trace.counters
+
+
+def test_append_trace_writes_one_json_line_per_trace(tmp_path):
+    path = tmp_path / 'trace.jsonl'
+    for label in ('first', 'second'):
+        append_trace(path, RerunTrace(label))
+
+    records = [json.loads(line) for line in path.read_text().splitlines()]
+
+    assert [record['label'] for record in records] == ['first', 'second']
@@ -0,0 +1,48 @@
+import numpy as np
+import pytest
+
+from reconstruct import reconstruct_counts_uncached, rounding_bounds
+
+
+def random_table(rng):
+    """Random published table: rounded percentages, sometimes far from 100% or with statuses missing"""
+    n_reasons, n_statuses = rng.integers(1, 12), rng.integers(1, 10)
+    sizes = rng.integers(0, 10_000, n_reasons)
+    percentages = np.round(rng.dirichlet(np.ones(n_statuses), n_reasons) * 100)
+    # Drop statuses from some rows, or scale them, so rows add up to anything from 0 to well over 100
+    percentages[rng.random(percentages.shape) < 0.2] = 0
+    percentages *= rng.choice([1.0, 1.0, 0.5, 0.9, 1.3], size=(n_reasons, 1))
+    column_shares = None
+    if rng.random() < 0.5:
+        column_shares = np.round(rng.dirichlet(np.ones(n_statuses)) * 100)
+        column_shares[rng.random(n_statuses) < 0.3] = np.nan
+    return np.round(percentages), sizes, column_shares
+
+
+@pytest.mark.parametrize('seed', range(200))
+def test_rows_sum_to_cohort_sizes(seed):
+    percentages, sizes, column_shares = random_table(np.random.default_rng(seed))
+
+    counts = reconstruct_counts_uncached(percentages, sizes, column_shares)
+
+    assert counts.shape == percentages.shape
+    assert (counts >= 0).all()
+    np.testing.assert_array_equal(counts.sum(axis=1), sizes)
+
+
+def test_rows_far_from_100_percent():
+    counts = reconstruct_counts_uncached([[60, 20, 5, 5]], [5000])
+
+    assert counts.sum() == 5000
+    assert (np.diff(counts[0][:3]) < 0).all()
+
+
+def test_consistent_rows_stay_within_rounding_bounds():
+    percentages = np.array([[85, 5, 2, 2, 3, 4], [59, 20, 5, 5, 6, 4], [48, 22, 4, 14, 6, 5]])
+    sizes = np.array([475, 518, 367])
+
+    counts = reconstruct_counts_uncached(percentages, sizes)
+
+    lower, upper = rounding_bounds(percentages, sizes)
+    np.testing.assert_array_equal(counts.sum(axis=1), sizes)
+    assert ((counts >= lower) & (counts <= upper)).all()
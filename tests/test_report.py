@@ -0,0 +1,25 @@
+import json
+
+import pytest
+
+from report import resolve_slices
+
+
+@pytest.fixture
+def editions_dir(tmp_path):
+    for year, working in ((2022, 60), (2025, 80)):
+        edition = {'cohort_sizes': {'Job': 100}, 'percentage_data': {'Job': {'Working': working, 'Left': 100 - working}}}
+        (tmp_path / f"{year}.json").write_text(json.dumps(edition))
+    return tmp_path
+
+
+def test_slices_without_a_year_use_the_latest_edition(editions_dir):
+    resolved = dict(resolve_slices([{'name': 'Default'}, {'name': 'Old', 'year': 2022}], editions_dir=editions_dir))
+
+    assert resolved['Default'].counts.tolist() == [[80, 20]]
+    assert resolved['Old'].counts.tolist() == [[60, 40]]
+
+
+def test_no_editions_is_a_clear_error(tmp_path):
+    with pytest.raises(FileNotFoundError, match='No published editions'):
+        resolve_slices([{'name': 'Default'}], editions_dir=tmp_path)
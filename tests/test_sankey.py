@@ -0,0 +1,68 @@
+import numpy as np
+import pytest
+
+from sankey import build_links, build_multistage_flows, build_node_colors, hex_to_rgba, rgba_palette
+
+
+def test_hex_to_rgba():
+    assert hex_to_rgba('#2E8B57', 0.6) == 'rgba(46, 139, 87, 0.6)'
+
+
+def test_build_links_skips_empty_cells_and_colours_by_target():
+    counts = np.array([[5, 0, 2], [0, 3, 0]])
+    palette = rgba_palette(('#FF0000', '#00FF00', '#0000FF'), 0.5)
+
+    sources, targets, values, colors = build_links(counts, 0, 2, palette)
+
+    np.testing.assert_array_equal(sources, [0, 0, 1])
+    np.testing.assert_array_equal(targets, [2, 4, 3])
+    np.testing.assert_array_equal(values, [5, 2, 3])
+    assert list(colors) == [palette[0], palette[2], palette[1]]
+    assert values.sum() == counts.sum()
+
+
+def test_build_links_dims_links_outside_the_highlight():
+    counts = np.array([[1, 1], [1, 1]])
+    palette = np.array(['a', 'b'], dtype=object)
+    highlight = np.array([[True, False], [False, False]])
+
+    *_, colors = build_links(counts, 0, 2, palette, np.array(['A', 'B'], dtype=object), highlight, dimmed_color='x')
+
+    assert list(colors) == ['A', 'x', 'x', 'x']
+
+
+def test_build_node_colors():
+    palette = np.array(['a', 'b', 'c'], dtype=object)
+
+    assert build_node_colors(palette) is palette
+    assert list(build_node_colors(palette, np.array([True, False, True]), dimmed_color='x')) == ['a', 'x', 'c']
+
+
+def test_build_multistage_flows_offsets_totals_and_links():
+    first = np.array([[4, 1], [0, 5]])
+    second = np.array([[2, 1, 1], [3, 0, 3]])
+
+    offsets, totals, sources, targets, values = build_multistage_flows([first, second])
+
+    assert offsets == [0, 2, 4]
+    np.testing.assert_array_equal(totals, [5, 5, 4, 6, 5, 1, 4])
+    assert len(values) == np.count_nonzero(first) + np.count_nonzero(second)
+    np.testing.assert_array_equal(sources, [0, 0, 1, 2, 2, 2, 3, 3])
+    np.testing.assert_array_equal(targets, [2, 3, 3, 4, 5, 6, 4, 6])
+    assert values.sum() == first.sum() + second.sum()
+
+
+def test_build_multistage_flows_prunes_small_links_but_keeps_their_totals():
+    matrix = np.array([[10, 1], [2, 7]])
+
+    offsets, totals, sources, targets, values = build_multistage_flows([matrix], min_value=3)
+
+    np.testing.assert_array_equal(values, [10, 7])
+    np.testing.assert_array_equal(totals, [11, 9, 12, 8])
+
+
+def test_build_multistage_flows_rejects_mismatched_stages():
+    with pytest.raises(ValueError):
+        build_multistage_flows([np.ones((2, 3)), np.ones((2, 2))])
+    with pytest.raises(ValueError):
+        build_multistage_flows([])
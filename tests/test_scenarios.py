@@ -0,0 +1,36 @@
+import numpy as np
+
+import scenarios
+from scenarios import project_totals, random_multipliers, scenario_flow
+from synthetic import synthetic_flow
+
+
+def test_projections_keep_everyone():
+    flow = synthetic_flow(20, 6, 10**5)
+    multipliers = random_multipliers(20, 200)
+    people = multipliers @ flow.cohort_sizes
+
+    expected = project_totals(flow, multipliers)
+    sampled = project_totals(flow, multipliers, stochastic=True)
+
+    np.testing.assert_allclose(expected.sum(axis=1), people)
+    np.testing.assert_allclose(sampled.sum(axis=1), np.rint(multipliers * flow.cohort_sizes).sum(axis=1))
+
+
+def test_stochastic_blocks_draw_the_same_outcomes(monkeypatch):
+    flow = synthetic_flow(20, 6, 10**5)
+    multipliers = random_multipliers(20, 200)
+    whole = project_totals(flow, multipliers, stochastic=True)
+
+    monkeypatch.setattr(scenarios, 'BLOCK_CELLS', 20 * 6 * 7)
+
+    np.testing.assert_array_equal(project_totals(flow, multipliers, stochastic=True), whole)
+
+
+def test_scenario_flow_rows_add_up_to_scaled_sizes():
+    flow = synthetic_flow(10, 6, 10**4)
+    multipliers = np.linspace(0.5, 1.5, 10)
+
+    scenario = scenario_flow(flow, multipliers)
+
+    np.testing.assert_array_equal(scenario.counts.sum(axis=1), np.rint(multipliers * flow.cohort_sizes))
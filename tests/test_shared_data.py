@@ -0,0 +1,60 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from filters import build_respondent_index
+from flow_matrix import FlowMatrix
+from ingest import REASON_COLUMN, STATUS_COLUMN
+from shared_data import attach_dataset, attach_or_publish, build_dataset, publish_dataset
+
+
+@pytest.fixture
+def dataset():
+    rng = np.random.default_rng(0)
+    frame = pd.DataFrame({
+        REASON_COLUMN: rng.choice(['Job', 'Study'], 1000),
+        STATUS_COLUMN: rng.choice(['Working', 'Left'], 1000),
+        'Region': rng.choice(['Aarhus', 'Odense'], 1000),
+    })
+    index = build_respondent_index([frame], ['Region'])
+    return index.flow(), index
+
+
+def test_publish_then_attach_round_trips(tmp_path, dataset):
+    flow, index = dataset
+    path = tmp_path / 'shared.bin'
+
+    publish_dataset(path, 'key', flow, index)
+    attached = attach_dataset(path, 'key')
+
+    np.testing.assert_array_equal(attached.flow.counts, flow.counts)
+    np.testing.assert_array_equal(attached.flow.percentages, flow.percentages)
+    assert attached.flow.fingerprint == flow.fingerprint
+    np.testing.assert_array_equal(attached.index.cells, index.cells)
+    np.testing.assert_array_equal(attached.index.flow({'Region': ['Aarhus']}).counts,
+                                  index.flow({'Region': ['Aarhus']}).counts)
+    # Views into the mapping are zero-copy and read-only
+    assert not attached.index.cells.flags.writeable
+    assert not attached.index.cells.flags.owndata
+    with pytest.raises(ValueError):
+        attached.index.cells[0] = 0
+
+
+def test_stale_or_missing_file_is_not_attached(tmp_path, dataset):
+    flow, index = dataset
+    path = tmp_path / 'shared.bin'
+    assert attach_dataset(path, 'key') is None
+
+    publish_dataset(path, 'old key', flow, index)
+
+    assert attach_dataset(path, 'new key') is None
+    rebuilt = attach_or_publish(path, 'new key', lambda: (flow, None))
+    assert rebuilt.key == 'new key' and rebuilt.index is None
+
+
+def test_build_dataset_needs_an_edition_without_a_source(tmp_path):
+    with pytest.raises(FileNotFoundError, match='No published editions'):
+        build_dataset(editions_dir=str(tmp_path))
+
+    flow, index = build_dataset()
+    assert isinstance(flow, FlowMatrix) and index is None
@@ -0,0 +1,55 @@
+import numpy as np
+
+from transitions import limit_matrices, transition_matrices, transition_model
+
+STATUSES = ['Working', 'Studying', 'Left']
+
+
+def random_counts(rng, n_reasons=8):
+    counts = rng.integers(0, 50, size=(n_reasons, len(STATUSES), len(STATUSES)))
+    counts[0, 1] = 0  # Nobody in the first cohort was seen leaving Studying
+    return counts
+
+
+def test_rows_are_stochastic_with_identity_and_absorbing_rows():
+    matrices = transition_matrices(random_counts(np.random.default_rng(0)), STATUSES)
+
+    np.testing.assert_allclose(matrices.sum(axis=-1), 1)
+    assert (matrices >= 0).all()
+    np.testing.assert_array_equal(matrices[0, 1], [0, 1, 0])
+    np.testing.assert_array_equal(matrices[:, 2], np.broadcast_to([0, 0, 1], (8, 3)))
+
+
+def test_projections_keep_shares_summing_to_one():
+    rng = np.random.default_rng(1)
+    model = transition_model([f"r{i}" for i in range(8)], STATUSES, random_counts(rng),
+                             rng.integers(1, 100, size=(8, 3)))
+
+    path = model.project(5)
+
+    assert path.shape == (6, 8, 3)
+    np.testing.assert_allclose(path.sum(axis=-1), 1)
+    assert (np.diff(path[:, :, 2], axis=0) >= -1e-12).all()  # Nobody comes back once they have left
+    np.testing.assert_array_equal(model.project(3), path[:4])
+
+
+def test_steady_state_is_a_fixed_point():
+    rng = np.random.default_rng(2)
+    model = transition_model([f"r{i}" for i in range(8)], STATUSES, random_counts(rng),
+                             rng.integers(1, 100, size=(8, 3)))
+
+    steady = model.steady_state()
+    limits = limit_matrices(model.matrices)
+
+    np.testing.assert_allclose(steady.sum(axis=-1), 1)
+    np.testing.assert_allclose(limits @ model.matrices, limits, atol=1e-8)
+    np.testing.assert_allclose(np.einsum('rs,rst->rt', steady, model.matrices), steady, atol=1e-8)
+
+
+def test_models_are_memoized_by_contents():
+    counts = random_counts(np.random.default_rng(3))
+    current = np.ones((8, 3))
+    reasons = [f"r{i}" for i in range(8)]
+
+    assert transition_model(reasons, STATUSES, counts, current) is transition_model(reasons, STATUSES,
+                                                                                    counts.copy(), current.copy())
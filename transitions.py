@@ -0,0 +1,121 @@
+"""Markov model of status changes between survey waves, one transition matrix per origin reason.
+
+Each cohort's moves between consecutive waves are pooled into a row-stochastic
+status x status matrix. Projections N waves ahead multiply every cohort's latest
+status mix through its own matrix, and the long-run (steady) state comes from
+repeated squaring of all the matrices at once, so cost does not grow with the
+horizon. "Left" is absorbing: people who have left the country are not
+resurveyed, so they cannot be seen coming back.
+"""
+import hashlib
+import threading
+
+import numpy as np
+
+from lru import LRUCache
+
+ABSORBING_STATUSES = ('Left',)
+# Squarings for the steady state: P^(2^60) is as good as the limit
+MAX_SQUARINGS = 60
+STEADY_TOLERANCE = 1e-10
+
+
+def transition_matrices(counts, statuses, absorbing=ABSORBING_STATUSES):
+    """Row-stochastic matrices from reasons x statuses x statuses move counts.
+
+    Statuses nobody in a cohort was seen leaving from keep their members (identity row).
+    """
+
+    counts = np.asarray(counts, dtype=float)
+    n_statuses = counts.shape[-1]
+    totals = counts.sum(axis=-1, keepdims=True)
+    identity = np.broadcast_to(np.eye(n_statuses), counts.shape)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        matrices = np.where(totals > 0, counts / totals, identity)
+    for status in absorbing:
+        if status in statuses:
+            j = statuses.index(status)
+            matrices[:, j, :] = 0.0
+            matrices[:, j, j] = 1.0
+    return matrices
+
+
+def limit_matrices(matrices, max_squarings=MAX_SQUARINGS, tolerance=STEADY_TOLERANCE):
+    """lim P^n for every cohort's matrix at once, by repeated squaring.
+
+    Periodic chains have no limit; for them the average of two consecutive
+    powers (the long-run time share) is returned instead.
+    """
+
+    power = matrices.copy()
+    for _ in range(max_squarings):
+        squared = power @ power
+        if np.abs(squared - power).max(initial=0) < tolerance:
+            return squared
+        power = squared
+    return (power + power @ matrices) / 2
+
+
+def model_fingerprint(reasons, statuses, counts, current):
+    """Content hash of a model's inputs, cheap enough to check before building the model"""
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(repr((list(reasons), list(statuses))).encode())
+    digest.update(np.ascontiguousarray(counts, dtype=np.int64).tobytes())
+    digest.update(np.ascontiguousarray(current, dtype=float).tobytes())
+    return digest.hexdigest()
+
+
+class TransitionModel:
+    """Per-reason Markov chains with cached multi-step projections and steady states"""
+
+    def __init__(self, reasons, statuses, counts, current):
+        self.reasons = list(reasons)
+        self.statuses = list(statuses)
+        self.counts = np.asarray(counts, dtype=np.int64)
+        self.matrices = transition_matrices(self.counts, self.statuses)
+
+        current = np.asarray(current, dtype=float)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            self.current = np.where(current.sum(axis=1, keepdims=True) > 0,
+                                    current / current.sum(axis=1, keepdims=True), 0.0)
+        self.cohort_sizes = current.sum(axis=1)
+        self.fingerprint = model_fingerprint(self.reasons, self.statuses, self.counts, current)
+
+        self._lock = threading.Lock()
+        self._path = self.current[None]  # steps x reasons x statuses, grown on demand
+        self._steady = None
+
+    def project(self, steps):
+        """Status mix of every cohort 0..steps waves ahead: (steps + 1) x reasons x statuses"""
+        with self._lock:
+            path = self._path
+            if len(path) <= steps:
+                grown = [path]
+                state = path[-1]
+                for _ in range(steps + 1 - len(path)):
+                    # One batched vector-matrix product per wave for all cohorts
+                    state = np.einsum('rs,rst->rt', state, self.matrices)
+                    grown.append(state[None])
+                path = self._path = np.concatenate(grown)
+            return path[:steps + 1]
+
+    def steady_state(self):
+        """Long-run status mix of every cohort: reasons x statuses"""
+        with self._lock:
+            if self._steady is None:
+                self._steady = np.einsum('rs,rst->rt', self.current, limit_matrices(self.matrices))
+            return self._steady
+
+    def share(self, status, steps):
+        """Share (%) of each cohort in `status`, 0..steps waves ahead: (steps + 1) x reasons"""
+        return self.project(steps)[:, :, self.statuses.index(status)] * 100
+
+
+_cache = LRUCache(maxsize=8)
+
+
+def transition_model(reasons, statuses, counts, current):
+    """TransitionModel, memoized per contents so its projections are reused across reruns"""
+
+    key = model_fingerprint(reasons, statuses, counts, current)
+    return _cache.get_or_build(key, lambda: TransitionModel(reasons, statuses, counts, current))